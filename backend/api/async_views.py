@@ -0,0 +1,126 @@
+"""
+Async read-only endpoints for recipes, tags and ingredients.
+
+Served under /api/async/ and meant for an ASGI server (uvicorn, or
+gunicorn with uvicorn workers), where a slow database call no longer
+blocks a whole worker. Responses match the synchronous viewsets.
+Writes stay on the synchronous API.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.authentication import CachedTokenAuthentication
+from api.filters import IngredientFilter, RecipeFilter
+from api.pagination import CustomPageNumberPagination
+from api.serializers import IngredientSerializer, RecipeListSerializer, TagSerializer
+from api.views import get_recipe_queryset
+from recipes.models import Ingredient, Tag
+
+
+def error_response(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def authenticate(request):
+    """Resolve the token user (cached, so usually without a query)."""
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed as e:
+        return None, e
+    return (result[0] if result else AnonymousUser()), None
+
+
+def filter_recipes(request, user):
+    """Apply RecipeFilter; validating the author filter may query, so this runs in a thread."""
+    drf_request = Request(request)
+    drf_request.user = user
+    filterset = RecipeFilter(request.GET, queryset=get_recipe_queryset(user), request=drf_request)
+    if not filterset.is_valid():
+        return None, filterset.errors
+    return filterset.qs, None
+
+
+def page_params(request):
+    paginator = CustomPageNumberPagination
+    try:
+        limit = int(request.GET.get(paginator.page_size_query_param, paginator.page_size))
+        page = int(request.GET.get(paginator.page_query_param, 1))
+    except ValueError:
+        return None, None
+    if limit < 1 or page < 1:
+        return None, None
+    return page, min(limit, paginator.max_page_size)
+
+
+def page_link(request, page, last_page):
+    if page < 1 or page > last_page:
+        return None
+    url = request.build_absolute_uri()
+    if page == 1:
+        return remove_query_param(url, CustomPageNumberPagination.page_query_param)
+    return replace_query_param(url, CustomPageNumberPagination.page_query_param, page)
+
+
+async def recipe_list(request):
+    user, error = await sync_to_async(authenticate)(request)
+    if error:
+        return error_response(str(error.detail), 401)
+    queryset, errors = await sync_to_async(filter_recipes)(request, user)
+    if errors:
+        return JsonResponse(errors, status=400)
+    page, limit = page_params(request)
+    if page is None:
+        return error_response('Invalid page.', 404)
+
+    count = await queryset.acount()
+    last_page = max((count + limit - 1) // limit, 1)
+    if page > last_page:
+        return error_response('Invalid page.', 404)
+    offset = (page - 1) * limit
+    recipes = [recipe async for recipe in queryset[offset:offset + limit]]
+
+    return JsonResponse({
+        'count': count,
+        'next': page_link(request, page + 1, last_page),
+        'previous': page_link(request, page - 1, last_page),
+        'results': RecipeListSerializer(recipes, many=True, context={'request': request}).data,
+    })
+
+
+async def recipe_detail(request, pk):
+    user, error = await sync_to_async(authenticate)(request)
+    if error:
+        return error_response(str(error.detail), 401)
+    recipe = await get_recipe_queryset(user).filter(pk=pk).afirst()
+    if recipe is None:
+        return error_response('No Recipe matches the given query.', 404)
+    return JsonResponse(RecipeListSerializer(recipe, context={'request': request}).data)
+
+
+async def tag_list(request):
+    tags = [tag async for tag in Tag.objects.all()]
+    return JsonResponse(TagSerializer(tags, many=True).data, safe=False)
+
+
+async def tag_detail(request, pk):
+    tag = await Tag.objects.filter(pk=pk).afirst()
+    if tag is None:
+        return error_response('No Tag matches the given query.', 404)
+    return JsonResponse(TagSerializer(tag).data)
+
+
+async def ingredient_list(request):
+    queryset = IngredientFilter(request.GET, queryset=Ingredient.objects.all()).qs
+    ingredients = [ingredient async for ingredient in queryset]
+    return JsonResponse(IngredientSerializer(ingredients, many=True).data, safe=False)
+
+
+async def ingredient_detail(request, pk):
+    ingredient = await Ingredient.objects.filter(pk=pk).afirst()
+    if ingredient is None:
+        return error_response('No Ingredient matches the given query.', 404)
+    return JsonResponse(IngredientSerializer(ingredient).data)
@@ -0,0 +1,179 @@
+"""
+Token authentication with a cached token -> user lookup.
+
+Only the user's field values are cached, never the password hash: the user
+is rebuilt with the password deferred, so the rare view that checks it (a
+password change) loads it from the database.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.metrics import describe, registry
+
+CACHE_KEY_PREFIX = 'auth-token'
+
+
+def cache_key(key):
+    """Shared cache key for a token; the raw token never appears in cache keys."""
+    return f'{CACHE_KEY_PREFIX}:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+
+def generation_key(key):
+    return f'{CACHE_KEY_PREFIX}-generation:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+
+class TokenCache:
+    """
+    Two-level token cache: a small per-process LRU in front of the shared Django cache.
+
+    Invalidation removes the entry from the shared cache and from this
+    process immediately; other processes drop their local copy within
+    AUTH_TOKEN_CACHE_LOCAL_TTL seconds.
+
+    Entries are stored with the token's generation, read before the
+    database lookup they cache; invalidation increments it, so a lookup
+    that raced an invalidation stores an entry that is never used.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.local_hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        found = cache.get_many([cache_key(key), generation_key(key)])
+        entry = found.get(cache_key(key))
+        with self._lock:
+            if entry is None or entry[0] != found.get(generation_key(key)):
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._remember(key, entry[1])
+        return entry[1]
+
+    def generation(self, key):
+        """The token's current generation; read it before looking up what set() will store."""
+        generation = cache.get(generation_key(key))
+        if generation is None:
+            # Never restart from 1: entries stored before an eviction could match again
+            cache.add(generation_key(key), time.time_ns(), settings.AUTH_TOKEN_CACHE_TTL)
+            generation = cache.get(generation_key(key))
+        return generation
+
+    def set(self, key, generation, value):
+        # Not remembered locally: get() first checks the generation is still current
+        cache.set(cache_key(key), (generation, value), settings.AUTH_TOKEN_CACHE_TTL)
+
+    def _remember(self, key, value):
+        expires = time.monotonic() + settings.AUTH_TOKEN_CACHE_LOCAL_TTL
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """
+        Drop the entries of keys, and again on commit: a lookup made before
+        then still reads the rows as they were.
+        """
+        self._invalidate(keys)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._invalidate(keys))
+
+    def _invalidate(self, keys):
+        for key in keys:
+            try:
+                cache.incr(generation_key(key))
+            except ValueError:
+                # No generation: no stored entry can match the one the next lookup adds
+                pass
+        cache.delete_many([cache_key(key) for key in keys])
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+                'local_entries': len(self._entries),
+            }
+
+
+token_cache = TokenCache()
+
+
+def cached_fields(user, token):
+    """What is cached for a token: the user's field values without the password, and when the token was created."""
+    fields = [field.attname for field in type(user)._meta.concrete_fields if field.attname != 'password']
+    return fields, [getattr(user, field) for field in fields], token.created
+
+
+def rebuild(key, fields, values, created):
+    """A user (password deferred) and token as if loaded from the database."""
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, fields, values)
+    token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'], [key, user.pk, created])
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that skips the token/user
+    query for recently seen tokens.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return rebuild(key, *cached)
+
+        generation = token_cache.generation(key)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, generation, cached_fields(user, token))
+        return user, token
+
+
+describe('bitesnap_auth_token_cache_lookups_total', 'counter', 'Token authentication cache lookups by result.')
+
+
+@registry.register_collector
+def token_cache_metrics():
+    stats = token_cache.stats()
+    return [
+        ('bitesnap_auth_token_cache_lookups_total', {'result': 'local_hit'}, stats['local_hits']),
+        ('bitesnap_auth_token_cache_lookups_total', {'result': 'shared_hit'}, stats['shared_hits']),
+        ('bitesnap_auth_token_cache_lookups_total', {'result': 'miss'}, stats['misses']),
+    ]
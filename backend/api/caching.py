@@ -0,0 +1,197 @@
+"""
+Stampede protection for values kept in the shared Django cache.
+
+single_flight.get_or_set() stores each value with its expiry time and the
+time it took to compute, and adds:
+
+- single-flight recomputation: on a miss only one caller computes the value.
+  Other threads of the process wait for it; other workers find the lock (a
+  cache.add() key) and poll for the value for up to CACHE_LOCK_WAIT seconds.
+  The lock holds a token unique to its taker, who only deletes it while it
+  still holds that token: a computation outlasting CACHE_LOCK_TIMEOUT must
+  not release the lock another worker has taken since;
+- probabilistic early refresh (XFetch): before a value expires each reader
+  may volunteer to recompute it, the more likely the closer to expiry and the
+  slower the computation, so popular keys are renewed one at a time instead
+  of expiring in every worker at once;
+- stale-while-revalidate: for stale_ttl seconds after expiry the old value is
+  returned to everyone except the one caller refreshing it. A refresh that
+  fails is logged and the stale value served.
+
+None is never cached.
+"""
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.metrics import describe, registry
+
+logger = logging.getLogger(__name__)
+
+# How often workers waiting for another worker's computation look for the value
+POLL_INTERVAL = 0.02
+
+
+class SingleFlightCache:
+    """get_or_set() over the default cache; see the module docstring."""
+
+    OUTCOMES = ('hit', 'early_refresh', 'stale', 'miss', 'waited', 'computed', 'failed')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+
+    def get_or_set(self, key, compute, ttl, stale_ttl=0):
+        entry = cache.get(key)
+        if entry is None:
+            self.count('miss')
+            return self._fill(key, compute, ttl, stale_ttl)
+
+        value, expires, delta = entry
+        now = time.time()
+        fresh = now < expires
+        if fresh and not self.refresh_early(expires, delta, now):
+            self.count('hit')
+            return value
+        self.count('early_refresh' if fresh else 'stale')
+        flight = self._lead(key)
+        if flight is None:
+            return value
+        try:
+            token = acquire(key)
+            if token is None:
+                return value
+            try:
+                refreshed = self._compute(key, compute, ttl, stale_ttl)
+            except Exception:
+                self.count('failed')
+                logger.exception(f'Refreshing cache key {key} failed, serving the old value')
+                return value
+            finally:
+                release(key, token)
+            return value if refreshed is None else refreshed
+        finally:
+            self._land(key, flight)
+
+    def refresh_early(self, expires, delta, now):
+        beta = settings.CACHE_EARLY_REFRESH_BETA
+        return beta > 0 and now - delta * beta * math.log(1.0 - random.random()) >= expires
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def clear(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.OUTCOMES, 0)
+
+    def _fill(self, key, compute, ttl, stale_ttl):
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            flight = self._lead(key)
+            if flight is None:
+                # Another thread of this process is computing it
+                self._wait_for_flight(key, deadline)
+                entry = cache.get(key)
+                if entry is not None:
+                    self.count('waited')
+                    return entry[0]
+                continue
+            try:
+                token = acquire(key)
+                if token is not None:
+                    try:
+                        # Another worker may have stored it and released the lock since our miss
+                        entry = cache.get(key)
+                        if entry is not None:
+                            self.count('waited')
+                            return entry[0]
+                        return self._compute(key, compute, ttl, stale_ttl)
+                    finally:
+                        release(key, token)
+                # Another worker is computing it
+                while time.monotonic() < deadline and cache.get(lock_key(key)) is not None:
+                    entry = cache.get(key)
+                    if entry is not None:
+                        self.count('waited')
+                        return entry[0]
+                    time.sleep(POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    self.count('waited')
+                    return entry[0]
+            finally:
+                self._land(key, flight)
+        # Waited long enough: compute without coordination rather than fail
+        return self._compute(key, compute, ttl, stale_ttl)
+
+    def _compute(self, key, compute, ttl, stale_ttl):
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        self.count('computed')
+        if value is not None:
+            cache.set(key, (value, time.time() + ttl, delta), ttl + stale_ttl)
+        return value
+
+    def _lead(self, key):
+        """An event to set when done if this thread now computes key, None if another one does."""
+        with self._lock:
+            if key in self._flights:
+                return None
+            flight = self._flights[key] = threading.Event()
+            return flight
+
+    def _wait_for_flight(self, key, deadline):
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is not None:
+            flight.wait(max(deadline - time.monotonic(), 0))
+
+    def _land(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.set()
+
+
+def lock_key(key):
+    # Its own key group, so taking a lock never invalidates cached values (bitesnap.cache)
+    return f'lock:{key}'
+
+
+def acquire(key):
+    """Take the recomputation lock of key; the token to release it with, or None if it is taken."""
+    token = uuid.uuid4().hex
+    return token if cache.add(lock_key(key), token, settings.CACHE_LOCK_TIMEOUT) else None
+
+
+def release(key, token):
+    """Delete the lock of key if it is still ours; it may have expired and been taken by another worker."""
+    # Not atomic, but only a lock expiring between the two calls can be lost
+    if cache.get(lock_key(key)) == token:
+        cache.delete(lock_key(key))
+
+
+single_flight = SingleFlightCache()
+
+
+describe('bitesnap_cache_single_flight_total', 'counter', 'Stampede-protected cache lookups and recomputations by outcome.')
+
+
+@registry.register_collector
+def single_flight_metrics():
+    return [
+        ('bitesnap_cache_single_flight_total', {'outcome': outcome}, value)
+        for outcome, value in single_flight.stats().items()
+    ]
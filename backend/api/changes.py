@@ -0,0 +1,115 @@
+"""
+Delta sync of recipes and favorites.
+
+Signals append a RecipeChange row, in the transaction of the change itself,
+whenever a recipe is saved, retagged or deleted and whenever a favorite is
+added or removed. A client keeps the cursor of the last batch it applied and
+asks /api/recipes/changes/?since=<cursor> for what happened after it: the
+current version of changed recipes, the ids of deleted ones and its own
+favorite changes, each recipe at most once however often it changed.
+
+Ids are allocated when a row is inserted but become visible on commit, so a
+transaction can commit a lower id after a reader moved past it. Rows younger
+than RECIPE_CHANGES_SETTLE_SECONDS are therefore held back, which covers
+every transaction shorter than that.
+
+Bulk commands send no signals; they write the rows of each batch with
+record_recipes() and record_favorites() through their recipes.bulk writer.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.models import RecipeChange
+
+
+class CursorExpired(Exception):
+    """The rows after the cursor were pruned; the client has to resync."""
+
+
+def record_recipe(recipe_id, deleted=False):
+    RecipeChange.objects.create(kind=RecipeChange.RECIPE, recipe_id=recipe_id, deleted=deleted)
+
+
+def record_favorite(user_id, recipe_id, deleted=False):
+    RecipeChange.objects.create(
+        kind=RecipeChange.FAVORITE, recipe_id=recipe_id, user_id=user_id, deleted=deleted,
+    )
+
+
+def record_recipes(writer, recipe_ids):
+    """record_recipe() for recipes inserted with writer, in its transaction."""
+    _write_many(writer, [(RecipeChange.RECIPE, recipe_id, None) for recipe_id in recipe_ids])
+
+
+def record_favorites(writer, favorites):
+    """record_favorite() for (user_id, recipe_id) pairs inserted with writer, in its transaction."""
+    _write_many(writer, [(RecipeChange.FAVORITE, recipe_id, user_id) for user_id, recipe_id in favorites])
+
+
+def _write_many(writer, rows):
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    writer.insert(
+        RecipeChange._meta.db_table,
+        ['kind', 'recipe_id', 'user_id', 'deleted', 'created_at'],
+        [(kind, recipe_id, user_id, False, now) for kind, recipe_id, user_id in rows]
+    )
+
+
+def settled():
+    """Rows a reader may deliver: older than the settle window."""
+    cutoff = timezone.now() - timedelta(seconds=settings.RECIPE_CHANGES_SETTLE_SECONDS)
+    return RecipeChange.objects.filter(created_at__lte=cutoff)
+
+
+def head_cursor():
+    """The cursor a client starts from after loading the full recipe list."""
+    return settled().aggregate(last=Max('id'))['last'] or 0
+
+
+def read_changes(since, user, limit):
+    """
+    Compact the next `limit` log rows after `since` for `user`.
+
+    Returns the cursor of the last row read, whether more rows may follow,
+    and the ids of changed and deleted recipes and of the user's added and
+    removed favorites. Other users' favorite rows count towards the limit
+    but are skipped.
+    """
+    # The cursor is the id of a delivered row; pruning is what removes it
+    if since and not RecipeChange.objects.filter(id=since).exists():
+        raise CursorExpired(since)
+    rows = list(
+        settled().filter(id__gt=since).order_by('id').values_list('id', 'kind', 'recipe_id', 'user_id', 'deleted')[:limit]
+    )
+    user_id = user.id if user.is_authenticated else None
+    recipes = {}
+    favorites = {}
+    # Later rows overwrite earlier ones: only the last change of a recipe counts
+    for _, kind, recipe_id, owner_id, deleted in rows:
+        if kind == RecipeChange.RECIPE:
+            recipes[recipe_id] = deleted
+        elif owner_id is not None and owner_id == user_id:
+            favorites[recipe_id] = deleted
+    return {
+        'cursor': rows[-1][0] if rows else since,
+        'has_more': len(rows) == limit,
+        'recipes': [recipe_id for recipe_id, deleted in recipes.items() if not deleted],
+        'deleted': [recipe_id for recipe_id, deleted in recipes.items() if deleted],
+        'favorites': {
+            'added': [recipe_id for recipe_id, deleted in favorites.items() if not deleted],
+            'removed': [recipe_id for recipe_id, deleted in favorites.items() if deleted],
+        },
+    }
+
+
+def prune(before):
+    """Delete rows recorded before `before`, always keeping the newest so head cursors stay valid."""
+    last = RecipeChange.objects.aggregate(last=Max('id'))['last']
+    if last is None:
+        return 0
+    deleted, _ = RecipeChange.objects.filter(created_at__lt=before, id__lt=last).delete()
+    return deleted
@@ -0,0 +1,107 @@
+"""
+Streaming NDJSON export of recipes and favorites.
+
+Rows are read with QuerySet.iterator(chunk_size=...) (a server-side cursor
+on PostgreSQL) and encoded line by line, so memory stays flat regardless
+of table size.
+"""
+import json
+import zlib
+
+from django.http import StreamingHttpResponse
+
+from recipes.models import Recipe, Favorite
+
+EXPORT_CHUNK_SIZE = 2000
+WRITE_BUFFER_SIZE = 64 * 1024
+
+
+def recipe_queryset():
+    return Recipe.objects.select_related('author').prefetch_related(
+        'tags', 'recipe_ingredients__ingredient'
+    ).order_by('id')
+
+
+def recipe_to_dict(recipe):
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'author': {
+            'id': recipe.author_id,
+            'email': recipe.author.email,
+            'username': recipe.author.username,
+        },
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'id': item.ingredient_id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'created_at': recipe.created_at.isoformat(),
+        'updated_at': recipe.updated_at.isoformat(),
+    }
+
+
+def iter_recipes(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield every recipe as a dict, in id order."""
+    for recipe in recipe_queryset().iterator(chunk_size=chunk_size):
+        yield recipe_to_dict(recipe)
+
+
+def iter_favorites(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one user's favorite recipes as dicts, with the time they were added."""
+    favorites = Favorite.objects.filter(user=user).select_related(
+        'recipe__author'
+    ).prefetch_related(
+        'recipe__tags', 'recipe__recipe_ingredients__ingredient'
+    ).order_by('id')
+    for favorite in favorites.iterator(chunk_size=chunk_size):
+        row = recipe_to_dict(favorite.recipe)
+        row['favorited_at'] = favorite.created_at.isoformat()
+        yield row
+
+
+def iter_ndjson(rows):
+    """Encode rows as NDJSON, yielding buffers of roughly WRITE_BUFFER_SIZE bytes."""
+    buffer = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= WRITE_BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_gzip(chunks):
+    """Gzip-compress a stream of byte chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(rows, filename, compress=False):
+    """Build a StreamingHttpResponse that downloads rows as (optionally gzipped) NDJSON."""
+    content = iter_ndjson(rows)
+    content_type = 'application/x-ndjson'
+    if compress:
+        content = iter_gzip(content)
+        content_type = 'application/gzip'
+        filename = f'{filename}.gz'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,14 +1,157 @@
 """
-Health check endpoint for monitoring and Azure Container Apps health probes
+Health check endpoints for monitoring and Azure Container Apps health probes
+
+- /health/live: process is up, no I/O at all
+- /health/ready: cached database/storage checks, refreshed in the background
+- /health/details: latency percentiles, cache status and worker uptime
+- /health: legacy combined endpoint, same checks as /health/ready
 """
 import logging
+import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from django.http import JsonResponse
-from django.db import connection
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, connections
+from django.http import JsonResponse
+
+from api.authentication import token_cache
+from bitesnap.db.pool import pool_stats
+from bitesnap.db.replicas import monitor as replica_monitor
 
 logger = logging.getLogger(__name__)
 
+VERSION = "1.0.0"
+PROCESS_STARTED = time.time()
+
+
+def _mark_process_started():
+    # A worker forked from a preloaded master reports its own uptime, not the master's
+    global PROCESS_STARTED
+    PROCESS_STARTED = time.time()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_mark_process_started)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return round(ordered[index], 2)
+
+
+def check_database():
+    """Run SELECT 1 and return (status, round-trip milliseconds)."""
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return "connected", (time.perf_counter() - started) * 1000
+
+
+def check_storage():
+    if getattr(settings, 'AZURE_ACCOUNT_NAME', None):
+        return "azure_blob_configured"
+    return "local_storage"
+
+
+class ReadinessMonitor:
+    """
+    Caches the result of the readiness checks.
+
+    A result younger than HEALTH_CHECK_INTERVAL is served as is. An older one
+    is still served while a single background thread refreshes it, until it
+    is older than HEALTH_CHECK_TTL, at which point one probe checks inline
+    and concurrent probes wait for its result. Probes therefore almost never
+    touch the database themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self.db_latencies = deque(maxlen=settings.HEALTH_CHECK_LATENCY_SAMPLES)
+
+    def run_checks(self):
+        status = "healthy"
+        checks = {}
+
+        try:
+            checks["database"], latency = check_database()
+            self.db_latencies.append(latency)
+        except Exception as e:
+            checks["database"] = f"error: {str(e)}"
+            status = "unhealthy"
+
+        try:
+            checks["storage"] = check_storage()
+        except Exception as e:
+            checks["storage"] = f"error: {str(e)}"
+
+        return {"status": status, "checks": checks}
+
+    def refresh(self):
+        result = self.run_checks()
+        with self._lock:
+            previous = self._result
+            self._result = result
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+
+        if previous is None or previous["status"] != result["status"]:
+            if result["status"] == "healthy":
+                logger.info("Health check passed - all systems operational")
+            else:
+                logger.error(f"Health check failed - checks: {result['checks']}")
+        return result
+
+    def _refresh_in_background(self):
+        close_old_connections()
+        try:
+            with self._refresh_lock:
+                self.refresh()
+        except Exception:
+            logger.exception("Background health check failed")
+            with self._lock:
+                self._refreshing = False
+        finally:
+            close_old_connections()
+
+    def get(self):
+        with self._lock:
+            age = time.monotonic() - self._checked_at
+            result = self._result
+            if result is not None and age < settings.HEALTH_CHECK_TTL:
+                if age >= settings.HEALTH_CHECK_INTERVAL and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background, daemon=True).start()
+                return result
+
+        requested = time.monotonic()
+        with self._refresh_lock:
+            with self._lock:
+                if self._result is not None and self._checked_at >= requested:
+                    return self._result
+            return self.refresh()
+
+    def reset(self):
+        with self._lock:
+            self._result = None
+            self._checked_at = 0.0
+            self._refreshing = False
+            self.db_latencies.clear()
+
+
+monitor = ReadinessMonitor()
+
 
 def health_check(request):
     """
@@ -23,47 +166,79 @@ def health_check(request):
         - Monitoring systems
         - DevOps dashboards
     """
-    status = "healthy"
-    status_code = 200
-    checks = {}
-
-    # Check 1: Database connectivity
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-        checks["database"] = "connected"
-        logger.debug("Database health check: OK")
-    except Exception as e:
-        checks["database"] = f"error: {str(e)}"
-        status = "unhealthy"
-        status_code = 503
-        logger.error(f"Database health check failed: {e}")
-
-    # Check 2: Storage configuration
-    try:
-        if hasattr(settings, 'AZURE_ACCOUNT_NAME') and settings.AZURE_ACCOUNT_NAME:
-            checks["storage"] = "azure_blob_configured"
-        else:
-            checks["storage"] = "local_storage"
-        logger.debug("Storage configuration check: OK")
-    except Exception as e:
-        checks["storage"] = f"error: {str(e)}"
-        logger.warning(f"Storage configuration check failed: {e}")
-
-    # Build response
+    result = monitor.get()
     response_data = {
-        "status": status,
+        "status": result["status"],
         "timestamp": datetime.utcnow().isoformat() + "Z",
-        "version": "1.0.0",
+        "version": VERSION,
         "application": "BiteSnap",
-        "checks": checks
+        "checks": result["checks"],
+        "metrics": {
+            "auth_token_cache": token_cache.stats(),
+        },
     }
+    return JsonResponse(response_data, status=200 if result["status"] == "healthy" else 503)
+
+
+def liveness(request):
+    """Liveness probe: answers as long as the worker can serve requests."""
+    return JsonResponse({"status": "alive"})
+
+
+def readiness(request):
+    """Readiness probe backed by the cached database and storage checks."""
+    result = monitor.get()
+    return JsonResponse(result, status=200 if result["status"] == "healthy" else 503)
+
 
-    # Log health check request
-    if status == "healthy":
-        logger.info("Health check passed - all systems operational")
-    else:
-        logger.error(f"Health check failed - status: {status}, checks: {checks}")
+def connection_settings():
+    pools = pool_stats()
+    replicas = replica_monitor.status()
+    return {
+        alias: {
+            "conn_max_age": connections[alias].settings_dict["CONN_MAX_AGE"],
+            "health_checks": connections[alias].settings_dict["CONN_HEALTH_CHECKS"],
+            "pool": pools.get(alias),
+            "replica": replicas.get(alias),
+        }
+        for alias in connections
+    }
+
+
+def health_details(request):
+    """Detailed status for dashboards: latencies, cache round trip and uptime."""
+    result = monitor.get()
+    latencies = list(monitor.db_latencies)
+
+    try:
+        started = time.perf_counter()
+        cache.set("health:probe", 1, 10)
+        cache_ok = cache.get("health:probe") == 1
+        cache_status = {
+            "status": "ok" if cache_ok else "miss",
+            "backend": settings.CACHES["default"]["BACKEND"],
+            "round_trip_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+    except Exception as e:
+        cache_status = {"status": f"error: {str(e)}"}
 
-    return JsonResponse(response_data, status=status_code)
+    return JsonResponse({
+        "status": result["status"],
+        "version": VERSION,
+        "checks": result["checks"],
+        "database": {
+            "connections": connection_settings(),
+            "samples": len(latencies),
+            "latency_ms": {
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+            },
+        },
+        "cache": cache_status,
+        "auth_token_cache": token_cache.stats(),
+        "worker": {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - PROCESS_STARTED, 1),
+        },
+    }, status=200 if result["status"] == "healthy" else 503)
@@ -0,0 +1,212 @@
+"""
+On-demand resized recipe image variants backed by a size-bounded disk LRU cache.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.urls import reverse
+
+from recipes.constants import RECIPE_IMAGE_UPLOAD_PATH
+
+logger = logging.getLogger(__name__)
+
+VARIANT_CONTENT_TYPE = 'image/webp'
+
+
+class VariantCache:
+    """
+    LRU cache of encoded variants kept as files in a local directory.
+
+    The index is rebuilt from the directory on first use (oldest access
+    first), so the size bound survives restarts. Concurrent requests for
+    the same missing key are coalesced: one thread renders, the rest wait.
+
+    Files are opened while the lock is held, so an eviction that follows
+    cannot pull one from under a response. Index, size bound and
+    coalescing are per process: with several workers sharing the
+    directory it can grow to workers x max_bytes, and a file another
+    worker has evicted is simply rendered again.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._inflight = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                files.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _touch(self, key):
+        self._entries.move_to_end(key)
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _forget(self, key):
+        self._total_bytes -= self._entries.pop(key)
+
+    def _store(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            if key in self._entries:
+                self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            file = open(self._path(key), 'rb')
+            self._evict()
+        return file
+
+    def get_or_create(self, key, render):
+        """
+        Return the cached file for key opened for reading, rendering it once on a miss.
+
+        The caller owns the file and must close it.
+        """
+        while True:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                if key in self._entries:
+                    try:
+                        file = open(self._path(key), 'rb')
+                    except FileNotFoundError:
+                        self._forget(key)
+                    else:
+                        self._touch(key)
+                        self.hits += 1
+                        return file
+                event = self._inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self.misses += 1
+                    break
+            event.wait()
+
+        try:
+            return self._store(key, render())
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_variant_cache():
+    """Return the process-wide cache for the configured directory and size bound."""
+    config = (str(settings.IMAGE_VARIANT_CACHE_DIR), settings.IMAGE_VARIANT_CACHE_MAX_BYTES)
+    with _caches_lock:
+        if config not in _caches:
+            _caches[config] = VariantCache(*config)
+        return _caches[config]
+
+
+def variant_key(name, width, height):
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return f'{digest}-{width}x{height}.webp'
+
+
+def render_variant(name, width, height):
+    """Decode the stored image, crop-resize it to width x height and encode as WebP."""
+    from PIL import Image, ImageOps
+
+    with default_storage.open(name, 'rb') as source:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            output = BytesIO()
+            image.save(output, 'WEBP', quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+    return output.getvalue()
+
+
+def variant_url(image, size, request=None):
+    """Return the URL of the named variant of an image field, or None."""
+    if not image or size not in settings.IMAGE_VARIANT_SIZES:
+        return None
+    width, height = settings.IMAGE_VARIANT_SIZES[size]
+    url = reverse('image-variant', kwargs={'width': width, 'height': height, 'name': image.name})
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def image_variant(request, width, height, name):
+    """
+    Serve a resized WebP variant of a recipe image.
+
+    Only sizes listed in IMAGE_VARIANT_SIZES are rendered, so the cache
+    cannot be filled with arbitrary dimensions.
+    """
+    if (width, height) not in set(settings.IMAGE_VARIANT_SIZES.values()):
+        raise Http404('Unknown image variant size.')
+    if not name.startswith(RECIPE_IMAGE_UPLOAD_PATH) or '..' in name.split('/'):
+        raise Http404('Unknown image.')
+
+    try:
+        if not default_storage.exists(name):
+            raise Http404('Unknown image.')
+    except SuspiciousFileOperation:
+        raise Http404('Unknown image.')
+
+    cache = get_variant_cache()
+    try:
+        file = cache.get_or_create(
+            variant_key(name, width, height),
+            lambda: render_variant(name, width, height)
+        )
+    except (OSError, SyntaxError, ValueError) as e:
+        logger.warning(f'Could not render variant {width}x{height} of {name}: {e}')
+        raise Http404('Image cannot be resized.')
+
+    response = FileResponse(file, content_type=VARIANT_CONTENT_TYPE)
+    response['Cache-Control'] = f'public, max-age={settings.IMAGE_VARIANT_MAX_AGE}'
+    return response
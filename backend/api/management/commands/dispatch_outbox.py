@@ -0,0 +1,77 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from api.metrics import registry
+from api.outbox import Dispatcher, consumers, prune
+
+# Delivered events are pruned at most this often (seconds)
+PRUNE_INTERVAL = 300
+
+
+class Command(BaseCommand):
+    help = 'Deliver outbox events to the registered consumers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            action='append',
+            help='Only deliver to this consumer (repeatable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help='Events read per consumer and pass',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.OUTBOX_POLL_INTERVAL,
+            help='Seconds to wait when no consumer has events left',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single pass and exit',
+        )
+
+    def handle(self, *args, **options):
+        """Poll until stopped; SIGTERM finishes the current pass first."""
+        try:
+            selected = [consumers.get(name) for name in options['consumer']] if options['consumer'] else None
+        except KeyError as error:
+            raise CommandError(f'Unknown outbox consumer: {error.args[0]}')
+        dispatcher = Dispatcher(selected, options['batch_size'])
+        if not dispatcher.consumers:
+            raise CommandError('No outbox consumers are registered')
+
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+        next_prune = 0.0
+        delivered = 0
+        try:
+            while not self.stopping:
+                close_old_connections()
+                read = dispatcher.run_once()
+                delivered += read
+                registry.maybe_flush()
+                if options['once']:
+                    break
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + PRUNE_INTERVAL
+                    prune(timezone.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS))
+                if not dispatcher.backlogged:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Read {delivered} outbox events'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
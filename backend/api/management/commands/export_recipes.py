@@ -0,0 +1,65 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import EXPORT_CHUNK_SIZE, iter_favorites, iter_gzip, iter_ndjson, iter_recipes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Stream recipes (or one user\'s favorites) as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Output file path, or - for stdout',
+        )
+        parser.add_argument(
+            '--user',
+            help='Export the favorites of the user with this email instead of all recipes',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip-compress the output',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Number of rows fetched from the database per round trip',
+        )
+
+    def handle(self, *args, **options):
+        """Write the export without holding more than one chunk in memory."""
+        if options['user']:
+            try:
+                user = User.objects.get(email=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User not found: {options["user"]}')
+            rows = iter_favorites(user, chunk_size=options['chunk_size'])
+        else:
+            rows = iter_recipes(chunk_size=options['chunk_size'])
+
+        chunks = iter_ndjson(rows)
+        if options['gzip']:
+            chunks = iter_gzip(chunks)
+
+        if options['output'] == '-':
+            self.write_chunks(sys.stdout.buffer, chunks)
+            return
+        with open(options['output'], 'wb') as output:
+            written = self.write_chunks(output, chunks)
+        self.stdout.write(
+            self.style.SUCCESS(f'Exported {written} bytes to {options["output"]}')
+        )
+
+    def write_chunks(self, output, chunks):
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+        return written
@@ -0,0 +1,144 @@
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before it can answer its first request.
+COLD_START_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print(json.dumps({"wall_ms": (time.perf_counter() - started) * 1000, "loaded": sorted(sys.modules)}))
+'''
+
+# Optional subsystems that must only load when configured or first used.
+LAZY_MODULES = (
+    'PIL',
+    'azure',
+    'jwt',
+    'opencensus',
+    'rest_framework_simplejwt',
+    'social_core',
+    'social_django',
+    'storages',
+)
+
+# Variables that switch optional subsystems on; unset for the default profile.
+FEATURE_VARIABLES = ('AZURE_STORAGE_ACCOUNT_NAME', 'APPLICATIONINSIGHTS_CONNECTION_STRING')
+
+
+def parse_importtime(text):
+    """Parse ``python -X importtime`` output into (module, self_us, cumulative_us) tuples."""
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def profile_startup(env=None):
+    """Run a cold start in a fresh interpreter and return its wall time and imports."""
+    if env is None:
+        env = {key: value for key, value in os.environ.items() if key not in FEATURE_VARIABLES}
+    env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'bitesnap.settings'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', COLD_START_SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise CommandError(f'Cold start failed:\n{result.stderr[-2000:]}')
+
+    modules = parse_importtime(result.stderr)
+    packages = Counter()
+    for name, self_us, _ in modules:
+        packages[name.split('.')[0]] += self_us
+    cold_start = json.loads(result.stdout.splitlines()[-1])
+    return {
+        'wall_ms': round(cold_start['wall_ms'], 1),
+        'import_ms': round(sum(packages.values()) / 1000, 1),
+        'module_count': len(modules),
+        'modules': [
+            {'module': name, 'self_ms': round(self_us / 1000, 2), 'cumulative_ms': round(cumulative_us / 1000, 2)}
+            for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[1], reverse=True)
+        ],
+        'packages': [
+            {'package': package, 'self_ms': round(self_us / 1000, 2)}
+            for package, self_us in packages.most_common()
+        ],
+        'lazy_modules_loaded': sorted(
+            module for module in LAZY_MODULES
+            if any(name == module or name.startswith(module + '.') for name in cold_start['loaded'])
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Profile the imports of a cold start (settings, apps, middleware and URLconf)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of modules and packages to list',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the full profile as JSON',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail if the cold start exceeds STARTUP_BUDGET_MS or loads a lazy subsystem',
+        )
+        parser.add_argument(
+            '--with-features',
+            action='store_true',
+            help='Keep Azure storage / Application Insights variables from the environment',
+        )
+
+    def handle(self, *args, **options):
+        profile = profile_startup(dict(os.environ) if options['with_features'] else None)
+
+        if options['json']:
+            self.stdout.write(json.dumps(profile, indent=2))
+        else:
+            self.write_report(profile, options['limit'])
+
+        if options['check']:
+            problems = []
+            if profile['wall_ms'] > settings.STARTUP_BUDGET_MS:
+                problems.append(f'cold start took {profile["wall_ms"]}ms (budget {settings.STARTUP_BUDGET_MS}ms)')
+            if profile['lazy_modules_loaded'] and not options['with_features']:
+                problems.append(f'loaded at startup: {", ".join(profile["lazy_modules_loaded"])}')
+            if problems:
+                raise CommandError('; '.join(problems))
+            self.stdout.write(self.style.SUCCESS('Cold start within budget'))
+
+    def write_report(self, profile, limit):
+        self.stdout.write(
+            f'Cold start: {profile["wall_ms"]}ms wall, {profile["import_ms"]}ms importing '
+            f'{profile["module_count"]} modules (budget {settings.STARTUP_BUDGET_MS}ms)'
+        )
+        self.stdout.write('\nSlowest modules (self time):')
+        for row in profile['modules'][:limit]:
+            self.stdout.write(f'  {row["self_ms"]:8.2f}ms  {row["cumulative_ms"]:8.2f}ms cum  {row["module"]}')
+        self.stdout.write('\nBy package:')
+        for row in profile['packages'][:limit]:
+            self.stdout.write(f'  {row["self_ms"]:8.2f}ms  {row["package"]}')
+        if profile['lazy_modules_loaded']:
+            self.stdout.write(self.style.WARNING(
+                f'\nOptional subsystems loaded at startup: {", ".join(profile["lazy_modules_loaded"])}'
+            ))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.changes import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete delta sync log rows older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.RECIPE_CHANGES_RETENTION_DAYS,
+            help='Keep rows recorded within this many days',
+        )
+
+    def handle(self, *args, **options):
+        """Clients whose cursor is older get 410 Gone and reload the recipe list."""
+        deleted = prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} recipe changes'))
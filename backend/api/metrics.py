@@ -0,0 +1,382 @@
+"""
+Low-overhead Prometheus-style metrics.
+
+Each thread records into its own shard, so the request path never waits
+on a lock. When METRICS_DIR is set, every process periodically writes its
+aggregated snapshot to <METRICS_DIR>/<host>-<pid>.json and /metrics merges
+all of them, which gives totals across gunicorn workers (and other
+processes sharing the directory, such as the outbox dispatcher).
+
+Counters and histograms are summed over every snapshot. Gauges describe the
+current state of a process, so those of processes that are gone are left
+out; gauges of live processes are summed, or reduced to their maximum for
+values that each process measures in full (describe(..., merge='max')).
+Gunicorn removes the snapshot of a worker that exits (gunicorn.conf.py).
+"""
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from bitesnap import log
+from bitesnap.cache import cache_stats
+from bitesnap.db.pool import pool_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRICS = {}
+
+# Gauges merged across processes by their highest value instead of the sum
+MAX_GAUGES = set()
+
+
+def snapshot_file():
+    # The host name tells apart processes of containers sharing METRICS_DIR
+    return f'{socket.gethostname()}-{os.getpid()}.json'
+
+
+def describe(name, kind, help_text, merge='sum'):
+    """Declare a metric's type (counter, gauge or histogram) and help text."""
+    METRICS[name] = (kind, help_text)
+    if kind == 'gauge' and merge == 'max':
+        MAX_GAUGES.add(name)
+
+
+describe('bitesnap_http_requests_total', 'counter', 'HTTP requests by route, method and status.')
+describe('bitesnap_http_request_duration_seconds', 'histogram', 'HTTP request latency by route and method.')
+describe('bitesnap_http_response_bytes_total', 'counter', 'Response body bytes by route.')
+describe('bitesnap_db_queries_total', 'counter', 'Database queries issued while serving requests, by route.')
+describe('bitesnap_db_query_duration_seconds_total', 'counter', 'Time spent in database queries, by route.')
+describe('bitesnap_db_connections_opened_total', 'counter', 'New database connections opened, by alias.')
+describe('bitesnap_db_pool_connections', 'gauge', 'Pooled database connections by alias and state.')
+describe('bitesnap_db_pool_events_total', 'counter', 'Connection pool events by alias.')
+describe('bitesnap_log_records_total', 'counter', 'Log records written, dropped (queue full) or suppressed (rate limited).')
+describe('bitesnap_cache_requests_total', 'counter', 'Cache reads by tier (l1 per process, l2 shared) and result.')
+describe('bitesnap_cache_l1_entries', 'gauge', 'Values held in the per-process cache tier.')
+describe('bitesnap_cache_l1_invalidations_total', 'counter', 'Key groups dropped from the per-process tier after writes elsewhere.')
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Per-process metric store made of lock-free per-thread shards."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._collectors = []
+        self._last_flush = 0.0
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = ({}, {})
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels, value=1):
+        counters = self._shard()[0]
+        key = (name, label_key(labels))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()[1]
+        key = (name, label_key(labels))
+        histogram = histograms.get(key)
+        if histogram is None:
+            # Per-bucket counts (non-cumulative, last one is +Inf), then count and sum
+            histogram = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0, 0.0]
+        histogram[bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram[-2] += 1
+        histogram[-1] += value
+
+    def register_collector(self, collector):
+        """
+        Add a callable returning [(name, labels, value), ...] read at snapshot time.
+
+        Use it for values owned by other components, e.g. cache hit counters.
+        """
+        self._collectors.append(collector)
+        return collector
+
+    def snapshot(self):
+        counters = {}
+        gauges = {}
+        histograms = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard_counters, shard_histograms in shards:
+            for key, value in dict(shard_counters).items():
+                counters[key] = counters.get(key, 0) + value
+            for key, values in dict(shard_histograms).items():
+                merged = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(list(values)):
+                    merged[i] += value
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    key = (name, label_key(labels))
+                    values = gauges if METRICS.get(name, ('untyped',))[0] == 'gauge' else counters
+                    values[key] = values.get(key, 0) + value
+            except Exception:
+                logger.exception('Metrics collector failed')
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'gauges': [[name, list(labels), value] for (name, labels), value in gauges.items()],
+            'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()],
+        }
+
+    def maybe_flush(self):
+        """Write this process's snapshot to METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds."""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as tmp:
+            json.dump(self.snapshot(), tmp)
+        os.replace(tmp_path, os.path.join(directory, snapshot_file()))
+
+    def reset(self):
+        with self._lock:
+            for counters, histograms in self._shards:
+                counters.clear()
+                histograms.clear()
+
+
+registry = Registry()
+
+
+@registry.register_collector
+def connection_pool_metrics():
+    samples = []
+    for alias, stats in pool_stats().items():
+        for state in ('idle', 'in_use'):
+            samples.append(('bitesnap_db_pool_connections', {'alias': alias, 'state': state}, stats[state]))
+        for event in ('created', 'reused', 'discarded', 'waits', 'timeouts'):
+            samples.append(('bitesnap_db_pool_events_total', {'alias': alias, 'event': event}, stats[event]))
+    return samples
+
+
+@registry.register_collector
+def log_metrics():
+    return [
+        ('bitesnap_log_records_total', {'outcome': outcome}, count)
+        for outcome, count in log.stats().items()
+    ]
+
+
+@registry.register_collector
+def tiered_cache_metrics():
+    samples = []
+    for alias, stats in cache_stats().items():
+        for tier in ('l1', 'l2'):
+            samples.append(('bitesnap_cache_requests_total', {'alias': alias, 'tier': tier, 'result': 'hit'},
+                            stats[f'{tier}_hits']))
+            samples.append(('bitesnap_cache_requests_total', {'alias': alias, 'tier': tier, 'result': 'miss'},
+                            stats[f'{tier}_misses']))
+        samples.append(('bitesnap_cache_l1_entries', {'alias': alias}, stats['l1_entries']))
+        samples.append(('bitesnap_cache_l1_invalidations_total', {'alias': alias}, stats['invalidations']))
+    return samples
+
+
+def merge_snapshots(snapshots):
+    """Counters and gauges (both by series) and histograms of all snapshots."""
+    counters = {}
+    gauges = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot.get('gauges', ()):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if key not in gauges:
+                gauges[key] = value
+            elif name in MAX_GAUGES:
+                gauges[key] = max(gauges[key], value)
+            else:
+                gauges[key] += value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+    return counters, gauges, histograms
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def exited(name):
+    """Whether the snapshot file name is that of a process of this host that is gone."""
+    host, _, pid = name[:-len('.json')].rpartition('-')
+    return host == socket.gethostname() and pid.isdigit() and not process_alive(int(pid))
+
+
+def collect_snapshots():
+    """This process's live snapshot plus the last flushed snapshot of every other worker."""
+    snapshots = [registry.snapshot()]
+    directory = settings.METRICS_DIR
+    if directory and os.path.isdir(directory):
+        own_file = snapshot_file()
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or name == own_file:
+                continue
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if exited(name):
+                # Its counts still add up; its connections, entries and lag are gone with it
+                snapshot.pop('gauges', None)
+            snapshots.append(snapshot)
+    return snapshots
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render(snapshots):
+    """Render merged snapshots in the Prometheus text exposition format."""
+    counters, gauges, histograms = merge_snapshots(snapshots)
+    lines = []
+    series = {}
+    for (name, labels), value in list(counters.items()) + list(gauges.items()):
+        series.setdefault(name, []).append((labels, value))
+    for (name, labels), values in histograms.items():
+        series.setdefault(name, []).append((labels, values))
+
+    for name in sorted(series):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(series[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_count{format_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Expose metrics of all workers in Prometheus text format."""
+    return HttpResponse(render(collect_snapshots()), content_type=CONTENT_TYPE)
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts queries and their total duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, response size and database usage per route.
+
+    Routes are labelled with the resolved URL name, e.g. ``recipes-list``,
+    so ids in paths do not create new series. The middleware is async
+    capable so it does not force async views back onto a thread; database
+    usage is only recorded for synchronous requests.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, elapsed, recorder=None):
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        route = route or 'unnamed'
+        registry.inc('bitesnap_http_requests_total', {
+            'route': route, 'method': request.method, 'status': str(response.status_code),
+        })
+        registry.observe('bitesnap_http_request_duration_seconds', {
+            'route': route, 'method': request.method,
+        }, elapsed)
+        if not response.streaming:
+            registry.inc('bitesnap_http_response_bytes_total', {'route': route}, len(response.content))
+        if recorder is not None and recorder.count:
+            registry.inc('bitesnap_db_queries_total', {'route': route}, recorder.count)
+            registry.inc('bitesnap_db_query_duration_seconds_total', {'route': route}, recorder.duration)
+
+        try:
+            registry.maybe_flush()
+        except OSError as e:
+            logger.warning(f'Could not write metrics snapshot: {e}')
@@ -0,0 +1,261 @@
+"""
+Transactional outbox of domain change events.
+
+Signals (api.signals) write an OutboxEvent row for every change to a recipe,
+recipe ingredient, favorite, tag or ingredient. Writes made through the API
+run in a transaction, so the event commits or rolls back with the change
+itself and survives a crash that in-process signals would not. Writers
+that send no signals publish their own events in the same transaction:
+publish_many() after bulk_create(), write_many() for the raw recipes.bulk
+writers of the import and dataset commands.
+
+The dispatch_outbox command delivers events in id order and in batches to
+the consumers registered here, each with its own checkpoint:
+
+    @consumers.register('search-index', topics=['recipe'])
+    def reindex(events):
+        ...
+
+Delivery is at least once. A consumer's batch and its checkpoint are
+committed together; if the consumer raises, the checkpoint stays and the
+same batch is offered again on the next pass, so consumers must tolerate
+repeats. Events younger than OUTBOX_SETTLE_SECONDS are held back, because a
+transaction can commit a lower id after a higher one was delivered.
+
+Lag and failures are kept for /metrics by the dispatcher process, which
+publishes them through METRICS_DIR like any worker.
+"""
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from api.metrics import describe, registry
+from recipes.models import Favorite, Ingredient, OutboxCheckpoint, OutboxEvent, Recipe, RecipeIngredient, Tag
+
+logger = logging.getLogger(__name__)
+
+# Topic and the fields copied into the payload, so consumers rarely need to read the object back
+TOPICS = {
+    Recipe: ('recipe', ('author_id',)),
+    RecipeIngredient: ('recipe_ingredient', ('recipe_id', 'ingredient_id')),
+    Favorite: ('favorite', ('user_id', 'recipe_id')),
+    Tag: ('tag', ('slug',)),
+    Ingredient: ('ingredient', ()),
+}
+
+
+def build_event(instance, action, **payload):
+    topic, fields = TOPICS[type(instance)]
+    data = {field: getattr(instance, field) for field in fields}
+    data.update(payload)
+    return OutboxEvent(topic=topic, action=action, object_id=instance.pk, payload=data)
+
+
+def publish(instance, action, **payload):
+    """Record a change of instance; call it inside the transaction making the change."""
+    build_event(instance, action, **payload).save()
+
+
+def publish_many(instances, action):
+    """publish() for rows written with bulk_create(), which sends no signals."""
+    OutboxEvent.objects.bulk_create([build_event(instance, action) for instance in instances])
+
+
+def recipe_events(recipe, tag_ids):
+    """The events of creating recipe with tag_ids through the API: the save, then tags.set()."""
+    return [
+        build_event(recipe, OutboxEvent.CREATED),
+        build_event(recipe, OutboxEvent.UPDATED, fields=['tags'], tag_ids=sorted(tag_ids)),
+    ]
+
+
+def write_many(writer, events):
+    """Insert built events through a recipes.bulk writer, in the transaction of its rows."""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    writer.insert(
+        OutboxEvent._meta.db_table,
+        ['topic', 'action', 'object_id', 'payload', 'created_at'],
+        [(event.topic, event.action, event.object_id, json.dumps(event.payload), now) for event in events]
+    )
+
+
+class Consumer:
+    """A named handler of event batches, optionally limited to some topics."""
+
+    def __init__(self, name, handler, topics=None):
+        self.name = name
+        self.handler = handler
+        self.topics = frozenset(topics) if topics else None
+
+    def wants(self, event):
+        return self.topics is None or event.topic in self.topics
+
+
+class ConsumerRegistry:
+    """In-process consumers of the outbox, by name (the key of their checkpoint)."""
+
+    def __init__(self):
+        self._consumers = {}
+
+    def register(self, name, topics=None):
+        """Decorator registering handler(events) for all events, or those of the given topics."""
+        def decorator(handler):
+            if name in self._consumers:
+                raise ValueError(f'Outbox consumer {name} is already registered')
+            self._consumers[name] = Consumer(name, handler, topics)
+            return handler
+        return decorator
+
+    def unregister(self, name):
+        self._consumers.pop(name, None)
+
+    def get(self, name):
+        return self._consumers[name]
+
+    def __iter__(self):
+        return iter(list(self._consumers.values()))
+
+
+consumers = ConsumerRegistry()
+
+
+def settled_events():
+    cutoff = timezone.now() - timedelta(seconds=settings.OUTBOX_SETTLE_SECONDS)
+    return OutboxEvent.objects.filter(created_at__lte=cutoff).order_by('id')
+
+
+class DeliveryStats:
+    """Per-consumer delivery counts and lag of this process, for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._consumers = {}
+
+    def update(self, name, **values):
+        with self._lock:
+            stats = self._consumers.setdefault(
+                name, {'delivered': 0, 'failures': 0, 'lag_events': 0, 'lag_seconds': 0.0},
+            )
+            for key in ('delivered', 'failures'):
+                stats[key] += values.pop(key, 0)
+            stats.update(values)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._consumers.items()}
+
+    def clear(self):
+        with self._lock:
+            self._consumers.clear()
+
+
+delivery_stats = DeliveryStats()
+
+
+class Dispatcher:
+    """
+    Delivers settled events to consumers, one batch per consumer and pass.
+
+    After a pass, backlogged tells whether any consumer read a full batch
+    and so probably has more events waiting.
+    """
+
+    def __init__(self, selected=None, batch_size=None):
+        self.consumers = list(selected if selected is not None else consumers)
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.backlogged = False
+
+    def run_once(self):
+        """Deliver one batch to every consumer; returns the number of events read past."""
+        read = 0
+        self.backlogged = False
+        for consumer in self.consumers:
+            try:
+                count = self.deliver(consumer)
+                read += count
+                self.backlogged = self.backlogged or count >= self.batch_size
+            except Exception:
+                delivery_stats.update(consumer.name, failures=1)
+                OutboxCheckpoint.objects.filter(consumer=consumer.name).update(failures=F('failures') + 1)
+                logger.exception(f'Outbox consumer {consumer.name} failed, the batch will be retried')
+        self.measure_lag()
+        return read
+
+    def deliver(self, consumer):
+        OutboxCheckpoint.objects.get_or_create(consumer=consumer.name)
+        with transaction.atomic():
+            # Another dispatcher delivering to this consumer holds the row (PostgreSQL)
+            checkpoint = (
+                OutboxCheckpoint.objects.select_for_update(skip_locked=True).filter(consumer=consumer.name).first()
+            )
+            if checkpoint is None:
+                return 0
+            events = list(settled_events().filter(id__gt=checkpoint.position)[:self.batch_size])
+            if not events:
+                return 0
+            batch = [event for event in events if consumer.wants(event)]
+            if batch:
+                consumer.handler(batch)
+            checkpoint.position = events[-1].id
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        delivery_stats.update(consumer.name, delivered=len(batch))
+        return len(events)
+
+    def measure_lag(self):
+        head = OutboxEvent.objects.aggregate(head=Max('id'))['head'] or 0
+        positions = dict(
+            OutboxCheckpoint.objects.filter(consumer__in=[consumer.name for consumer in self.consumers])
+            .values_list('consumer', 'position')
+        )
+        now = timezone.now()
+        for consumer in self.consumers:
+            position = positions.get(consumer.name, 0)
+            pending = OutboxEvent.objects.filter(id__gt=position).order_by('id')
+            oldest = pending.values_list('created_at', flat=True).first()
+            delivery_stats.update(
+                consumer.name,
+                # Ids are not gapless, so this is an upper bound
+                lag_events=max(head - position, 0),
+                lag_seconds=(now - oldest).total_seconds() if oldest else 0.0,
+            )
+
+
+def prune(before):
+    """Delete events older than before that every registered consumer has processed."""
+    names = [consumer.name for consumer in consumers]
+    events = OutboxEvent.objects.filter(created_at__lt=before)
+    if names:
+        checkpoints = OutboxCheckpoint.objects.filter(consumer__in=names)
+        if checkpoints.count() < len(names):
+            # A consumer that never ran has not processed anything
+            return 0
+        events = events.filter(id__lte=checkpoints.aggregate(lowest=Min('position'))['lowest'])
+    deleted, _ = events.delete()
+    return deleted
+
+
+describe('bitesnap_outbox_events_delivered_total', 'counter', 'Outbox events handed to each consumer.')
+describe('bitesnap_outbox_delivery_failures_total', 'counter', 'Outbox batches a consumer failed to process.')
+# Every dispatcher measures the whole lag, so it is not summed over them
+describe('bitesnap_outbox_lag_events', 'gauge', 'Outbox events not yet processed by each consumer (upper bound).',
+         merge='max')
+describe('bitesnap_outbox_lag_seconds', 'gauge', 'Age of the oldest outbox event not yet processed by each consumer.',
+         merge='max')
+
+
+@registry.register_collector
+def outbox_metrics():
+    samples = []
+    for name, stats in delivery_stats.stats().items():
+        labels = {'consumer': name}
+        samples.append(('bitesnap_outbox_events_delivered_total', labels, stats['delivered']))
+        samples.append(('bitesnap_outbox_delivery_failures_total', labels, stats['failures']))
+        samples.append(('bitesnap_outbox_lag_events', labels, stats['lag_events']))
+        samples.append(('bitesnap_outbox_lag_seconds', labels, stats['lag_seconds']))
+    return samples
@@ -0,0 +1,173 @@
+"""
+Full-response cache for anonymous recipe list requests.
+
+For anonymous callers is_favorited is always false, so a list page depends
+only on page, limit, tags and author. Rendered pages are cached under those
+normalized parameters and the current catalog version; signals bump the
+version whenever a recipe, tag, ingredient or user changes, so old entries
+are never read again and simply expire. Pages are filled through
+api.caching, so a popular page is rendered once however many requests miss
+it at the same time. Cache-Control and Vary headers let a CDN keep the
+pages as well, without ever serving them to token holders.
+
+Pages are rendered from the primary even in requests that read from
+replicas: a replica may not have replayed the change that bumped the
+version yet, and its old rows would be cached under the new version.
+
+The outbox consumer below bumps the version once more for every batch of
+catalog events, which repairs a bump lost when a process died between a
+commit and its on-commit hook.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from api.caching import single_flight
+from api.metrics import describe, registry
+from api.outbox import consumers
+from bitesnap.db.replicas import replica_reads
+
+CACHE_KEY_PREFIX = 'recipe-list'
+# Outside the page key groups, so bumping it invalidates no L1 (bitesnap.cache):
+# pages of older versions are simply never read again
+VERSION_KEY = 'catalog-version'
+
+# Anonymous and token responses differ (is_favorited), as do renderers
+VARY = ('Accept', 'Authorization')
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Never restart from 1: entries of an evicted version could be read again
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate():
+    """
+    Make every cached page stale.
+
+    The version is bumped again on commit: a page rendered from the old rows
+    while the transaction was open must not stay cached under the new version.
+    """
+    bump_catalog_version()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump_catalog_version)
+
+
+def on_primary(compute):
+    """compute() for a value cached under the current catalog version (see the module docstring)."""
+    with replica_reads(False):
+        return compute()
+
+
+def cache_key(request, page_size):
+    params = request.query_params
+    parts = (
+        request.build_absolute_uri('/'),
+        request.accepted_media_type,
+        params.get('page', '1'),
+        str(page_size),
+        ','.join(sorted(set(params.getlist('tags')))),
+        params.get('author', ''),
+    )
+    digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+    return f'{CACHE_KEY_PREFIX}:{catalog_version()}:{digest}'
+
+
+class RenderedResponse(HttpResponse):
+    """A cached page replayed as the content it was rendered to."""
+
+    def __init__(self, content, content_type):
+        super().__init__(content, content_type=content_type)
+
+
+class RecipeListCache:
+    """Lookup/store for RecipeViewSet.list, with hit and miss counts for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, request):
+        return (
+            settings.RECIPE_LIST_CACHE_TTL > 0
+            and request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def respond(self, request, view, list_view):
+        key = cache_key(request, view.paginator.get_page_size(request))
+        rendered = []
+
+        def render():
+            response = on_primary(list_view)
+            rendered.append(response)
+            if response.status_code != 200:
+                return None
+            renderer = request.accepted_renderer
+            content_type = request.accepted_media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            content = renderer.render(response.data, request.accepted_media_type, view.get_renderer_context())
+            return content, content_type
+
+        cached = single_flight.get_or_set(
+            key, render, settings.RECIPE_LIST_CACHE_TTL, settings.RECIPE_LIST_CACHE_STALE_TTL,
+        )
+        with self._lock:
+            if rendered:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if cached is None:
+            return rendered[0]
+        response = RenderedResponse(*cached)
+        patch_cache_control(response, public=True, max_age=settings.RECIPE_LIST_CACHE_MAX_AGE)
+        patch_vary_headers(response, VARY)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+recipe_list_cache = RecipeListCache()
+
+
+describe('bitesnap_recipe_list_cache_lookups_total', 'counter', 'Anonymous recipe list cache lookups by result.')
+
+
+@registry.register_collector
+def recipe_list_cache_metrics():
+    stats = recipe_list_cache.stats()
+    return [
+        ('bitesnap_recipe_list_cache_lookups_total', {'result': 'hit'}, stats['hits']),
+        ('bitesnap_recipe_list_cache_lookups_total', {'result': 'miss'}, stats['misses']),
+    ]
+
+
+@consumers.register('recipe-list-cache', topics=['recipe', 'recipe_ingredient', 'tag', 'ingredient'])
+def invalidate_from_outbox(events):
+    bump_catalog_version()
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from djoser.serializers import UserCreateSerializer, UserSerializer as DjoserUserSerializer
@@ -6,8 +8,10 @@ from drf_extra_fields.fields import Base64ImageField
 
 from recipes.models import (
     Tag, Ingredient, Recipe, RecipeIngredient,
-    Favorite
+    Favorite, OutboxEvent
 )
+from api import outbox
+from api.images import variant_url
 
 User = get_user_model()
 
@@ -98,17 +102,20 @@ class RecipeListSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     image = serializers.ImageField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'image_variants', 'text', 'cooking_time'
         )
 
     def get_is_favorited(self, obj):
         """Check if recipe is in user's favorites."""
+        if hasattr(obj, 'user_has_favorited'):
+            return obj.user_has_favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Favorite.objects.filter(
@@ -116,6 +123,23 @@ class RecipeListSerializer(serializers.ModelSerializer):
             ).exists()
         return False
 
+    def get_image_variants(self, obj):
+        """Return URLs of resized image variants keyed by size name."""
+        request = self.context.get('request')
+        return {
+            size: variant_url(obj.image, size, request)
+            for size in settings.IMAGE_VARIANT_SIZES
+        } if obj.image else {}
+
+
+class RecipeChangeSerializer(RecipeListSerializer):
+    """
+    Serializer for recipes returned by delta sync, with their last update time.
+    """
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ('updated_at',)
+
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """
@@ -190,7 +214,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
     def create_ingredients(self, ingredients_data, recipe):
-        RecipeIngredient.objects.bulk_create([
+        recipe_ingredients = RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
                 ingredient=ingredient_data['ingredient'],
@@ -198,7 +222,9 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             )
             for ingredient_data in ingredients_data
         ])
+        outbox.publish_many(recipe_ingredients, OutboxEvent.CREATED)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create recipe with ingredients and tags."""
         ingredients_data = validated_data.pop('ingredients')
@@ -210,6 +236,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe with ingredients and tags."""
         ingredients_data = validated_data.pop('ingredients', None)
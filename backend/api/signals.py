@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import changes, outbox, response_cache
+from api.authentication import token_cache
+from api.metrics import registry
+from recipes.models import Favorite, Ingredient, OutboxEvent, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop the cached user of a token removed by logout or user deletion."""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Password changes and deactivation must not be served from the token cache."""
+    if created:
+        return
+    keys = list(Token.objects.filter(user=instance).values_list('key', flat=True))
+    if keys:
+        token_cache.invalidate(*keys)
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    """Count connection setups; with persistent connections this should stay flat."""
+    registry.inc('bitesnap_db_connections_opened_total', {'alias': connection.alias})
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_list_cache(sender, **kwargs):
+    """Anything shown in the recipe list changed: cached anonymous pages are stale."""
+    response_cache.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_recipe_list_authors(sender, update_fields=None, **kwargs):
+    """Author names are part of the recipe list; logins (last_login only) are not."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    response_cache.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def record_recipe_saved(sender, instance, **kwargs):
+    changes.record_recipe(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def record_recipe_deleted(sender, instance, **kwargs):
+    changes.record_recipe(instance.pk, deleted=True)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def record_recipe_tagged(sender, instance, action, reverse, pk_set, **kwargs):
+    """Tags are set after the recipe is saved, so retagging alone must be recorded too."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        changes.record_recipe(instance.pk)
+    elif pk_set:
+        # tag.recipes.add(...): instance is the tag
+        for recipe_id in pk_set:
+            changes.record_recipe(recipe_id)
+
+
+@receiver(post_save, sender=Favorite)
+def record_favorite_added(sender, instance, created, **kwargs):
+    if created:
+        changes.record_favorite(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=Favorite)
+def record_favorite_removed(sender, instance, **kwargs):
+    changes.record_favorite(instance.user_id, instance.recipe_id, deleted=True)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def publish_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Outbox event in the transaction of the save (api.outbox)."""
+    if created:
+        outbox.publish(instance, OutboxEvent.CREATED)
+    elif update_fields is not None:
+        outbox.publish(instance, OutboxEvent.UPDATED, fields=sorted(update_fields))
+    else:
+        outbox.publish(instance, OutboxEvent.UPDATED)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def publish_deleted(sender, instance, **kwargs):
+    outbox.publish(instance, OutboxEvent.DELETED)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def publish_retagged(sender, instance, action, reverse, pk_set, **kwargs):
+    """A recipe's tags (or a tag's recipes) changed; recorded on the side that was changed."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    field, related = ('recipes', 'recipe_ids') if reverse else ('tags', 'tag_ids')
+    outbox.publish(instance, OutboxEvent.UPDATED, fields=[field], **{related: sorted(pk_set or ())})
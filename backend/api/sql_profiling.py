@@ -0,0 +1,225 @@
+"""
+Per-request SQL profiling and N+1 detection.
+
+A profiled request records every query, groups them by normalized shape
+and flags shapes repeated SQL_PROFILING_N_PLUS_ONE_THRESHOLD times or more
+as N+1 candidates, together with the project stack that issued them.
+
+Requests are profiled when a staff user (or anyone, with DEBUG) sends
+``X-Profile-SQL: 1``, and otherwise for a random SQL_PROFILING_SAMPLE_RATE
+fraction. Profiled responses to staff (or any response with DEBUG) carry
+a summary in X-SQL-* headers; full profiles are kept in the cache and
+listed at /api/debug/sql-profiles/.
+"""
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework import exceptions
+
+from api.authentication import CachedTokenAuthentication
+from api.metrics import describe, registry
+
+CACHE_KEY_PREFIX = 'sql-profile'
+
+STACK_DEPTH = 6
+
+# Middleware and execute wrappers sitting between the view and the database:
+# their frames say nothing about which code issued a query.
+INSTRUMENTATION_MODULES = frozenset({
+    __name__,
+    'api.metrics',
+    'bitesnap.db.replicas',
+    'bitesnap.log',
+    'bitesnap.staticfiles',
+    'bitesnap.tracing',
+})
+
+describe('bitesnap_sql_profiles_total', 'counter', 'Requests profiled by the SQL profiler, by route.')
+describe('bitesnap_sql_n_plus_one_total', 'counter', 'Repeated query shapes (N+1 candidates) seen in profiled requests.')
+
+QUOTED = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Reduce a query to its shape: literals become ? and IN lists collapse."""
+    sql = QUOTED.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def project_stack():
+    """The innermost project frames, outside site-packages and INSTRUMENTATION_MODULES."""
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base_dir) and 'site-packages' not in filename
+            and frame.f_globals.get('__name__') not in INSTRUMENTATION_MODULES
+        ):
+            frames.append(f'{filename[len(base_dir) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+class QueryProfile:
+    """Database execute wrapper collecting queries grouped by shape."""
+
+    def __init__(self):
+        self.shapes = {}
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            shape = normalize(sql)
+            entry = self.shapes.get(shape)
+            if entry is None:
+                entry = self.shapes[shape] = {'count': 0, 'duration': 0.0, 'stack': None}
+            entry['count'] += 1
+            entry['duration'] += elapsed
+            # The first repetition is the call site worth reporting; later
+            # ones would only repeat the same stack.
+            if entry['count'] == 2:
+                entry['stack'] = project_stack()
+
+    def summary(self):
+        threshold = settings.SQL_PROFILING_N_PLUS_ONE_THRESHOLD
+        groups = sorted(self.shapes.items(), key=lambda item: item[1]['count'], reverse=True)
+        return {
+            'queries': self.count,
+            'duration_ms': round(self.duration * 1000, 2),
+            'shapes': [
+                {
+                    'sql': shape,
+                    'count': entry['count'],
+                    'duration_ms': round(entry['duration'] * 1000, 2),
+                    'n_plus_one': entry['count'] >= threshold,
+                    'stack': entry['stack'],
+                }
+                for shape, entry in groups
+            ],
+        }
+
+
+class ProfileStore:
+    """Profiles in the shared cache, plus the ids of this process's recent ones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=settings.SQL_PROFILING_RECENT)
+
+    def save(self, profile):
+        cache.set(f'{CACHE_KEY_PREFIX}:{profile["id"]}', profile, settings.SQL_PROFILING_TTL)
+        with self._lock:
+            self._recent.appendleft(profile['id'])
+
+    def get(self, profile_id):
+        return cache.get(f'{CACHE_KEY_PREFIX}:{profile_id}')
+
+    def recent(self):
+        with self._lock:
+            ids = list(self._recent)
+        profiles = cache.get_many([f'{CACHE_KEY_PREFIX}:{profile_id}' for profile_id in ids])
+        return [profile for profile in profiles.values() if profile]
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+
+store = ProfileStore()
+
+
+def is_staff(request):
+    """Staff check for session or token users; token lookups are cached."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    if 'HTTP_AUTHORIZATION' not in request.META:
+        return False
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+class SQLProfilingMiddleware:
+    """
+    Profile the SQL of sampled or explicitly requested requests.
+
+    Must come after AuthenticationMiddleware. Unprofiled requests pay for a
+    header lookup and one random() call. The middleware is async capable so
+    it does not force async views back onto a thread; their queries run on
+    other threads and are not profiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = request.headers.get('X-Profile-SQL') == '1'
+        show = requested and (settings.DEBUG or is_staff(request))
+        if not show and random.random() >= settings.SQL_PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = QueryProfile()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        summary = profile.summary()
+        summary.update({
+            'id': uuid.uuid4().hex,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': route,
+            'status': response.status_code,
+        })
+        store.save(summary)
+
+        n_plus_one = sum(1 for shape in summary['shapes'] if shape['n_plus_one'])
+        registry.inc('bitesnap_sql_profiles_total', {'route': route})
+        if n_plus_one:
+            registry.inc('bitesnap_sql_n_plus_one_total', {'route': route}, n_plus_one)
+
+        if show or settings.DEBUG or is_staff(request):
+            response['X-SQL-Queries'] = str(summary['queries'])
+            response['X-SQL-Time-ms'] = str(summary['duration_ms'])
+            response['X-SQL-N-Plus-One'] = str(n_plus_one)
+            response['X-SQL-Profile'] = summary['id']
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
@@ -1,7 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from api.views import UserViewSet, TagViewSet, IngredientViewSet, RecipeViewSet
+from api import async_views
+from api.views import (
+    UserViewSet, TagViewSet, IngredientViewSet, RecipeViewSet, ExportViewSet, SQLProfileViewSet, BatchViewSet
+)
 
 app_name = 'api'
 
@@ -10,12 +13,23 @@ router.register('users', UserViewSet, basename='users')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
+router.register('export', ExportViewSet, basename='export')
+router.register('debug/sql-profiles', SQLProfileViewSet, basename='sql-profiles')
+router.register('batch', BatchViewSet, basename='batch')
 
 urlpatterns = [
     # Authentication endpoints (djoser)
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 
+    # Async read-only endpoints (for ASGI deployments)
+    path('async/recipes/', async_views.recipe_list, name='async-recipes-list'),
+    path('async/recipes/<int:pk>/', async_views.recipe_detail, name='async-recipes-detail'),
+    path('async/tags/', async_views.tag_list, name='async-tags-list'),
+    path('async/tags/<int:pk>/', async_views.tag_detail, name='async-tags-detail'),
+    path('async/ingredients/', async_views.ingredient_list, name='async-ingredients-list'),
+    path('async/ingredients/<int:pk>/', async_views.ingredient_detail, name='async-ingredients-detail'),
+
     # API endpoints
     path('', include(router.urls)),
 ]
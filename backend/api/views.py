@@ -1,9 +1,15 @@
+from functools import partial
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny, IsAdminUser
 from djoser.views import UserViewSet as DjoserUserViewSet
 
 from recipes.models import (
@@ -13,16 +19,41 @@ from recipes.models import (
 from api.serializers import (
     UserSerializer,
     TagSerializer, IngredientSerializer,
-    RecipeListSerializer, RecipeCreateUpdateSerializer,
+    RecipeListSerializer, RecipeChangeSerializer, RecipeCreateUpdateSerializer,
     FavoriteSerializer
 )
+from api import batch
 from api.filters import RecipeFilter, IngredientFilter
 from api.permissions import IsAuthorOrReadOnly
 from api.pagination import CustomPageNumberPagination
+from api.exports import export_response, iter_recipes, iter_favorites
+from api.sql_profiling import store as sql_profile_store
+from api.response_cache import VARY, catalog_version, on_primary, recipe_list_cache
+from api.caching import single_flight
+from api.changes import CursorExpired, head_cursor, read_changes
 
 User = get_user_model()
 
 
+def get_recipe_queryset(user):
+    """
+    Recipes with everything RecipeListSerializer reads loaded up front.
+
+    is_favorited is computed in the same query, so serializing a page never
+    queries per recipe (required by the async views, which cannot).
+    """
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        'tags', 'recipe_ingredients__ingredient'
+    )
+    if user is not None and user.is_authenticated:
+        return queryset.annotate(
+            user_has_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        )
+    return queryset.annotate(user_has_favorited=Value(False))
+
+
 class UserViewSet(DjoserUserViewSet):
     """
     ViewSet for user operations
@@ -54,6 +85,20 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """The tag list is the same for everyone and rarely changes, so it is cached."""
+        if settings.TAG_LIST_CACHE_TTL <= 0:
+            return super().list(request, *args, **kwargs)
+        data = single_flight.get_or_set(
+            f'tag-list:{catalog_version()}',
+            lambda: on_primary(
+                lambda: list(self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data)
+            ),
+            settings.TAG_LIST_CACHE_TTL,
+            settings.TAG_LIST_CACHE_STALE_TTL,
+        )
+        return Response(data)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -75,6 +120,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPageNumberPagination
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve']:
+            return get_recipe_queryset(self.request.user)
+        return super().get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        """Anonymous pages come from the response cache (see api.response_cache)."""
+        list_view = partial(super().list, request, *args, **kwargs)
+        if recipe_list_cache.cacheable(request):
+            return recipe_list_cache.respond(request, self, list_view)
+        response = list_view()
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        patch_vary_headers(response, VARY)
+        return response
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateUpdateSerializer
@@ -83,11 +144,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['get'], filterset_class=None, pagination_class=None)
+    def changes(self, request):
+        """
+        Recipes changed or deleted since ?since=<cursor>, and the caller's favorite changes.
+
+        Without since, returns the current cursor to sync from after loading the list.
+        """
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'cursor': head_cursor()})
+        if not since.isdigit():
+            return Response(
+                {'error': 'The since query parameter must be a cursor.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            data = read_changes(int(since), request.user, settings.RECIPE_CHANGES_PAGE_SIZE)
+        except CursorExpired:
+            return Response(
+                {'error': 'The cursor has expired; reload the recipe list.'},
+                status=status.HTTP_410_GONE
+            )
+        recipes = get_recipe_queryset(request.user).filter(pk__in=data['recipes']).order_by('id')
+        data['recipes'] = RecipeChangeSerializer(recipes, many=True, context=self.get_serializer_context()).data
+        response = Response(data)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     @action(
         detail=True,
         methods=['post', 'delete'],
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def favorite(self, request, pk=None):
         """Add or remove recipe from favorites."""
         user = request.user
@@ -111,3 +201,78 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         favorite.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Staff-only streaming NDJSON exports. Pass ?gzip=1 for a compressed download.
+    """
+    permission_classes = [IsAdminUser]
+
+    def wants_gzip(self, request):
+        return request.query_params.get('gzip') in ('1', 'true')
+
+    @action(detail=False, methods=['get'])
+    def recipes(self, request):
+        """Export the full recipe catalog."""
+        return export_response(iter_recipes(), 'recipes.ndjson', self.wants_gzip(request))
+
+    @action(detail=False, methods=['get'])
+    def favorites(self, request):
+        """Export one user's favorite recipes (?user=<id>)."""
+        user_id = request.query_params.get('user', '')
+        if not user_id.isdigit():
+            return Response(
+                {'error': 'The user query parameter is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        user = get_object_or_404(User, pk=user_id)
+        return export_response(
+            iter_favorites(user),
+            f'favorites-{user.pk}.ndjson',
+            self.wants_gzip(request)
+        )
+
+
+class SQLProfileViewSet(viewsets.ViewSet):
+    """
+    Staff-only access to SQL profiles captured by SQLProfilingMiddleware.
+
+    The list shows the profiles recorded by the worker that serves it; any
+    profile id from an X-SQL-Profile header can be retrieved.
+    """
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        """Recent profiles, without per-shape details."""
+        return Response([
+            {key: value for key, value in profile.items() if key != 'shapes'}
+            for profile in sql_profile_store.recent()
+        ])
+
+    def retrieve(self, request, pk=None):
+        """One profile with its query shapes and N+1 stacks."""
+        profile = sql_profile_store.get(pk)
+        if profile is None:
+            return Response({'detail': 'Profile not found or expired.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(profile)
+
+
+class BatchViewSet(viewsets.ViewSet):
+    """
+    Read-only API calls combined into one request (see api.batch).
+
+    Each sub-request is checked by its own view's permissions.
+    """
+    permission_classes = [AllowAny]
+
+    def list(self, request):
+        try:
+            responses = batch.run(request, request.query_params.getlist('url'))
+        except batch.BatchError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response({'responses': responses})
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
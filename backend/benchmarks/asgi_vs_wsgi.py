@@ -0,0 +1,70 @@
+"""
+Compare the synchronous WSGI API with the async read path under ASGI.
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 256 --duration 20
+
+Starts gunicorn twice against the benchmark database: once with sync
+workers serving /api/..., once with uvicorn workers serving /api/async/...,
+and drives both with the same number of concurrent keep-alive clients.
+Reports requests/sec and latency percentiles for each. Use the POSTGRES_*
+variables for meaningful numbers; SQLite serialises all database access.
+"""
+import argparse
+import sys
+
+from benchmarks.common import print_report, seed_recipes, setup_django, start_server
+from benchmarks.http_load import get_paths, run_load
+
+READ_PATHS = ['recipes/', 'recipes/?page=2', 'tags/', 'ingredients/?name=be']
+
+
+def start(args, port, asgi):
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '-c', '/dev/null',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--log-level', 'warning',
+    ]
+    if asgi:
+        command += ['--worker-class', 'uvicorn.workers.UvicornWorker', 'bitesnap.asgi:application']
+    else:
+        command += ['--threads', str(args.threads), 'bitesnap.wsgi:application']
+    return start_server(command, port)
+
+
+def measure(args, port, asgi):
+    prefix = '/api/async/' if asgi else '/api/'
+    paths = [prefix + path for path in READ_PATHS]
+    process = start(args, port, asgi)
+    try:
+        return run_load(f'http://127.0.0.1:{port}', get_paths(paths), paths, args.concurrency, args.duration)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=256)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    seed_recipes(args.recipes)
+
+    wsgi = measure(args, 8101, asgi=False)
+    asgi = measure(args, 8102, asgi=True)
+    print_report('asgi_vs_wsgi', {
+        'workers': args.workers,
+        'wsgi': wsgi['total'],
+        'asgi': asgi['total'],
+        'by_request': {'wsgi': wsgi['by_request'], 'asgi': asgi['by_request']},
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare gunicorn boot time and worker memory: plain CLI flags vs gunicorn.conf.py.
+
+    python -m benchmarks.boot --workers 4
+
+Starts gunicorn the way the Dockerfile used to (``--workers 2 --timeout 120``
+with the given worker count) and then with ``-c gunicorn.conf.py``, which
+preloads the application in the master. For each it reports the time until
+/health/live answers and the RSS and PSS of every worker. PSS counts shared
+copy-on-write pages proportionally, so it shows what preloading saves;
+it needs /proc/<pid>/smaps_rollup (Linux).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.common import DEFAULT_DATABASE, print_report, setup_django
+
+
+def memory_mb(pid):
+    """RSS and PSS of a process in MB (PSS is None where smaps_rollup is unavailable)."""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            for line in rollup:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:'):
+                    values[parts[0]] = int(parts[1]) / 1024
+    except OSError:
+        pass
+    return values.get('Rss:'), values.get('Pss:')
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def boot(command, port, workers):
+    env = dict(os.environ, SQLITE_PATH=os.environ.get('SQLITE_PATH', DEFAULT_DATABASE),
+               DEBUG='False', ALLOWED_HOSTS='127.0.0.1',
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers))
+    started = time.monotonic()
+    process = subprocess.Popen(command, env=env)
+    try:
+        deadline = started + 60
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/health/live', timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError('Server did not start')
+                time.sleep(0.05)
+        boot_seconds = time.monotonic() - started
+
+        # Let the remaining workers finish importing before measuring them.
+        deadline = time.monotonic() + 30
+        while len(child_pids(process.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        time.sleep(2)
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/tags/', timeout=5).read()
+
+        master_rss, master_pss = memory_mb(process.pid)
+        worker_memory = [memory_mb(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+
+    rss = [value for value, _ in worker_memory if value is not None]
+    pss = [value for _, value in worker_memory if value is not None]
+    return {
+        'boot_seconds': round(boot_seconds, 2),
+        'master_rss_mb': master_rss and round(master_rss, 1),
+        'worker_rss_mb': [round(value, 1) for value in rss],
+        'worker_pss_mb': [round(value, 1) for value in pss],
+        'total_pss_mb': round(sum(pss) + (master_pss or 0), 1) if pss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+
+    gunicorn = [sys.executable, '-m', 'gunicorn', '--log-level', 'warning']
+    # gunicorn reads ./gunicorn.conf.py by default; /dev/null gives the bare CLI behaviour.
+    cli = boot(gunicorn + ['-c', '/dev/null', '--bind', '127.0.0.1:8111', '--workers', str(args.workers), '--timeout', '120',
+                           'bitesnap.wsgi:application'], 8111, args.workers)
+    config = boot(gunicorn + ['-c', 'gunicorn.conf.py'], 8112, args.workers)
+    print_report('boot', {'workers': args.workers, 'cli_flags': cli, 'gunicorn_conf': config})
+
+
+if __name__ == '__main__':
+    main()
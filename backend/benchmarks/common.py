@@ -0,0 +1,111 @@
+"""
+Shared setup for the standalone benchmarks.
+
+Benchmarks are not collected by pytest. Run them from the backend directory,
+e.g. ``python -m benchmarks.export --recipes 1000000``. Without POSTGRES_HOST
+they use a dedicated SQLite file so the development database is untouched.
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench.sqlite3')
+
+
+def setup_django(database=DEFAULT_DATABASE):
+    """Configure Django against the benchmark database and migrate it."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bitesnap.settings')
+    os.environ.setdefault('SQLITE_PATH', database)
+    os.environ.setdefault('DEBUG', 'False')
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def seed_recipes(count, batch_size=10000):
+    """Top the database up to count recipes, each with two tags and three ingredients."""
+    from django.contrib.auth import get_user_model
+    from recipes.models import Tag, Ingredient, Recipe, RecipeIngredient
+
+    User = get_user_model()
+    author, _ = User.objects.get_or_create(
+        username='bench',
+        defaults={'email': 'bench@bitesnap.com', 'first_name': 'Bench', 'last_name': 'Mark'}
+    )
+    tags = [
+        Tag.objects.get_or_create(slug=f'bench-{i}', defaults={'name': f'Bench {i}'})[0]
+        for i in range(6)
+    ]
+    ingredients = [
+        Ingredient.objects.get_or_create(name=f'Bench ingredient {i}', measurement_unit='g')[0]
+        for i in range(50)
+    ]
+
+    existing = Recipe.objects.count()
+    TagThrough = Recipe.tags.through
+    while existing < count:
+        size = min(batch_size, count - existing)
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=f'Bench recipe {existing + i}',
+                text='Benchmark recipe description ' * 4,
+                cooking_time=10 + (existing + i) % 90,
+                image='recipes/images/bench.jpg',
+            )
+            for i in range(size)
+        ])
+        TagThrough.objects.bulk_create([
+            TagThrough(recipe_id=recipe.id, tag_id=tags[(recipe.id + offset) % len(tags)].id)
+            for recipe in recipes
+            for offset in (0, 1)
+        ])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[(recipe.id * 3 + offset) % len(ingredients)].id,
+                amount=offset + 1,
+            )
+            for recipe in recipes
+            for offset in range(3)
+        ])
+        existing += size
+        print(f'Seeded {existing}/{count} recipes', file=sys.stderr)
+
+
+def print_report(name, results):
+    """Print benchmark results as a single JSON document."""
+    print(json.dumps({'benchmark': name, **results}, indent=2))
+
+
+def start_server(command, port, timeout=30):
+    """Start a server process against the benchmark database and wait for /health/live."""
+    env = dict(os.environ, SQLITE_PATH=os.environ.get('SQLITE_PATH', DEFAULT_DATABASE),
+               DEBUG='False', ALLOWED_HOSTS='127.0.0.1')
+    process = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health/live', timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Server did not start')
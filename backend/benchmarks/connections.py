@@ -0,0 +1,71 @@
+"""
+Connection setup cost per request.
+
+    python -m benchmarks.connections --requests 500
+    POSTGRES_POOL=True python -m benchmarks.connections --requests 500
+
+Simulates requests by sending request_started/request_finished around a
+SELECT 1, exactly as Django's request handler does, once with
+CONN_MAX_AGE=0 (a new connection per request, the old default) and once
+with persistent connections. With POSTGRES_POOL=True the CONN_MAX_AGE=0
+run borrows from the in-process pool instead. Point the POSTGRES_*
+variables at the real database: SQLite connection setup is nearly free.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import print_report, setup_django
+
+
+def run(requests, conn_max_age):
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    setup_times = []
+    totals = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        connection.ensure_connection()
+        setup_times.append(time.perf_counter() - started)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        request_finished.send(sender=None)
+        totals.append(time.perf_counter() - started)
+    connection.close()
+
+    def ms(values, fraction):
+        return round(sorted(values)[int(fraction * (len(values) - 1))] * 1000, 3)
+
+    return {
+        'conn_max_age': conn_max_age,
+        'setup_ms_mean': round(statistics.mean(setup_times) * 1000, 3),
+        'setup_ms_p99': ms(setup_times, 0.99),
+        'request_ms_mean': round(statistics.mean(totals) * 1000, 3),
+        'request_ms_p99': ms(totals, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    pooled = connection.settings_dict['ENGINE'].endswith('postgresql_pool')
+    print_report('connections', {
+        'engine': connection.settings_dict['ENGINE'],
+        'requests': args.requests,
+        'pooled' if pooled else 'new_per_request': run(args.requests, 0),
+        'persistent': run(args.requests, 60),
+    })
+
+
+if __name__ == '__main__':
+    main()
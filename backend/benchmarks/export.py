@@ -0,0 +1,62 @@
+"""
+Export throughput and memory benchmark.
+
+    python -m benchmarks.export --recipes 1000000 [--gzip]
+
+Streams the whole catalog through the same generators the export endpoint
+uses and samples RSS while doing so; a flat RSS curve means memory does
+not grow with table size.
+"""
+import argparse
+import time
+
+from benchmarks.common import current_rss_mb, print_report, seed_recipes, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--gzip', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    seed_recipes(args.recipes)
+
+    from api.exports import iter_gzip, iter_ndjson, iter_recipes
+
+    sample_every = max(args.recipes // 10, 1)
+    rss_samples = []
+    exported = 0
+    written = 0
+
+    def counted(rows):
+        nonlocal exported
+        for row in rows:
+            exported += 1
+            if exported % sample_every == 0:
+                rss_samples.append({'rows': exported, 'rss_mb': round(current_rss_mb(), 1)})
+            yield row
+
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    chunks = iter_ndjson(counted(iter_recipes(chunk_size=args.chunk_size)))
+    if args.gzip:
+        chunks = iter_gzip(chunks)
+    for chunk in chunks:
+        written += len(chunk)
+    elapsed = time.perf_counter() - started
+
+    print_report('export', {
+        'rows': exported,
+        'bytes': written,
+        'gzip': args.gzip,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(exported / elapsed),
+        'rss_before_mb': round(rss_before, 1),
+        'rss_samples': rss_samples,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Minimal asyncio HTTP/1.1 load generator.
+
+Each virtual client keeps one keep-alive connection and issues requests
+back to back, so thousands of concurrent clients fit in one process
+without threads. Used by the ASGI/WSGI comparison and the load scenarios.
+
+    python -m benchmarks.http_load http://127.0.0.1:8000 /api/recipes/ --concurrency 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.common import print_report
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    def summary(self, elapsed):
+        ordered = sorted(self.latencies)
+
+        def pct(fraction):
+            if not ordered:
+                return None
+            return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000, 2)
+
+        return {
+            'requests': len(ordered),
+            'errors': self.errors,
+            'statuses': self.statuses,
+            'requests_per_second': round(len(ordered) / elapsed, 1),
+            'latency_ms': {'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99), 'max': pct(1.0)},
+        }
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+    length = None
+    chunked = False
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        value = value.strip()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+        elif name == 'connection' and value.lower() == 'close':
+            keep_alive = False
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def client(host, port, choose_request, deadline, stats, rng):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        name, method, path, headers, body = choose_request(rng)
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            head = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: keep-alive']
+            head += [f'{key}: {value}' for key, value in (headers or {}).items()]
+            if body is not None:
+                head.append(f'Content-Length: {len(body)}')
+            request = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + (body or b'')
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            elapsed = time.perf_counter() - started
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats[name].errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        entry = stats[name]
+        entry.latencies.append(elapsed)
+        entry.statuses[status] = entry.statuses.get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load_async(base_url, choose_request, names, concurrency, duration, seed=0):
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    stats = {name: Stats() for name in names}
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(
+        client(host, port, choose_request, deadline, stats, random.Random(seed + i))
+        for i in range(concurrency)
+    ))
+    elapsed = time.monotonic() - started
+    total = Stats()
+    for entry in stats.values():
+        total.latencies.extend(entry.latencies)
+        total.errors += entry.errors
+        for status, count in entry.statuses.items():
+            total.statuses[status] = total.statuses.get(status, 0) + count
+    return {
+        'concurrency': concurrency,
+        'duration_seconds': round(elapsed, 1),
+        'total': total.summary(elapsed),
+        'by_request': {name: entry.summary(elapsed) for name, entry in stats.items()},
+    }
+
+
+def run_load(base_url, choose_request, names, concurrency, duration, seed=0):
+    """
+    Drive choose_request(rng) -> (name, method, path, headers, body) with
+    `concurrency` clients for `duration` seconds and return latency stats.
+    """
+    return asyncio.run(run_load_async(base_url, choose_request, names, concurrency, duration, seed))
+
+
+def get_paths(paths):
+    """A choose_request function cycling uniformly over GET paths."""
+    def choose(rng):
+        path = rng.choice(paths)
+        return path, 'GET', path, None, None
+    return choose
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+    print_report('http_load', run_load(
+        args.base_url, get_paths(args.paths), args.paths, args.concurrency, args.duration
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Micro-benchmarks of the API hot paths, in isolation from HTTP.
+
+    python -m benchmarks.micro --output baseline.json      # on the main branch
+    python -m benchmarks.micro --compare baseline.json     # on your branch
+
+Runs serializers and filters against a fixed dataset in
+benchmarks/micro.sqlite3 (generate_dataset with a fixed seed, created on
+first run) and records for each benchmark:
+
+- ops_per_sec: best of several timed rounds
+- queries: database queries per operation
+- alloc_peak_kb: peak memory allocated during one operation (tracemalloc)
+
+--compare exits with status 1 when a benchmark got slower or allocates
+more than --threshold (default 15%), or issues more queries than the
+baseline. Timings are only comparable between runs on the same machine.
+"""
+import argparse
+import base64
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import print_report, setup_django
+
+MICRO_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro.sqlite3')
+
+DATASET = {'users': 200, 'recipes': 2000, 'favorites': 10000, 'seed': 1}
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a setup function that returns the operation to measure."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def make_request(user, path='/api/recipes/'):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    request = Request(APIRequestFactory().get(path, HTTP_HOST='localhost'))
+    request.user = user
+    return request
+
+
+def image_data_uri(size=(64, 64)):
+    """A small PNG as the React app uploads it: a base64 data URI."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(200, 80, 40)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def load_fixtures():
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from recipes.management.commands.generate_dataset import USERNAME_PREFIX
+    from recipes.models import Ingredient, Tag
+
+    User = get_user_model()
+    if not User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+        call_command('generate_dataset', stdout=sys.stderr, **DATASET)
+    return {
+        'user': User.objects.get(username=f'{USERNAME_PREFIX}0'),
+        'tags': list(Tag.objects.order_by('id')[:2]),
+        'ingredients': list(Ingredient.objects.order_by('id')[:5]),
+    }
+
+
+def serializer_benchmark(fixtures, count):
+    from api.serializers import RecipeListSerializer
+    from api.views import get_recipe_queryset
+
+    request = make_request(fixtures['user'])
+    recipes = list(get_recipe_queryset(fixtures['user'])[:count])
+    return lambda: RecipeListSerializer(recipes, many=True, context={'request': request}).data
+
+
+@benchmark('recipe_list_serializer_page')
+def recipe_list_serializer_page(fixtures):
+    """RecipeListSerializer on one page (6) of prefetched recipes."""
+    return serializer_benchmark(fixtures, 6)
+
+
+@benchmark('recipe_list_serializer_50')
+def recipe_list_serializer_50(fixtures):
+    """RecipeListSerializer on 50 prefetched recipes."""
+    return serializer_benchmark(fixtures, 50)
+
+
+@benchmark('recipe_list_query_and_serialize')
+def recipe_list_query_and_serialize(fixtures):
+    """The list view's work without HTTP: fetch one page with prefetches, then serialize."""
+    from api.serializers import RecipeListSerializer
+    from api.views import get_recipe_queryset
+
+    request = make_request(fixtures['user'])
+
+    def run():
+        recipes = list(get_recipe_queryset(fixtures['user'])[:6])
+        return RecipeListSerializer(recipes, many=True, context={'request': request}).data
+    return run
+
+
+@benchmark('recipe_create_validate')
+def recipe_create_validate(fixtures):
+    """RecipeCreateUpdateSerializer.is_valid() on a typical create payload."""
+    from api.serializers import RecipeCreateUpdateSerializer
+
+    request = make_request(fixtures['user'])
+    payload = {
+        'name': 'Benchmark stew',
+        'text': 'Simmer everything for an hour.',
+        'cooking_time': 60,
+        'image': image_data_uri(),
+        'tags': [tag.id for tag in fixtures['tags']],
+        'ingredients': [{'id': ingredient.id, 'amount': 100} for ingredient in fixtures['ingredients']],
+    }
+
+    def run():
+        serializer = RecipeCreateUpdateSerializer(data=payload, context={'request': request})
+        assert serializer.is_valid(), serializer.errors
+    return run
+
+
+def recipe_filter_benchmark(fixtures, query):
+    from api.filters import RecipeFilter
+    from api.views import get_recipe_queryset
+
+    request = make_request(fixtures['user'], f'/api/recipes/?{query}')
+
+    def run():
+        queryset = get_recipe_queryset(fixtures['user'])
+        return list(RecipeFilter(request.query_params, queryset=queryset, request=request).qs[:6])
+    return run
+
+
+@benchmark('recipe_filter_tags')
+def recipe_filter_tags(fixtures):
+    """RecipeFilter by two tags, first page."""
+    return recipe_filter_benchmark(fixtures, '&'.join(f'tags={tag.slug}' for tag in fixtures['tags']))
+
+
+@benchmark('recipe_filter_favorited')
+def recipe_filter_favorited(fixtures):
+    """RecipeFilter is_favorited=1 for a user with favorites, first page."""
+    return recipe_filter_benchmark(fixtures, 'is_favorited=1')
+
+
+@benchmark('recipe_filter_author')
+def recipe_filter_author(fixtures):
+    """RecipeFilter by author, first page."""
+    return recipe_filter_benchmark(fixtures, f'author={fixtures["user"].id}')
+
+
+@benchmark('ingredient_filter')
+def ingredient_filter(fixtures):
+    """IngredientFilter typeahead on a two-letter prefix."""
+    from api.filters import IngredientFilter
+    from recipes.models import Ingredient
+
+    return lambda: list(IngredientFilter({'name': 'sa'}, queryset=Ingredient.objects.all()).qs)
+
+
+def measure(operation, rounds, round_time):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(3):
+        operation()
+
+    with CaptureQueriesContext(connection) as queries:
+        operation()
+
+    # A collection during the traced call would free garbage from earlier
+    # calls and hide part of the peak, so collect first and pause the GC.
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        operation()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+
+    rates = []
+    for _ in range(rounds):
+        count = 0
+        started = time.perf_counter()
+        while True:
+            operation()
+            count += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= round_time:
+                break
+        rates.append(count / elapsed)
+
+    return {
+        # The fastest round is the least disturbed by the rest of the machine (see timeit).
+        'ops_per_sec': round(max(rates), 1),
+        'queries': len(queries),
+        'alloc_peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return (rows, regressions) comparing two {name: result} mappings."""
+    rows = []
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append({'benchmark': name, 'status': 'new', **result})
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        memory = (result['alloc_peak_kb'] / base['alloc_peak_kb'] - 1) if base['alloc_peak_kb'] else 0.0
+        problems = []
+        if speed < -threshold:
+            problems.append(f'{speed:+.0%} ops/sec')
+        if result['queries'] > base['queries']:
+            problems.append(f'queries {base["queries"]} -> {result["queries"]}')
+        if memory > threshold:
+            problems.append(f'{memory:+.0%} peak allocation')
+        if problems:
+            regressions.append(f'{name}: {", ".join(problems)}')
+        rows.append({
+            'benchmark': name,
+            'status': 'regressed' if problems else 'ok',
+            'ops_per_sec_change': f'{speed:+.1%}',
+            'queries': f'{base["queries"]} -> {result["queries"]}',
+            'alloc_peak_change': f'{memory:+.1%}',
+        })
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='Write the results to this JSON file (a baseline)')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--round-time', type=float, default=0.3, help='Seconds per timed round')
+    args = parser.parse_args()
+
+    setup_django(MICRO_DATABASE)
+    fixtures = load_fixtures()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter in name:
+            results[name] = measure(setup(fixtures), args.rounds, args.round_time)
+            print(f'{name}: {results[name]}', file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'benchmarks': results}, file, indent=2, sort_keys=True)
+
+    if not args.compare:
+        print_report('micro', {'results': results})
+        return
+
+    with open(args.compare) as file:
+        baseline = json.load(file)['benchmarks']
+    rows, regressions = compare(baseline, results, args.threshold)
+    print_report('micro', {'threshold': args.threshold, 'comparison': rows, 'regressions': regressions})
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
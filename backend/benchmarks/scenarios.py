@@ -0,0 +1,138 @@
+"""
+Load scenario mirroring the React app's traffic mix.
+
+    python manage.py generate_dataset --users 100000 --recipes 1000000 --favorites 10000000
+    python -m benchmarks.scenarios --concurrency 100 --duration 60
+
+Without --base-url a gunicorn server is started with gunicorn.conf.py
+against the benchmark database (generated at the default scale if it has
+no generated users yet). With --base-url the target server must use the same
+database settings as this process, which reads ids and slugs from it.
+
+Requests are weighted like a browsing session: recipe list pages (mostly
+the first few), tag filters, recipe details, the tag list, ingredient
+typeahead while writing a recipe, and, for logged-in clients, the
+favorites page and favorite toggles. Reports throughput and latency
+percentiles overall and per request type.
+"""
+import argparse
+import json
+import sys
+import urllib.request
+from urllib.parse import quote
+
+from benchmarks.common import print_report, setup_django, start_server
+from benchmarks.http_load import run_load
+
+PAGE_SIZE = 6
+
+
+def login(base_url, email, password):
+    request = urllib.request.Request(
+        f'{base_url}/api/auth/token/login/',
+        data=json.dumps({'email': email, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)['auth_token']
+
+
+def load_fixtures(user_count):
+    """Ids, slugs and credentials the scenario draws from."""
+    from django.db.models import Count, Max, Min
+    from recipes.management.commands.generate_dataset import EMAIL_DOMAIN, PASSWORD, USERNAME_PREFIX
+    from recipes.models import Ingredient, Recipe, Tag
+
+    bounds = Recipe.objects.aggregate(low=Min('id'), high=Max('id'), count=Count('id'))
+    prefixes = sorted({name[:2] for name in Ingredient.objects.values_list('name', flat=True) if len(name) >= 2})
+    return {
+        'recipe_ids': (bounds['low'], bounds['high']),
+        'pages': max(bounds['count'] // PAGE_SIZE, 1),
+        'tags': list(Tag.objects.values_list('slug', flat=True)),
+        'prefixes': prefixes,
+        'emails': [f'{USERNAME_PREFIX}{i}@{EMAIL_DOMAIN}' for i in range(user_count)],
+        'password': PASSWORD,
+    }
+
+
+def build_scenario(fixtures, tokens):
+    """Return (names, choose_request) with the weighted request mix."""
+    low, high = fixtures['recipe_ids']
+
+    def first_pages(rng):
+        # Most visitors stay on the first pages; a few browse deep.
+        page = 1 + min(int(rng.paretovariate(1.2)) - 1, fixtures['pages'] - 1)
+        return f'/api/recipes/?page={page}&limit={PAGE_SIZE}'
+
+    def auth(rng):
+        return {'Authorization': f'Token {rng.choice(tokens)}'}
+
+    requests = [
+        (35, 'recipe_list', lambda rng: ('GET', first_pages(rng), None, None)),
+        (15, 'recipe_list_by_tag', lambda rng: (
+            'GET', f'/api/recipes/?page=1&limit={PAGE_SIZE}&tags={rng.choice(fixtures["tags"])}', None, None,
+        )),
+        (20, 'recipe_detail', lambda rng: ('GET', f'/api/recipes/{rng.randint(low, high)}/', None, None)),
+        (10, 'tag_list', lambda rng: ('GET', '/api/tags/', None, None)),
+        (10, 'ingredient_typeahead', lambda rng: (
+            'GET', f'/api/ingredients/?name={quote(rng.choice(fixtures["prefixes"]))}', None, None,
+        )),
+    ]
+    if tokens:
+        requests += [
+            (5, 'favorites_page', lambda rng: (
+                'GET', f'/api/recipes/?page=1&limit={PAGE_SIZE}&is_favorited=1', auth(rng), None,
+            )),
+            (5, 'favorite_toggle', lambda rng: (
+                rng.choice(['POST', 'DELETE']), f'/api/recipes/{rng.randint(low, high)}/favorite/', auth(rng), b'',
+            )),
+        ]
+
+    names = [name for _, name, _ in requests]
+    weights = [weight for weight, _, _ in requests]
+
+    def choose(rng):
+        _, name, build = rng.choices(requests, weights)[0]
+        method, path, headers, body = build(rng)
+        return name, method, path, headers, body
+
+    return names, choose
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', help='Target server; by default one is started on port 8121')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--logged-in', type=int, default=20, help='Number of dataset users to log in')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from recipes.management.commands.generate_dataset import USERNAME_PREFIX
+    if not get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).exists():
+        call_command('generate_dataset', stdout=sys.stderr)
+
+    process = None
+    base_url = args.base_url
+    if base_url is None:
+        base_url = 'http://127.0.0.1:8121'
+        process = start_server([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                '--bind', '127.0.0.1:8121', '--log-level', 'warning'], 8121)
+    try:
+        fixtures = load_fixtures(args.logged_in)
+        tokens = [login(base_url, email, fixtures['password']) for email in fixtures['emails']]
+        names, choose = build_scenario(fixtures, tokens)
+        results = run_load(base_url, choose, names, args.concurrency, args.duration, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report('scenarios', {'logged_in_users': len(tokens), **results})
+
+
+if __name__ == '__main__':
+    main()
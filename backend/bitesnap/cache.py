@@ -0,0 +1,332 @@
+"""
+Two-tier cache backend.
+
+TieredCache keeps small values of selected key groups (the part of a key
+before its first ':', e.g. 'tag-list') in a per-process LRU, the L1, in
+front of the shared cache named by OPTIONS['SHARED'], the L2 (Redis, or
+files for local work). Keys of other groups go straight to the L2.
+
+Invalidation is version based. Every overwrite or delete of a key of an
+L1 group increments the group's generation in the L2, and each process
+compares its generations with the L2 at most every SYNC_INTERVAL seconds
+(one get_many) and drops the L1 entries of groups that changed. Other
+processes therefore see a change within SYNC_INTERVAL, the writing process
+immediately. Storing a key the L2 does not hold (a cache fill) changes no
+generation, as no other process can have read it; so keys that embed a
+version of their content, and are never overwritten, never cost an
+invalidation. L1 entries also expire after L1_TTL seconds, which bounds
+how long a copy of a value that expired in the L2 and was filled again
+differently can be served.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'bitesnap.cache.TieredCache',
+            'OPTIONS': {'SHARED': 'shared', 'L1_GROUPS': ['tag-list']},
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://...'},
+    }
+
+FileBasedCache is Django's, with an add() that is atomic across processes,
+so that locks taken with it (api.caching) hold between workers.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends import filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+GENERATION_KEY_PREFIX = 'tiered-cache-generation'
+
+_MISSING = object()
+
+# One L1 per alias and process; Django creates a backend instance per thread
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def generation_key(group):
+    return f'{GENERATION_KEY_PREFIX}:{group}'
+
+
+class LocalTier:
+    """The process-wide L1 shared by the per-thread TieredCache instances of one alias."""
+
+    def __init__(self, groups, max_entries, max_value_size, ttl, sync_interval):
+        self.groups = frozenset(groups)
+        self.max_entries = max_entries
+        self.max_value_size = max_value_size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.counts = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._next_sync = 0.0
+
+    def group(self, key):
+        group = key.partition(':')[0]
+        return group if group in self.groups else None
+
+    def sync(self, shared):
+        """Drop the entries of groups whose generation in the L2 changed (at most every sync_interval)."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+        keys = {generation_key(group): group for group in self.groups}
+        current = shared.get_many(list(keys))
+        with self._lock:
+            for key, group in keys.items():
+                generation = current.get(key)
+                if group in self._generations and self._generations[group] == generation:
+                    continue
+                if group in self._generations:
+                    self.counts['invalidations'] += 1
+                self._generations[group] = generation
+                self._drop_group(group)
+
+    def generation(self, group):
+        with self._lock:
+            return self._generations.get(group)
+
+    def get(self, key_id):
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key_id)
+                    self.counts['l1_hits'] += 1
+                    data = entry[2]
+                else:
+                    del self._entries[key_id]
+                    entry = None
+            if entry is None:
+                self.counts['l1_misses'] += 1
+                return _MISSING
+        return pickle.loads(data)
+
+    def put(self, key_id, group, value, generation):
+        """Remember a value read from the L2, unless the group changed while it was being read."""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_value_size:
+            return
+        with self._lock:
+            if self._generations.get(group) != generation:
+                return
+            self._entries[key_id] = (time.monotonic() + self.ttl, group, data)
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, key_id):
+        with self._lock:
+            self._entries.pop(key_id, None)
+
+    def written(self, key_id, group):
+        """
+        This process changed key_id: forget it, and refuse values of its group
+        read before the change until the next sync.
+        """
+        with self._lock:
+            self._entries.pop(key_id, None)
+            self._generations[group] = object()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._next_sync = 0.0
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, l1_entries=len(self._entries))
+
+    def _drop_group(self, group):
+        for key_id in [key_id for key_id, entry in self._entries.items() if entry[1] == group]:
+            del self._entries[key_id]
+
+
+class TieredCache(BaseCache):
+    """
+    Django cache backend: per-process L1 for OPTIONS['L1_GROUPS'] in front of
+    the cache alias OPTIONS['SHARED'].
+
+    Other options: L1_MAX_ENTRIES (1000), L1_MAX_VALUE_SIZE in pickled bytes
+    (64 KiB), L1_TTL (60) and SYNC_INTERVAL (1) in seconds.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        with _tiers_lock:
+            if self.shared_alias not in _tiers:
+                _tiers[self.shared_alias] = LocalTier(
+                    groups=options.get('L1_GROUPS', ()),
+                    max_entries=options.get('L1_MAX_ENTRIES', 1000),
+                    max_value_size=options.get('L1_MAX_VALUE_SIZE', 64 * 1024),
+                    ttl=options.get('L1_TTL', 60),
+                    sync_interval=options.get('SYNC_INTERVAL', 1),
+                )
+            self.local = _tiers[self.shared_alias]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _key_id(self, key, version):
+        return key, self.version if version is None else version
+
+    def _written(self, key, version):
+        group = self.local.group(key)
+        if group is None:
+            return
+        self.local.written(self._key_id(key, version), group)
+        try:
+            self.shared.incr(generation_key(group))
+        except ValueError:
+            # Not 1: a process may have seen low numbers before the key was evicted
+            self.shared.add(generation_key(group), time.time_ns(), None)
+
+    def get(self, key, default=None, version=None):
+        group = self.local.group(key)
+        if group is None:
+            return self._get_shared(key, default, version)
+        self.local.sync(self.shared)
+        key_id = self._key_id(key, version)
+        value = self.local.get(key_id)
+        if value is not _MISSING:
+            return value
+        generation = self.local.generation(group)
+        value = self._get_shared(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        self.local.put(key_id, group, value, generation)
+        return value
+
+    def _get_shared(self, key, default, version):
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            self.local.count('l2_misses')
+            return default
+        self.local.count('l2_hits')
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        synced = False
+        for key in keys:
+            if self.local.group(key) is None:
+                remaining.append(key)
+                continue
+            if not synced:
+                self.local.sync(self.shared)
+                synced = True
+            value = self.local.get(self._key_id(key, version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        if remaining:
+            generations = {group: self.local.generation(group) for group in self.local.groups}
+            values = self.shared.get_many(remaining, version)
+            self.local.count('l2_hits', len(values))
+            self.local.count('l2_misses', len(remaining) - len(values))
+            for key, value in values.items():
+                group = self.local.group(key)
+                if group is not None:
+                    self.local.put(self._key_id(key, version), group, value, generations[group])
+            found.update(values)
+        return found
+
+    # DEFAULT_TIMEOUT is passed on, so the L2's own TIMEOUT applies
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.local.group(key) is None:
+            self.shared.set(key, value, timeout, version)
+        elif not self.add(key, value, timeout, version):
+            self.shared.set(key, value, timeout, version)
+            self._written(key, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            # A fill: nobody else can have read the key
+            self.local.forget(self._key_id(key, version))
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        other = {key: value for key, value in data.items() if self.local.group(key) is None}
+        for key in data.keys() - other.keys():
+            self.set(key, data[key], timeout, version)
+        return self.shared.set_many(other, timeout, version) if other else []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version)
+        if deleted:
+            self._written(key, version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        other = [key for key in keys if self.local.group(key) is None]
+        for key in set(keys) - set(other):
+            self.delete(key, version)
+        if other:
+            self.shared.delete_many(other, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self._written(key, version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.shared.has_key(key, version)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+
+def cache_stats():
+    """Per-tier hit/miss counts and L1 size of this process, by L2 alias."""
+    with _tiers_lock:
+        tiers = dict(_tiers)
+    return {alias: tier.stats() for alias, tier in tiers.items()}
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """FileBasedCache whose add() cannot succeed in two processes at once."""
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as file:
+                self._write_content(file, timeout, value)
+            # link() fails if the name exists, and the file is complete once visible
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    # has_key() removes an expired entry, so a second attempt can succeed
+                    if self.has_key(key, version):
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
@@ -0,0 +1,67 @@
+"""
+PostgreSQL backend that borrows connections from an in-process pool.
+
+Use with CONN_MAX_AGE = 0: Django "closes" the connection at the end of
+every request, which returns it to the pool instead of tearing down the
+TCP/SSL session. Pool sizing comes from the POOL entry of the database
+settings (MAX_SIZE, TIMEOUT, MAX_LIFETIME, CHECK_AFTER).
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions
+
+from bitesnap.db.pool import PoolTimeout, get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self):
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(
+            self.alias,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 5.0),
+            max_lifetime=options.get('MAX_LIFETIME', 1800),
+            check_after=options.get('CHECK_AFTER', 30),
+        )
+
+    def get_new_connection(self, conn_params):
+        parent = super()
+
+        def connect():
+            return parent.get_new_connection(conn_params)
+
+        try:
+            connection = self.get_pool().acquire(connect, self._check_connection)
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e))
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = (
+            IsolationLevel(isolation_level) if isolation_level is not None
+            else IsolationLevel.READ_COMMITTED
+        )
+        return connection
+
+    def _check_connection(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except self.Database.Error:
+            return False
+
+    def _reset_connection(self, connection):
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection, self._reset_connection)
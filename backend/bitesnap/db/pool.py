@@ -0,0 +1,144 @@
+"""
+A small thread-safe connection pool for threaded workers.
+
+The pool is independent of the database driver: it is given a callable to
+open a connection, one to check an idle connection and one to reset a
+connection being returned.
+"""
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    LIFO pool of at most max_size connections.
+
+    Connections idle for longer than check_after seconds are checked before
+    being handed out, and connections older than max_lifetime are closed
+    instead of being returned, so server-side resources are recycled.
+    """
+
+    def __init__(self, max_size=10, timeout=5.0, max_lifetime=1800, check_after=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._cond = threading.Condition()
+        self._idle = []
+        self._born = {}
+        self._size = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def acquire(self, connect, check):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn, released_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'No database connection available within {self.timeout}s '
+                            f'(pool size {self.max_size})'
+                        )
+                    self.waits += 1
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._born[id(conn)] = time.monotonic()
+                    self.created += 1
+                return conn
+
+            if time.monotonic() - released_at < self.check_after or check(conn):
+                with self._cond:
+                    self.reused += 1
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, reset):
+        """Return a connection; reset(conn) must return False if it is not reusable."""
+        try:
+            reusable = reset(conn)
+        except Exception:
+            reusable = False
+        with self._cond:
+            age = time.monotonic() - self._born.get(id(conn), 0)
+            if reusable and age < self.max_lifetime:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+            self._size -= 1
+            self.discarded += 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, **options):
+    """Return the pool for a database alias, creating a fresh one in forked children."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            # Pools inherited from a parent process are dropped, never closed:
+            # their sockets are shared with the parent.
+            for stale in [k for k in _pools if k[0] == alias]:
+                del _pools[stale]
+            _pools[key] = ConnectionPool(**options)
+        return _pools[key]
+
+
+def pool_stats():
+    """Statistics of every pool in this process, keyed by database alias."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {alias: pool for (alias, owner), pool in _pools.items() if owner == pid}
+    return {alias: pool.stats() for alias, pool in pools.items()}
@@ -0,0 +1,238 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads are sent to a replica from DATABASE_REPLICAS only inside safe-method
+requests (GET, HEAD, OPTIONS) handled by ReplicaMiddleware; everything else
+- writes, unsafe requests, transactions, management commands and
+background threads - uses the primary. A client that wrote is pinned to
+the primary for DATABASE_REPLICA_STICKY_SECONDS, by token (a cache key) and
+by a cookie for requests without one, e.g. right after logging in.
+
+Replicas are checked every DATABASE_REPLICA_CHECK_INTERVAL seconds; one
+that fails or lags more than DATABASE_REPLICA_MAX_LAG seconds gets no reads
+until a later check passes. With no usable replica, reads fall back to the
+primary.
+"""
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+
+PIN_COOKIE = 'bitesnap_primary'
+PIN_CACHE_PREFIX = 'db-primary-pin'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# On a standby, the time since the last replayed transaction, unless
+# everything received has been replayed (an idle primary is not lag).
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_replica_reads = contextvars.ContextVar('bitesnap_replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Allow (or forbid) routing reads to replicas in this context."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary; raises DatabaseError if it is unreachable."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.execute('SELECT 1')
+            return 0.0
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+class ReplicaMonitor:
+    """
+    Which replicas may serve reads, as seen by this process.
+
+    The first lookup checks inline; after that a result older than
+    DATABASE_REPLICA_CHECK_INTERVAL is served while a background thread
+    re-checks, like api.health.ReadinessMonitor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+        self._checked_at = None
+        self._checking = False
+
+    def check(self):
+        status = {}
+        for alias in settings.DATABASE_REPLICAS:
+            try:
+                lag = replica_lag(alias)
+            except DatabaseError as e:
+                status[alias] = {'usable': False, 'lag': None, 'error': str(e)}
+                continue
+            usable = lag <= settings.DATABASE_REPLICA_MAX_LAG
+            status[alias] = {
+                'usable': usable,
+                'lag': round(lag, 3),
+                'error': None if usable else f'lagging {lag:.1f}s behind the primary',
+            }
+
+        with self._lock:
+            previous = self._status
+            self._status = status
+            self._checked_at = time.monotonic()
+            self._checking = False
+
+        for alias, state in status.items():
+            was_usable = previous.get(alias, {}).get('usable', True)
+            if was_usable and not state['usable']:
+                logger.warning(f"Replica {alias} taken out of rotation: {state['error']}")
+            elif not was_usable and state['usable']:
+                logger.info(f'Replica {alias} back in rotation')
+        return status
+
+    def _check_in_background(self):
+        try:
+            self.check()
+        except Exception:
+            logger.exception('Replica check failed')
+            with self._lock:
+                self._checking = False
+        finally:
+            close_old_connections()
+
+    def usable(self):
+        """Aliases of the replicas reads may go to."""
+        with self._lock:
+            checked_at = self._checked_at
+            if checked_at is not None:
+                stale = time.monotonic() - checked_at >= settings.DATABASE_REPLICA_CHECK_INTERVAL
+                if stale and not self._checking:
+                    self._checking = True
+                    threading.Thread(target=self._check_in_background, daemon=True).start()
+                status = self._status
+        if checked_at is None:
+            status = self.check()
+        return [alias for alias, state in status.items() if state['usable']]
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def reset(self):
+        with self._lock:
+            self._status = {}
+            self._checked_at = None
+            self._checking = False
+
+
+monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+    """Primary for writes; a random usable replica for reads where allowed."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        replicas = monitor.usable()
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return f'{PIN_CACHE_PREFIX}:{hashlib.sha256(authorization.encode()).hexdigest()}'
+
+
+def is_pinned(request):
+    """Whether this client wrote within the last DATABASE_REPLICA_STICKY_SECONDS."""
+    try:
+        if float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    key = pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def pin(request, response):
+    seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+    response.set_cookie(PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax')
+    key = pin_key(request)
+    if key is not None:
+        cache.set(key, 1, seconds)
+
+
+class ReplicaMiddleware:
+    """
+    Lets safe requests from clients that have not just written read from
+    replicas, and pins clients to the primary after they write.
+
+    Put it before SessionMiddleware so session reads are routed too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        safe = request.method in SAFE_METHODS
+        with replica_reads(safe and not is_pinned(request)):
+            response = self.get_response(request)
+        if not safe and response.status_code < 500:
+            pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        safe = request.method in SAFE_METHODS
+        # The pin lives in the cache, which blocks
+        with replica_reads(safe and not await sync_to_async(is_pinned)(request)):
+            response = await self.get_response(request)
+        if not safe and response.status_code < 500:
+            await sync_to_async(pin)(request, response)
+        return response
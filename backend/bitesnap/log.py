@@ -0,0 +1,241 @@
+"""
+Non-blocking logging.
+
+BackgroundHandler only enqueues records on the calling thread; a writer
+thread (one per process, started on first use so it survives the gunicorn
+fork) formats them and writes them in batches. The queue is bounded: when
+it is full records are dropped and counted rather than making request
+threads wait on stderr.
+
+JSONFormatter renders one JSON object per line, including the id of the
+request the record was logged from (RequestIdMiddleware). RateLimitFilter
+keeps repetitive messages, such as failing health checks, from flooding
+the log.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+import weakref
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+request_id = contextvars.ContextVar('bitesnap_request_id', default=None)
+
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# Attributes every LogRecord has; anything else was passed with extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_handlers = weakref.WeakSet()
+_filters = weakref.WeakSet()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request_id and extras."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `limit` records with the same logger, level and
+    message per `interval` seconds. Errors always pass. The first record let
+    through after some were suppressed carries their number as `suppressed`.
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self, limit=10, interval=60):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.suppressed = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+        _filters.add(self)
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or not self.limit:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if len(self._windows) >= self.MAX_KEYS:
+                    self._windows = {k: w for k, w in self._windows.items() if now - w[0] < self.interval}
+                self._windows[key] = [now, 1, 0]
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class BackgroundHandler(logging.Handler):
+    """
+    Queue records for a writer thread that formats and writes them in batches.
+
+    The calling thread only resolves the message and traceback (the
+    arguments may change once the call returns) and notes the current
+    request id.
+    """
+
+    def __init__(self, stream=None, queue_size=10000, batch_size=200):
+        super().__init__()
+        self.stream = stream or sys.stderr
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.written = 0
+        self._pid = None
+        self._queue = None
+        self._start_lock = threading.Lock()
+        _handlers.add(self)
+
+    def prepare(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        self._start_writer()
+        try:
+            self._queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def flush(self, timeout=5):
+        """Wait (up to timeout seconds) until the queued records have been written."""
+        records = self._queue
+        if records is None or self._pid != os.getpid():
+            return
+        with records.all_tasks_done:
+            records.all_tasks_done.wait_for(lambda: not records.unfinished_tasks, timeout)
+
+    def _start_writer(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                threading.Thread(target=self._write, args=(self._queue,), name='log-writer', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _write(self, records):
+        while True:
+            batch = [records.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+            try:
+                if lines:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+                    self.written += len(lines)
+            except Exception:
+                self.handleError(batch[0])
+            finally:
+                for _ in batch:
+                    records.task_done()
+
+
+def stats():
+    """Records written, dropped (queue full) and suppressed (rate limited) by this process."""
+    handlers = list(_handlers)
+    return {
+        'written': sum(handler.written for handler in handlers),
+        'dropped': sum(handler.dropped for handler in handlers),
+        'suppressed': sum(log_filter.suppressed for log_filter in list(_filters)),
+    }
+
+
+class RequestIdMiddleware:
+    """
+    Give each request an id for the logs: the caller's X-Request-ID when it
+    is sane, otherwise a new one. It is echoed in the response.
+
+    Async capable, so it does not force async views back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        value = self.assign(request)
+        token = request_id.set(value)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id.reset(token)
+        response['X-Request-ID'] = value
+        return response
+
+    async def __acall__(self, request):
+        value = self.assign(request)
+        token = request_id.set(value)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_id.reset(token)
+        response['X-Request-ID'] = value
+        return response
+
+    def assign(self, request):
+        value = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID_PATTERN.fullmatch(value):
+            value = uuid.uuid4().hex
+        request.request_id = value
+        return value
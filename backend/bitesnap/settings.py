@@ -32,13 +32,15 @@ INSTALLED_APPS = [
     'djoser',
     'django_filters',
     'corsheaders',
-    'storages',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'bitesnap.log.RequestIdMiddleware',
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'bitesnap.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,14 +75,29 @@ WSGI_APPLICATION = 'bitesnap.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 if os.environ.get('POSTGRES_HOST'):
+    # POSTGRES_POOL=True borrows connections from an in-process pool for the
+    # duration of each request (for threaded workers); otherwise connections
+    # persist per thread for POSTGRES_CONN_MAX_AGE seconds.
+    POSTGRES_POOL = os.environ.get('POSTGRES_POOL', 'False') == 'True'
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': (
+                'bitesnap.db.backends.postgresql_pool' if POSTGRES_POOL
+                else 'django.db.backends.postgresql'
+            ),
             'NAME': os.environ.get('POSTGRES_DB', 'bitesnap'),
             'USER': os.environ.get('POSTGRES_USER', 'postgres'),
             'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
             'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
             'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if POSTGRES_POOL else int(os.environ.get('POSTGRES_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'POOL': {
+                'MAX_SIZE': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', '10')),
+                'TIMEOUT': float(os.environ.get('POSTGRES_POOL_TIMEOUT', '5')),
+                'MAX_LIFETIME': int(os.environ.get('POSTGRES_POOL_MAX_LIFETIME', '1800')),
+                'CHECK_AFTER': 30,
+            },
             'OPTIONS': {
                 'sslmode': os.environ.get('POSTGRES_SSLMODE', 'require'),
             },
@@ -91,10 +108,41 @@ else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
         }
     }
 
+# Read replicas (bitesnap.db.replicas). POSTGRES_REPLICA_HOSTS=host[:port],...
+# adds a replica_<n> alias per host with the primary's database and
+# credentials. Safe requests read from them; a client that writes reads from
+# the primary for DATABASE_REPLICA_STICKY_SECONDS, which should exceed the
+# usual replication lag. Replicas lagging more than DATABASE_REPLICA_MAX_LAG
+# seconds or failing their check are skipped until they recover.
+DATABASE_REPLICAS = []
+if os.environ.get('POSTGRES_HOST'):
+    replica_hosts = [host.strip() for host in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',') if host.strip()]
+    for number, address in enumerate(replica_hosts, 1):
+        host, _, port = address.partition(':')
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            # Fail fast so an unreachable replica is taken out of rotation quickly
+            'OPTIONS': {**DATABASES['default']['OPTIONS'], 'connect_timeout': 3},
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', '5'))
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DATABASE_REPLICA_MAX_LAG', '3'))
+DATABASE_REPLICA_CHECK_INTERVAL = int(os.environ.get('DATABASE_REPLICA_CHECK_INTERVAL', '5'))
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['bitesnap.db.replicas.ReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+        'bitesnap.db.replicas.ReplicaMiddleware',
+    )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -133,9 +181,16 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
 
+# collectstatic writes content-hashed names plus .gz/.br variants;
+# StaticFilesMiddleware serves them (hashed names as immutable, others for
+# STATIC_MAX_AGE seconds)
+STATICFILES_STORAGE = 'bitesnap.staticfiles.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 60 * 60))
+
 
 if os.environ.get('AZURE_STORAGE_ACCOUNT_NAME'):
-    # Azure Blob Storage configuration
+    # Azure Blob Storage configuration (django-storages is only loaded when used)
+    INSTALLED_APPS.append('storages')
     DEFAULT_FILE_STORAGE = 'storages.backends.azure_storage.AzureStorage'
     AZURE_ACCOUNT_NAME = os.environ.get('AZURE_STORAGE_ACCOUNT_NAME')
     AZURE_ACCOUNT_KEY = os.environ.get('AZURE_STORAGE_ACCOUNT_KEY')
@@ -147,6 +202,16 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized recipe image variants (served from /media/variants/<w>x<h>/...)
+IMAGE_VARIANT_SIZES = {
+    'card': (480, 320),
+}
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', '80'))
+IMAGE_VARIANT_MAX_AGE = 60 * 60 * 24 * 30
+IMAGE_VARIANT_CACHE_DIR = Path(os.environ.get('IMAGE_VARIANT_CACHE_DIR', BASE_DIR / 'media_cache' / 'variants'))
+# Per worker process: the shared directory can hold up to workers x this
+IMAGE_VARIANT_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_VARIANT_CACHE_MAX_MB', '256')) * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -157,7 +222,7 @@ AUTH_USER_MODEL = 'recipes.User'
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -169,6 +234,87 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Two-tier cache (bitesnap.cache.TieredCache): a per-process LRU for hot
+# small values of the listed key groups in front of the cache shared by all
+# workers and hosts: Redis when REDIS_URL is set, otherwise files under
+# CACHE_DIR (one host only, for local work and tests).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    SHARED_CACHE = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'bitesnap.cache.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'media_cache' / 'shared')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'bitesnap.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'L1_GROUPS': ['tag-list', 'recipe-list'],
+            'L1_MAX_ENTRIES': int(os.environ.get('CACHE_L1_MAX_ENTRIES', '1000')),
+            'L1_MAX_VALUE_SIZE': 64 * 1024,
+            'L1_TTL': int(os.environ.get('CACHE_L1_TTL', '60')),
+            'SYNC_INTERVAL': float(os.environ.get('CACHE_SYNC_INTERVAL', '1')),
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+# Token -> user lookups cached by api.authentication.CachedTokenAuthentication
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', '300'))
+AUTH_TOKEN_CACHE_LOCAL_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_LOCAL_TTL', '2'))
+AUTH_TOKEN_CACHE_MAX_ENTRIES = 10000
+
+# Rendered anonymous recipe list pages (api.response_cache); 0 disables.
+# MAX_AGE is the Cache-Control max-age offered to browsers and CDNs, STALE_TTL
+# how long an expired page is still served while one request refreshes it.
+RECIPE_LIST_CACHE_TTL = int(os.environ.get('RECIPE_LIST_CACHE_TTL', '300'))
+RECIPE_LIST_CACHE_MAX_AGE = int(os.environ.get('RECIPE_LIST_CACHE_MAX_AGE', '30'))
+RECIPE_LIST_CACHE_STALE_TTL = int(os.environ.get('RECIPE_LIST_CACHE_STALE_TTL', '60'))
+
+# Serialized tag list (TagViewSet.list); 0 disables
+TAG_LIST_CACHE_TTL = int(os.environ.get('TAG_LIST_CACHE_TTL', '300'))
+TAG_LIST_CACHE_STALE_TTL = int(os.environ.get('TAG_LIST_CACHE_STALE_TTL', '60'))
+
+# Delta sync (/api/recipes/changes/): log rows per response, how old a row must
+# be before it is delivered (longer than any write transaction, see
+# api.changes), and how long rows are kept by prune_recipe_changes.
+RECIPE_CHANGES_PAGE_SIZE = int(os.environ.get('RECIPE_CHANGES_PAGE_SIZE', '500'))
+RECIPE_CHANGES_SETTLE_SECONDS = float(os.environ.get('RECIPE_CHANGES_SETTLE_SECONDS', '5'))
+RECIPE_CHANGES_RETENTION_DAYS = int(os.environ.get('RECIPE_CHANGES_RETENTION_DAYS', '30'))
+
+# /api/batch/ (api.batch): views that may be combined into one request, all
+# read-only, and how many per request
+BATCH_ALLOWED_ROUTES = [
+    'api:users-me',
+    'api:tags-list',
+    'api:tags-detail',
+    'api:ingredients-list',
+    'api:ingredients-detail',
+    'api:recipes-list',
+    'api:recipes-detail',
+    'api:recipes-changes',
+]
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '10'))
+
+# Outbox of domain events (api.outbox, dispatch_outbox): events per consumer
+# and batch, how old an event must be before delivery (longer than any write
+# transaction), idle polling interval, and how long delivered events are kept.
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '500'))
+OUTBOX_SETTLE_SECONDS = float(os.environ.get('OUTBOX_SETTLE_SECONDS', '5'))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '1'))
+OUTBOX_RETENTION_HOURS = int(os.environ.get('OUTBOX_RETENTION_HOURS', '24'))
+
+# Stampede protection for cached values (api.caching): lifetime of the
+# recompute lock, how long other workers wait for the value, and how eagerly
+# values are refreshed before they expire (XFetch beta; 0 disables)
+CACHE_LOCK_TIMEOUT = int(os.environ.get('CACHE_LOCK_TIMEOUT', '10'))
+CACHE_LOCK_WAIT = float(os.environ.get('CACHE_LOCK_WAIT', '5'))
+CACHE_EARLY_REFRESH_BETA = float(os.environ.get('CACHE_EARLY_REFRESH_BETA', '1.0'))
+
 # Djoser Configuration
 DJOSER = {
     'LOGIN_FIELD': 'email',
@@ -185,7 +331,44 @@ DJOSER = {
     },
 }
 
-# Logging Configuration
+# Health probes: readiness results are reused for HEALTH_CHECK_INTERVAL seconds,
+# refreshed in the background after that and re-checked inline after HEALTH_CHECK_TTL.
+HEALTH_CHECK_INTERVAL = int(os.environ.get('HEALTH_CHECK_INTERVAL', '10'))
+HEALTH_CHECK_TTL = int(os.environ.get('HEALTH_CHECK_TTL', '60'))
+HEALTH_CHECK_LATENCY_SAMPLES = 100
+
+# Prometheus metrics (/metrics). With METRICS_DIR set, each worker writes its
+# snapshot there every METRICS_FLUSH_INTERVAL seconds and /metrics sums them.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+
+# SQL profiling / N+1 detection (api.sql_profiling). Staff can profile any
+# request with `X-Profile-SQL: 1`; SQL_PROFILING_SAMPLE_RATE of all other
+# requests are profiled too, for the bitesnap_sql_* metrics.
+SQL_PROFILING_ENABLED = os.environ.get('SQL_PROFILING', str(DEBUG)) == 'True'
+SQL_PROFILING_SAMPLE_RATE = float(os.environ.get('SQL_PROFILING_SAMPLE_RATE', '1.0' if DEBUG else '0.01'))
+SQL_PROFILING_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_PROFILING_N_PLUS_ONE_THRESHOLD', '3'))
+SQL_PROFILING_TTL = 60 * 10
+SQL_PROFILING_RECENT = 50
+
+if SQL_PROFILING_ENABLED:
+    MIDDLEWARE.append('api.sql_profiling.SQLProfilingMiddleware')
+
+# Cold start budget (django.setup, middleware and URLconf) checked by
+# `manage.py profile_startup --check` and tests/test_startup.py.
+STARTUP_BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS', '1500'))
+
+# Logging Configuration (bitesnap.log). Request threads only enqueue records;
+# a writer thread per process formats them (JSON lines, or the verbose text
+# format with LOG_FORMAT=text) and writes them in batches. At most
+# LOG_QUEUE_SIZE records wait in the queue, further ones are dropped and
+# counted. Identical messages below ERROR are limited to LOG_RATE_LIMIT per
+# LOG_RATE_LIMIT_INTERVAL seconds.
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text' if DEBUG else 'json')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT', '10'))
+LOG_RATE_LIMIT_INTERVAL = 60
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -198,11 +381,23 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'bitesnap.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'rate_limit': {
+            '()': 'bitesnap.log.RateLimitFilter',
+            'limit': LOG_RATE_LIMIT,
+            'interval': LOG_RATE_LIMIT_INTERVAL,
+        },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'class': 'bitesnap.log.BackgroundHandler',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['rate_limit'],
+            'queue_size': LOG_QUEUE_SIZE,
         },
     },
     'root': {
@@ -212,7 +407,7 @@ LOGGING = {
     'loggers': {
         'django': {
             'handlers': ['console'],
-            'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO'),
+            'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO' if DEBUG else 'WARNING'),
             'propagate': False,
         },
         'api': {
@@ -230,11 +425,28 @@ LOGGING = {
 
 APPLICATIONINSIGHTS_CONNECTION_STRING = os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING', '')
 
+# Tracing (bitesnap.tracing). Every request is recorded; failed ones and those
+# slower than TRACING_SLOW_MS are always exported, others up to
+# TRACING_RATE_LIMIT traces per second per worker. Exports are batched from a
+# queue of at most TRACING_QUEUE_SIZE traces in a background thread.
+TRACING_RATE_LIMIT = float(os.environ.get('TRACING_RATE_LIMIT', '1'))
+TRACING_SLOW_MS = int(os.environ.get('TRACING_SLOW_MS', '1000'))
+TRACING_QUEUE_SIZE = int(os.environ.get('TRACING_QUEUE_SIZE', '1000'))
+TRACING_BATCH_SIZE = 100
+TRACING_EXPORT_INTERVAL = float(os.environ.get('TRACING_EXPORT_INTERVAL', '5'))
+
 if APPLICATIONINSIGHTS_CONNECTION_STRING:
-    MIDDLEWARE.append('opencensus.ext.django.middleware.OpencensusMiddleware')
+    MIDDLEWARE.append('bitesnap.tracing.TracingMiddleware')
 
     OPENCENSUS = {
         'TRACE': {
-            'SAMPLER': 'opencensus.trace.samplers.ProbabilitySampler(rate=1.0)',
+            'EXCLUDELIST_PATHS': ['health', 'metrics'],
         }
     }
+
+    # Storage calls get their own spans
+    TRACED_STORAGE_BACKEND = (
+        'storages.backends.azure_storage.AzureStorage' if os.environ.get('AZURE_STORAGE_ACCOUNT_NAME')
+        else 'django.core.files.storage.FileSystemStorage'
+    )
+    DEFAULT_FILE_STORAGE = 'bitesnap.tracing.TracedStorage'
@@ -0,0 +1,325 @@
+"""
+Fingerprinted, precompressed static files served by the application.
+
+CompressedManifestStaticFilesStorage gives every collected file a
+content-hashed name (ManifestStaticFilesStorage) and then writes .gz and,
+when the brotli package is installed, .br variants next to the compressible
+ones, so nothing is compressed per request.
+
+StaticFilesMiddleware answers GET/HEAD requests for files under STATIC_ROOT
+before the rest of the stack runs. Hashed names never change content and are
+cached for a year as immutable; other names for STATIC_MAX_AGE seconds. The
+smallest variant the client accepts is sent, each variant with its own
+strong ETag. Conditional and single byte range requests are honoured, and
+files are returned as FileResponses so gunicorn sends them with sendfile().
+"""
+import gzip
+import json
+import mimetypes
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot',
+}
+
+# Variants in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Files this small gain nothing worth a second request header
+MIN_COMPRESS_SIZE = 256
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return
+    yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+def compress_file(path):
+    """
+    Write the .gz/.br variants of path that are missing or older than it.
+
+    A variant that is not meaningfully smaller is removed instead, so the
+    middleware falls back to the identity file.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    mtime = os.path.getmtime(path)
+    for suffix, compress in compressors():
+        target = path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+            continue
+        compressed = compress(data)
+        if len(compressed) < len(data) * 0.95:
+            with open(target + '.tmp', 'wb') as file:
+                file.write(compressed)
+            os.replace(target + '.tmp', target)
+        elif os.path.exists(target):
+            os.remove(target)
+
+
+def is_compressible(name, size):
+    return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and size >= MIN_COMPRESS_SIZE
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also precompresses what it collects.
+
+    Names missing from the manifest (collectstatic not run, as in tests and
+    local development) resolve to the unhashed name instead of raising.
+    """
+
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.update(filter(None, (name, hashed_name)))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(processed_names):
+            path = self.path(name)
+            if is_compressible(name, os.path.getsize(path)):
+                compress_file(path)
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+class StaticFile:
+    """What is needed to answer a request for one file, read once per process."""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        # Of the identity file; compressed variants have different bytes, so a tag of their own
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        self.last_modified = http_date(stat.st_mtime)
+        self.cache_control = IMMUTABLE if immutable else f'public, max-age={settings.STATIC_MAX_AGE}'
+        self.variants = [
+            (encoding, path + suffix, os.path.getsize(path + suffix), f'{self.etag[:-1]}-{encoding}"')
+            for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        ]
+
+    def headers(self):
+        headers = {
+            'Cache-Control': self.cache_control,
+            'Last-Modified': self.last_modified,
+            'Accept-Ranges': 'bytes',
+        }
+        if self.variants:
+            headers['Vary'] = 'Accept-Encoding'
+        return headers
+
+    def select(self, accept_encoding):
+        """(encoding, path, size, etag) of the variant to send: the first acceptable one, else identity."""
+        accepted = accepted_encodings(accept_encoding)
+        for variant in self.variants:
+            if variant[0] in accepted:
+                return variant
+        return None, self.path, self.size, self.etag
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def build_index(root):
+    """Relative URL path -> StaticFile for everything under root (compressed variants excluded)."""
+    try:
+        with open(os.path.join(root, ManifestStaticFilesStorage.manifest_name)) as file:
+            hashed = set(json.load(file).get('paths', {}).values())
+    except (OSError, ValueError):
+        hashed = set()
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            variant_of = os.path.splitext(path)[0]
+            if filename.startswith('.') or (path.endswith(('.gz', '.br')) and os.path.exists(variant_of)):
+                continue
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(path, name in hashed)
+    return files
+
+
+class FileRange:
+    """
+    The next `length` bytes of an open file.
+
+    fileno() is passed through so servers can still sendfile() it: gunicorn
+    starts at the file's current offset and stops at Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) of a single byte range, None to ignore the header, or False if unsatisfiable."""
+    match = RANGE_PATTERN.fullmatch(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def not_modified(request, etag):
+    """Whether If-None-Match names etag, the tag of the variant that would be sent."""
+    etags = request.headers.get('If-None-Match')
+    if etags is None:
+        return False
+    return etags.strip() == '*' or etag in (candidate.strip().removeprefix('W/') for candidate in etags.split(','))
+
+
+def serve(request, static_file):
+    headers = static_file.headers()
+    byte_range = None
+    if 'Range' in request.headers and request.headers.get('If-Range', static_file.etag) == static_file.etag:
+        byte_range = parse_range(request.headers['Range'], static_file.size)
+
+    if byte_range:
+        # Ranges are always of the identity file
+        encoding, path, etag = None, static_file.path, static_file.etag
+        start, end = byte_range
+        length = end - start + 1
+        headers['Content-Range'] = f'bytes {start}-{end}/{static_file.size}'
+    else:
+        encoding, path, length, etag = static_file.select(request.headers.get('Accept-Encoding', ''))
+    headers['ETag'] = etag
+
+    if not_modified(request, etag):
+        response = HttpResponse(status=304)
+        for header, value in headers.items():
+            if header != 'Content-Range':
+                response[header] = value
+        return response
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{static_file.size}'
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=static_file.content_type)
+    else:
+        file = open(path, 'rb')
+        if byte_range:
+            file.seek(byte_range[0])
+            response = FileResponse(FileRange(file, length), content_type=static_file.content_type)
+        else:
+            response = FileResponse(file, content_type=static_file.content_type)
+            del response['Content-Disposition']
+    if byte_range:
+        response.status_code = 206
+    for header, value in headers.items():
+        response[header] = value
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(length)
+    return response
+
+
+class StaticFilesMiddleware:
+    """
+    Serve files collected into STATIC_ROOT (see the module docstring).
+
+    The directory is indexed on the first static request in each process;
+    anything not in the index falls through to the rest of the stack. Async
+    capable, so it does not force async views back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + urlsplit(settings.STATIC_URL).path.lstrip('/')
+        self.root = str(settings.STATIC_ROOT)
+        self._files = None
+        self._lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @property
+    def files(self):
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    self._files = build_index(self.root)
+        return self._files
+
+    def find(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        return self.files.get(request.path_info[len(self.prefix):])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.find(request)
+        if static_file is None:
+            return self.get_response(request)
+        return serve(request, static_file)
+
+    async def __acall__(self, request):
+        # Files are opened, not read, here; the body is streamed by the handler
+        static_file = self.find(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return serve(request, static_file)
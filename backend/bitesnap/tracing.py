@@ -0,0 +1,276 @@
+"""
+Request tracing for Application Insights (OpenCensus).
+
+TracingMiddleware records every request, with a child span per SQL query on
+every database connection and per call to the default storage
+(TracedStorage). Which traces are exported is decided once the request is
+over: failed requests and requests slower than TRACING_SLOW_MS are always
+kept, others up to TRACING_RATE_LIMIT per second per process. Kept traces go
+to a bounded queue that a background thread exports in batches; when the
+queue is full traces are dropped, so the request thread never waits on the
+exporter.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+from opencensus.ext.django import middleware as opencensus_middleware
+from opencensus.trace import execution_context, samplers, utils
+from opencensus.trace.base_exporter import Exporter
+from opencensus.trace.span import SpanKind
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Code OK (0) in the google.rpc codes used for span statuses
+STATUS_OK = 0
+
+
+class RateLimiter:
+    """Token bucket: `rate` events per second on average, in bursts of up to max(rate, 1)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+def duration_ms(span_data):
+    started = datetime.strptime(span_data.start_time, TIME_FORMAT)
+    ended = datetime.strptime(span_data.end_time, TIME_FORMAT)
+    return (ended - started).total_seconds() * 1000
+
+
+def is_error(span_datas):
+    for span_data in span_datas:
+        if span_data.status is not None and span_data.status.code != STATUS_OK:
+            return True
+        if span_data.span_kind == SpanKind.SERVER and int(span_data.attributes.get('http.status_code', 0)) >= 500:
+            return True
+    return False
+
+
+def build_exporter():
+    from opencensus.ext.azure.trace_exporter import AzureExporter
+
+    return AzureExporter(connection_string=settings.APPLICATIONINSIGHTS_CONNECTION_STRING)
+
+
+class TraceExporter(Exporter):
+    """
+    Tail sampling in front of a bounded, batching export queue.
+
+    OpenCensus exports each span as it ends, children first. export() runs on
+    the request thread: child spans are held until their root span ends, then
+    the whole trace is kept or sampled out and enqueued without blocking. A worker
+    thread, started lazily in each process (so after the gunicorn fork),
+    hands batches of up to batch_size traces to the wrapped exporter's
+    blocking emit().
+    """
+
+    def __init__(self, make_exporter, rate_limit, slow_ms, queue_size, batch_size, interval):
+        self.make_exporter = make_exporter
+        self.limiter = RateLimiter(rate_limit)
+        self.slow_ms = slow_ms
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.counts = {'kept': 0, 'sampled_out': 0, 'dropped': 0, 'exported': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._pending = {}
+
+    def keep(self, span_datas):
+        roots = [span_data for span_data in span_datas if span_data.span_kind == SpanKind.SERVER] or span_datas[:1]
+        if not roots:
+            return False
+        if is_error(span_datas) or duration_ms(roots[0]) >= self.slow_ms:
+            return True
+        return self.limiter.allow()
+
+    def export(self, span_datas):
+        span_datas = self.complete_trace(span_datas)
+        if span_datas is None:
+            return
+        if not self.keep(span_datas):
+            self.count('sampled_out')
+            return
+        self._start_worker()
+        try:
+            self._queue.put_nowait(span_datas)
+            self.count('kept')
+        except queue.Full:
+            self.count('dropped')
+
+    def emit(self, span_datas):
+        self.export(span_datas)
+
+    def complete_trace(self, span_datas):
+        """All spans of the trace once its root has ended, else None (the spans are held)."""
+        if not span_datas:
+            return None
+        # Spans of one request end on its thread; the trace id alone may be shared by callers
+        key = (span_datas[0].context.trace_id, threading.get_ident())
+        ended = span_datas[-1]
+        with self._lock:
+            if ended.span_kind != SpanKind.SERVER and ended.parent_span_id is not None:
+                if key not in self._pending and len(self._pending) >= self.queue_size:
+                    # Roots that never ended: forget the oldest
+                    del self._pending[next(iter(self._pending))]
+                    self.counts['dropped'] += 1
+                self._pending.setdefault(key, []).extend(span_datas)
+                return None
+            return self._pending.pop(key, []) + list(span_datas)
+
+    def count(self, outcome, amount=1):
+        with self._lock:
+            self.counts[outcome] += amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def flush(self):
+        """Wait until everything queued so far has been exported (for tests and shutdown)."""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def _start_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                threading.Thread(target=self._run, args=(self._queue,), name='trace-exporter', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self, traces):
+        # Keeps the exporter's own HTTP calls out of the traces
+        execution_context.set_is_exporter(True)
+        exporter = self.make_exporter()
+        while True:
+            batch = [traces.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(traces.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                exporter.emit([span_data for trace in batch for span_data in trace])
+                self.count('exported', len(batch))
+            except Exception:
+                self.count('failed', len(batch))
+                logger.exception(f'Exporting {len(batch)} traces failed')
+            finally:
+                for _ in batch:
+                    traces.task_done()
+
+
+class TracingMiddleware(opencensus_middleware.OpencensusMiddleware):
+    """
+    OpencensusMiddleware recording every request for TraceExporter.
+
+    The parent class traces queries only on the connection of the thread that
+    created it; here every connection is wrapped for the duration of each
+    traced request instead. Async requests are traced without query spans:
+    their queries run on other threads, with those threads' connections.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if opencensus_middleware._trace_db_call in connection.execute_wrappers:
+            connection.execute_wrappers.remove(opencensus_middleware._trace_db_call)
+        self.sampler = samplers.AlwaysOnSampler()
+        self.exporter = TraceExporter(
+            build_exporter,
+            rate_limit=settings.TRACING_RATE_LIMIT,
+            slow_ms=settings.TRACING_SLOW_MS,
+            queue_size=settings.TRACING_QUEUE_SIZE,
+            batch_size=settings.TRACING_BATCH_SIZE,
+            interval=settings.TRACING_EXPORT_INTERVAL,
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if utils.disable_tracing_url(request.path, self.excludelist_paths):
+            return self.get_response(request)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(opencensus_middleware._trace_db_call))
+                return super().__call__(request)
+        finally:
+            # Queries made after the response (streaming) must not reuse this trace
+            execution_context.clear()
+
+    async def __acall__(self, request):
+        if utils.disable_tracing_url(request.path, self.excludelist_paths):
+            return await self.get_response(request)
+        try:
+            return await super().__acall__(request)
+        finally:
+            execution_context.clear()
+
+
+class TracedStorage:
+    """
+    Default storage recording a span per I/O call to TRACED_STORAGE_BACKEND.
+
+    Other calls (url(), name generation) are passed through to the backend as is.
+    """
+
+    def __init__(self):
+        self.backend = import_string(settings.TRACED_STORAGE_BACKEND)()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _traced(self, method, name, *args, **kwargs):
+        tracer = execution_context.get_opencensus_tracer()
+        with tracer.span(f'storage.{method}') as span:
+            span.span_kind = SpanKind.CLIENT
+            span.add_attribute('component', type(self.backend).__name__)
+            span.add_attribute('storage.name', str(name))
+            return getattr(self.backend, method)(name, *args, **kwargs)
+
+    def open(self, name, mode='rb'):
+        return self._traced('open', name, mode)
+
+    def save(self, name, content, max_length=None):
+        return self._traced('save', name, content, max_length=max_length)
+
+    def delete(self, name):
+        return self._traced('delete', name)
+
+    def exists(self, name):
+        return self._traced('exists', name)
+
+    def size(self, name):
+        return self._traced('size', name)
+
+    def listdir(self, path):
+        return self._traced('listdir', path)
@@ -3,12 +3,23 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
-from api.health import health_check
+from api.health import health_check, health_details, liveness, readiness
+from api.images import image_variant
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('health', health_check, name='health'),
+    path('health/live', liveness, name='health-live'),
+    path('health/ready', readiness, name='health-ready'),
+    path('health/details', health_details, name='health-details'),
+    path('metrics', metrics_view, name='metrics'),
+    path(
+        'media/variants/<int:width>x<int:height>/<path:name>.webp',
+        image_variant,
+        name='image-variant'
+    ),
     path('', RedirectView.as_view(url='/api/', permanent=False)),
 ]
 
@@ -0,0 +1,137 @@
+"""
+Gunicorn configuration for the BiteSnap backend.
+
+    gunicorn -c gunicorn.conf.py
+
+Sizing comes from the CPUs available to the container unless overridden:
+
+    GUNICORN_WORKERS       default 2 * CPUs + 1 (capped by GUNICORN_MAX_WORKERS, default 8)
+    GUNICORN_THREADS       default 4 (gthread workers; 1 gives plain sync workers)
+    GUNICORN_WORKER_CLASS  e.g. uvicorn.workers.UvicornWorker to serve bitesnap.asgi
+    GUNICORN_TIMEOUT       default 120
+    GUNICORN_MAX_REQUESTS  default 1000, recycled with up to 10% jitter
+    GUNICORN_PRELOAD       default True; import Django once in the master and
+                           share the loaded modules with workers copy-on-write
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import resource
+import socket
+import time
+
+CONFIG_LOADED = time.monotonic()
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS',
+    min(available_cpus() * 2 + 1, int(os.environ.get('GUNICORN_MAX_WORKERS', '8')))
+))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+
+if 'uvicorn' in worker_class:
+    wsgi_app = 'bitesnap.asgi:application'
+else:
+    wsgi_app = 'bitesnap.wsgi:application'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Heartbeat files on tmpfs: a slow overlay filesystem can stall workers.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Workers publish metrics snapshots here so /metrics covers all of them.
+os.environ.setdefault('METRICS_DIR', os.path.join(worker_tmp_dir or '/tmp', 'bitesnap-metrics'))
+
+
+def rss_mb(pid='self'):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def close_database_connections():
+    """Close connections opened while preloading; they must not be shared with workers."""
+    import sys
+    if 'django.db' not in sys.modules:
+        return
+    from django.db import connections
+    connections.close_all()
+
+
+def warm_up():
+    """Import what Django otherwise loads on the first request (URLconf, views, serializers)."""
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def on_starting(server):
+    directory = os.environ['METRICS_DIR']
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(directory, name))
+
+
+def when_ready(server):
+    if preload_app:
+        warm_up()
+    logger.info(
+        'Booted in %.2fs: %s %s worker(s) x %s thread(s), preload=%s, master RSS %.1f MB',
+        time.monotonic() - CONFIG_LOADED, workers, worker_class, threads, preload_app, rss_mb()
+    )
+
+
+def pre_fork(server, worker):
+    close_database_connections()
+    if preload_app:
+        # Move the preloaded objects out of the collector's reach so the
+        # workers' garbage collections do not write to (and un-share) them.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Drop any connection object inherited from the master without closing
+    # it: closing would terminate the master's session on the shared socket.
+    import sys
+    if 'django.db' in sys.modules:
+        from django.db import connections
+        for connection in connections.all(initialized_only=True):
+            connection.connection = None
+
+
+def child_exit(server, worker):
+    """Remove the metrics snapshot of a worker that exited, named as api.metrics.snapshot_file() names it."""
+    path = os.path.join(os.environ['METRICS_DIR'], f'{socket.gethostname()}-{worker.pid}.json')
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def post_worker_init(worker):
+    logger.info('Worker %s ready, RSS %.1f MB', worker.pid, rss_mb())
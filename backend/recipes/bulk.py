@@ -0,0 +1,74 @@
+"""
+Raw bulk insert helpers shared by the import and dataset generation commands.
+
+Ids are reserved up front so related rows (tags, ingredients, favorites)
+can be written in the same batch without reading anything back.
+"""
+import io
+
+from django.db import connection
+
+
+class ExecuteManyWriter:
+    """Insert rows with plain parameterised executemany (SQLite and others)."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def allocate_ids(self, table, count):
+        """
+        The next count ids after the highest in table.
+
+        Only safe while nothing else inserts into table: a concurrent writer
+        would be given the same ids. Fine for SQLite, which serialises
+        writers and is only used for local work; PostgreSQL uses CopyWriter.
+        """
+        self.cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+        start = self.cursor.fetchone()[0] + 1
+        return list(range(start, start + count))
+
+    def insert(self, table, columns, rows):
+        placeholders = ', '.join(['%s'] * len(columns))
+        self.cursor.executemany(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+            rows
+        )
+
+
+def copy_csv_field(value):
+    """
+    One COPY csv field: None unquoted (NULL), anything else quoted.
+
+    Unquoted empty fields are NULL in COPY's csv format, so an empty string
+    has to be quoted to stay an empty string.
+    """
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class CopyWriter(ExecuteManyWriter):
+    """Insert rows with PostgreSQL COPY, reserving ids from the table sequence."""
+
+    def allocate_ids(self, table, count):
+        self.cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [table, count]
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def insert(self, table, columns, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(','.join(copy_csv_field(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        self.cursor.copy_expert(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+
+def get_writer(cursor):
+    """COPY on PostgreSQL, executemany everywhere else."""
+    return (CopyWriter if connection.vendor == 'postgresql' else ExecuteManyWriter)(cursor)
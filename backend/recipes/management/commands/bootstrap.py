@@ -0,0 +1,206 @@
+import hashlib
+import io
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from recipes.models import BootstrapStep
+
+# Bump to re-run create_test_data everywhere after changing the test data.
+TEST_DATA_VERSION = '1'
+
+STATIC_FINGERPRINT_FILE = '.bootstrap-fingerprint'
+
+# pg_advisory_lock key shared by all replicas ("BSNP" as an integer).
+LOCK_KEY = 0x42534E50
+
+STEPS = ('migrate', 'collectstatic', 'load_ingredients', 'create_test_data')
+
+# Failures of these steps are reported but do not stop the container start.
+OPTIONAL_STEPS = ('load_ingredients', 'create_test_data')
+
+
+def ingredients_csv_path():
+    return os.path.join(settings.BASE_DIR.parent, 'data', 'ingredients.csv')
+
+
+def unapplied_migrations(connection):
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def static_fingerprint():
+    """Hash of every static source file's path, size and mtime, plus the storage backend."""
+    digest = hashlib.sha256(settings.STORAGES['staticfiles']['BACKEND'].encode())
+    entries = []
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            stat = os.stat(storage.path(path))
+            entries.append(f'{path}:{stat.st_size}:{stat.st_mtime_ns}')
+    for entry in sorted(entries):
+        digest.update(entry.encode())
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def advisory_lock(connection, timeout):
+    """
+    Hold a PostgreSQL session advisory lock so only one replica bootstraps at a time.
+
+    Other databases run without a lock; SQLite is never shared between hosts.
+    """
+    if connection.vendor != 'postgresql':
+        yield
+        return
+
+    deadline = time.monotonic() + timeout
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [LOCK_KEY])
+            if cursor.fetchone()[0]:
+                break
+            if time.monotonic() > deadline:
+                raise CommandError(f'Timed out after {timeout}s waiting for the bootstrap lock')
+            time.sleep(1)
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the container start-up steps (migrate, collectstatic, load_ingredients, '
+        'create_test_data), skipping steps whose inputs have not changed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run every step regardless of stored fingerprints',
+        )
+        parser.add_argument(
+            '--skip',
+            action='append',
+            choices=STEPS,
+            default=[],
+            help='Step to leave out; may be repeated',
+        )
+        parser.add_argument(
+            '--lock-timeout',
+            type=int,
+            default=600,
+            help='Seconds to wait for another replica to finish bootstrapping',
+        )
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        self.connection = connections[DEFAULT_DB_ALIAS]
+        started = time.perf_counter()
+
+        with advisory_lock(self.connection, options['lock_timeout']):
+            for step in STEPS:
+                if step in options['skip']:
+                    self.stdout.write(f'{step}: skipped (--skip)')
+                    continue
+                self.run_step(step)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Bootstrap finished in {time.perf_counter() - started:.2f}s')
+        )
+
+    def run_step(self, step):
+        started = time.perf_counter()
+        try:
+            fingerprint, reason = getattr(self, f'check_{step}')()
+            if reason is None:
+                getattr(self, f'do_{step}')()
+                self.save_fingerprint(step, fingerprint, time.perf_counter() - started)
+        except Exception as e:
+            if step not in OPTIONAL_STEPS:
+                raise
+            self.stdout.write(self.style.ERROR(f'{step}: failed ({e}); continuing'))
+            return
+
+        elapsed = time.perf_counter() - started
+        if reason is None:
+            self.stdout.write(self.style.SUCCESS(f'{step}: done in {elapsed:.2f}s'))
+        else:
+            self.stdout.write(f'{step}: skipped ({reason}) in {elapsed:.2f}s')
+
+    def unchanged(self, step, fingerprint):
+        if self.force:
+            return False
+        return BootstrapStep.objects.filter(name=step, fingerprint=fingerprint).exists()
+
+    def save_fingerprint(self, step, fingerprint, duration):
+        if step in ('load_ingredients', 'create_test_data'):
+            BootstrapStep.objects.update_or_create(
+                name=step, defaults={'fingerprint': fingerprint, 'duration': duration}
+            )
+        elif step == 'collectstatic':
+            with open(os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT_FILE), 'w') as file:
+                file.write(fingerprint)
+
+    # Each check returns (fingerprint, reason to skip or None to run).
+
+    def check_migrate(self):
+        plan = unapplied_migrations(self.connection)
+        if plan or self.force:
+            return None, None
+        return None, 'no unapplied migrations'
+
+    def do_migrate(self):
+        call_command('migrate', interactive=False, verbosity=0)
+
+    def check_collectstatic(self):
+        fingerprint = static_fingerprint()
+        try:
+            with open(os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT_FILE)) as file:
+                collected = file.read().strip()
+        except OSError:
+            collected = None
+        # Collected files live on this container's disk, not in the database.
+        if not self.force and collected == fingerprint:
+            return fingerprint, 'static sources unchanged'
+        return fingerprint, None
+
+    def do_collectstatic(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def check_load_ingredients(self):
+        path = ingredients_csv_path()
+        if not os.path.exists(path):
+            return None, f'{path} not found'
+        fingerprint = file_fingerprint(path)
+        if self.unchanged('load_ingredients', fingerprint):
+            return fingerprint, 'ingredient CSV unchanged'
+        return fingerprint, None
+
+    def do_load_ingredients(self):
+        call_command('load_ingredients', stdout=io.StringIO())
+
+    def check_create_test_data(self):
+        if self.unchanged('create_test_data', TEST_DATA_VERSION):
+            return TEST_DATA_VERSION, 'test data already created'
+        return TEST_DATA_VERSION, None
+
+    def do_create_test_data(self):
+        call_command('create_test_data', stdout=io.StringIO())
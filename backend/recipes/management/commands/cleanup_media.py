@@ -0,0 +1,167 @@
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.constants import RECIPE_IMAGE_UPLOAD_PATH
+from recipes.models import Recipe
+
+
+def iter_storage_files(storage, path):
+    """
+    Yield every file name below path.
+
+    Local and Azure storage are listed lazily (os.scandir(), paged
+    list_blobs()), so memory does not grow with the number of files. Other
+    storages are walked with listdir(), which holds one directory at a time.
+    """
+    # TracedStorage wraps the configured backend
+    backend = getattr(storage, 'backend', storage)
+    if isinstance(backend, FileSystemStorage):
+        return iter_local_files(backend, path)
+    if callable(getattr(getattr(backend, 'client', None), 'list_blobs', None)):
+        return iter_blobs(backend, path)
+    return iter_listed_files(storage, path)
+
+
+def iter_local_files(storage, path):
+    pending = [path]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(storage.path(directory)) as entries:
+            for entry in entries:
+                name = posixpath.join(directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name
+
+
+def iter_blobs(storage, path):
+    """AzureStorage.list_all() without collecting the pages into a list."""
+    prefix = storage._get_valid_path(path).rstrip('/') + '/'
+    location = storage.location.strip('/')
+    for blob in storage.client.list_blobs(name_starts_with=prefix, timeout=storage.timeout):
+        yield blob.name[len(location) + 1:] if location else blob.name
+
+
+def iter_listed_files(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from iter_listed_files(storage, posixpath.join(path, directory))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Delete stored recipe images that are no longer referenced by any recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default=RECIPE_IMAGE_UPLOAD_PATH.rstrip('/'),
+            help='Storage directory to scan',
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help='Only delete files older than this many hours',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of listed files checked against the database per query',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of threads used to inspect and delete files',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting anything',
+        )
+
+    def handle(self, *args, **options):
+        """Stream the storage listing and remove unreferenced files."""
+        self.storage = default_storage
+        self.dry_run = options['dry_run']
+        self.cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        self.stats = {
+            'scanned': 0,
+            'referenced': 0,
+            'recent': 0,
+            'deleted': 0,
+            'bytes': 0,
+            'errors': 0,
+        }
+
+        if not self.storage.exists(options['prefix']):
+            self.stdout.write(
+                self.style.WARNING(f'Nothing to scan: {options["prefix"]} does not exist')
+            )
+            return
+
+        files = iter_storage_files(self.storage, options['prefix'])
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for batch in chunked(files, options['batch_size']):
+                self.stats['scanned'] += len(batch)
+                referenced = set(
+                    Recipe.objects.filter(image__in=batch).values_list('image', flat=True)
+                )
+                self.stats['referenced'] += len(referenced)
+                orphans = [name for name in batch if name not in referenced]
+                for result, size in executor.map(self.collect, orphans):
+                    self.stats[result] += 1
+                    self.stats['bytes'] += size
+
+        self.report()
+
+    def collect(self, name):
+        """Delete one orphaned file if it is past the grace period."""
+        try:
+            if self.storage.get_modified_time(name) > self.cutoff:
+                return 'recent', 0
+            size = self.storage.size(name)
+            if self.dry_run:
+                self.stdout.write(f'Would delete {name} ({size} bytes)')
+            else:
+                self.storage.delete(name)
+            return 'deleted', size
+        except Exception as e:
+            self.stderr.write(f'Failed to process {name}: {e}')
+            return 'errors', 0
+
+    def report(self):
+        stats = self.stats
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(
+            f'Scanned {stats["scanned"]} files: {stats["referenced"]} referenced, '
+            f'{stats["recent"]} orphaned but within grace period'
+        )
+        style = self.style.WARNING if self.dry_run else self.style.SUCCESS
+        self.stdout.write(
+            style(f'{verb} {stats["deleted"]} orphaned files ({stats["bytes"]} bytes)')
+        )
+        if stats['errors']:
+            self.stdout.write(
+                self.style.ERROR(f'{stats["errors"]} files could not be processed')
+            )
@@ -0,0 +1,242 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from api import changes, outbox
+from recipes.bulk import get_writer
+from recipes.constants import RECIPE_IMAGE_UPLOAD_PATH
+from recipes.models import Favorite, Ingredient, OutboxEvent, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'load_user_'
+EMAIL_DOMAIN = 'load.bitesnap.com'
+PASSWORD = 'loadtest-password'
+
+# Every generated row is dated from here on, so the data does not depend on when it was made.
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+TAG_NAMES = [
+    'Breakfast', 'Lunch', 'Dinner', 'Dessert', 'Vegetarian', 'Quick',
+    'Vegan', 'Gluten Free', 'Italian', 'Mexican', 'Asian', 'Soup',
+    'Salad', 'Baking', 'Grill', 'Seafood', 'Budget', 'Kids',
+    'Holiday', 'Healthy', 'Comfort Food', 'Snack', 'Drinks', 'Spicy',
+]
+
+FIRST_NAMES = ['Anna', 'Ben', 'Chloe', 'David', 'Emma', 'Felix', 'Grace', 'Hugo', 'Iris', 'Jack', 'Lena', 'Max']
+LAST_NAMES = ['Smith', 'Garcia', 'Muller', 'Rossi', 'Dubois', 'Novak', 'Kim', 'Silva', 'Berg', 'Jensen']
+
+NAME_ADJECTIVES = ['Smoky', 'Crispy', 'Creamy', 'Spicy', 'Roasted', 'Lemony', 'Garlic', 'Herby', 'Sticky', 'Rustic']
+NAME_MAINS = ['chickpea', 'chicken', 'mushroom', 'salmon', 'lentil', 'tomato', 'beef', 'tofu', 'pumpkin']
+NAME_DISHES = ['stew', 'salad', 'pasta', 'curry', 'soup', 'tacos', 'bowl', 'pie', 'risotto', 'bake', 'skewers']
+
+TEXT_SENTENCES = [
+    'Prepare all the ingredients before you start.',
+    'Heat the oil in a large pan over medium heat.',
+    'Stir occasionally until everything is golden.',
+    'Season to taste and let it rest for a few minutes.',
+    'Serve warm with fresh bread or rice.',
+    'Leftovers keep in the fridge for up to three days.',
+]
+
+
+def skewed(rng, count, exponent):
+    """An index in [0, count) where low indexes are much more likely (popular items)."""
+    return min(int(count * rng.random() ** exponent), count - 1)
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset (users, recipes, favorites) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--recipes', type=int, default=10000, help='Number of recipes to create')
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=50000,
+            help='Approximate number of favorites to create',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows inserted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        """Insert users, recipes (with tags and ingredients) and favorites in large batches."""
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('--users and --recipes must be at least 1')
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('A generated dataset is already present; use a fresh database')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        self.ingredient_ids = list(Ingredient.objects.order_by('id').values_list('id', flat=True))
+        if not self.ingredient_ids:
+            raise CommandError('No ingredients available; run load_ingredients first')
+        self.tag_ids = self.create_tags()
+
+        user_ids = self.timed('users', self.create_users, options['users'])
+        recipe_ids = self.timed('recipes', self.create_recipes, options['recipes'], user_ids)
+        self.timed('favorites', self.create_favorites, options['favorites'], user_ids, recipe_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Dataset generated in {time.monotonic() - started:.1f}s. '
+            f'Users log in as {USERNAME_PREFIX}<n>@{EMAIL_DOMAIN} / {PASSWORD}'
+        ))
+
+    def timed(self, label, create, *args):
+        started = time.monotonic()
+        result = create(*args)
+        count = result if isinstance(result, int) else len(result)
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f'Created {count} {label} in {elapsed:.1f}s ({count / elapsed:.0f} rows/s)')
+        return result
+
+    def create_tags(self):
+        tag_ids = []
+        for name in TAG_NAMES:
+            tag, _ = Tag.objects.get_or_create(slug=slugify(name), defaults={'name': name})
+            tag_ids.append(tag.id)
+        return tag_ids
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def create_users(self, count):
+        # One hash for everyone: hashing per user would dominate the run time.
+        password = make_password(PASSWORD)
+        user_ids = []
+        for batch in self.batches(count):
+            rows = []
+            for i in batch:
+                rows.append((
+                    password, False, f'{USERNAME_PREFIX}{i}',
+                    self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+                    f'{USERNAME_PREFIX}{i}@{EMAIL_DOMAIN}', False, True,
+                    self.timestamp(EPOCH + timedelta(minutes=i)),
+                ))
+            with transaction.atomic(), connection.cursor() as cursor:
+                writer = get_writer(cursor)
+                ids = writer.allocate_ids(User._meta.db_table, len(rows))
+                writer.insert(
+                    User._meta.db_table,
+                    ['id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+                     'email', 'is_staff', 'is_active', 'date_joined'],
+                    [(pk,) + row for pk, row in zip(ids, rows)]
+                )
+            user_ids.extend(ids)
+        return user_ids
+
+    def create_recipes(self, count, user_ids):
+        recipe_ids = []
+        for batch in self.batches(count):
+            recipes, tags, ingredients = [], [], []
+            for i in batch:
+                created = self.timestamp(EPOCH + timedelta(minutes=3 * i))
+                name = ' '.join((
+                    self.rng.choice(NAME_ADJECTIVES), self.rng.choice(NAME_MAINS), self.rng.choice(NAME_DISHES)
+                ))
+                text = ' '.join(self.rng.sample(TEXT_SENTENCES, self.rng.randint(2, 5)))
+                cooking_time = max(1, min(int(self.rng.lognormvariate(3.3, 0.6)), 600))
+                recipes.append((
+                    user_ids[skewed(self.rng, len(user_ids), 3)], name,
+                    f'{RECIPE_IMAGE_UPLOAD_PATH}loadtest.jpg', text, cooking_time, created, created,
+                ))
+                tags.append({self.tag_ids[skewed(self.rng, len(self.tag_ids), 1.5)]
+                             for _ in range(self.rng.randint(1, 3))})
+                ingredients.append({
+                    self.ingredient_ids[skewed(self.rng, len(self.ingredient_ids), 3)]: self.rng.randint(1, 500)
+                    for _ in range(self.rng.randint(3, 10))
+                })
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                writer = get_writer(cursor)
+                ids = writer.allocate_ids(Recipe._meta.db_table, len(recipes))
+                writer.insert(
+                    Recipe._meta.db_table,
+                    ['id', 'author_id', 'name', 'image', 'text', 'cooking_time', 'created_at', 'updated_at'],
+                    [(pk,) + row for pk, row in zip(ids, recipes)]
+                )
+                writer.insert(
+                    Recipe.tags.through._meta.db_table,
+                    ['recipe_id', 'tag_id'],
+                    [(pk, tag_id) for pk, tag_ids in zip(ids, tags) for tag_id in tag_ids]
+                )
+                ingredient_rows = [
+                    (pk, ingredient_id, amount)
+                    for pk, amounts in zip(ids, ingredients)
+                    for ingredient_id, amount in amounts.items()
+                ]
+                ingredient_ids = writer.allocate_ids(RecipeIngredient._meta.db_table, len(ingredient_rows))
+                writer.insert(
+                    RecipeIngredient._meta.db_table,
+                    ['id', 'recipe_id', 'ingredient_id', 'amount'],
+                    [(pk,) + row for pk, row in zip(ingredient_ids, ingredient_rows)]
+                )
+                changes.record_recipes(writer, ids)
+                outbox.write_many(writer, [
+                    event
+                    for pk, recipe, tag_ids in zip(ids, recipes, tags)
+                    for event in outbox.recipe_events(Recipe(id=pk, author_id=recipe[0]), tag_ids)
+                ] + [
+                    outbox.build_event(
+                        RecipeIngredient(id=pk, recipe_id=recipe_id, ingredient_id=ingredient_id), OutboxEvent.CREATED,
+                    )
+                    for pk, (recipe_id, ingredient_id, _) in zip(ingredient_ids, ingredient_rows)
+                ])
+            recipe_ids.extend(ids)
+        return recipe_ids
+
+    def favorite_rows(self, total, user_ids, recipe_ids):
+        """Per-user favorites: most users have a few, some have many; popular recipes dominate."""
+        mean = total / len(user_ids)
+        for i, user_id in enumerate(user_ids):
+            wanted = min(int(mean * self.rng.expovariate(1.0)), len(recipe_ids) // 2)
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.add(recipe_ids[skewed(self.rng, len(recipe_ids), 2)])
+            created = self.timestamp(EPOCH + timedelta(hours=i))
+            for recipe_id in sorted(chosen):
+                yield (user_id, recipe_id, created)
+
+    def create_favorites(self, total, user_ids, recipe_ids):
+        created = 0
+        rows = self.favorite_rows(total, user_ids, recipe_ids)
+        while True:
+            batch = [row for _, row in zip(range(self.batch_size), rows)]
+            if not batch:
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                writer = get_writer(cursor)
+                ids = writer.allocate_ids(Favorite._meta.db_table, len(batch))
+                writer.insert(
+                    Favorite._meta.db_table,
+                    ['id', 'user_id', 'recipe_id', 'created_at'],
+                    [(pk,) + row for pk, row in zip(ids, batch)]
+                )
+                changes.record_favorites(writer, [(user_id, recipe_id) for user_id, recipe_id, _ in batch])
+                outbox.write_many(writer, [
+                    outbox.build_event(Favorite(id=pk, user_id=user_id, recipe_id=recipe_id), OutboxEvent.CREATED)
+                    for pk, (user_id, recipe_id, _) in zip(ids, batch)
+                ])
+            created += len(ids)
+        return created
+
+    def timestamp(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
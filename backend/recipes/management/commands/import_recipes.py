@@ -0,0 +1,258 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api import changes, outbox
+from recipes.constants import (
+    MIN_COOKING_TIME,
+    MIN_INGREDIENT_AMOUNT,
+    RECIPE_NAME_MAX_LENGTH,
+)
+from recipes.bulk import get_writer
+from recipes.models import ImportCheckpoint, Tag, Ingredient, OutboxEvent, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+MAX_REPORTED_ERRORS = 20
+
+
+def read_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {'error': f'Invalid JSON: {e}'}
+
+
+def read_csv(file):
+    """Read CSV rows; tags are 'slug|slug', ingredients 'name:unit:amount|...'."""
+    for row in csv.DictReader(file):
+        row['tags'] = [slug for slug in (row.get('tags') or '').split('|') if slug]
+        ingredients = []
+        for item in (row.get('ingredients') or '').split('|'):
+            if not item:
+                continue
+            parts = item.rsplit(':', 2)
+            if len(parts) != 3:
+                row['error'] = f'Invalid ingredient "{item}"'
+                break
+            name, measurement_unit, amount = parts
+            ingredients.append({'name': name, 'measurement_unit': measurement_unit, 'amount': amount})
+        row['ingredients'] = ingredients
+        yield row
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class Command(BaseCommand):
+    help = 'Bulk import recipes from an NDJSON or CSV dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the NDJSON or CSV file')
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Input format (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of recipes inserted per transaction',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Name under which progress is recorded in the database, with every batch',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip rows already imported according to --checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        """Stream the dump and insert recipes in large batches."""
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        checkpoint = options['checkpoint']
+
+        skip = 0
+        if options['resume']:
+            if not checkpoint:
+                raise CommandError('--resume requires --checkpoint')
+            skip = self.read_checkpoint(checkpoint, path)
+            self.stdout.write(f'Resuming after row {skip}')
+
+        self.load_reference_maps()
+        self.errors = 0
+        self.imported = 0
+        consumed = skip
+        started = time.monotonic()
+
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            rows = islice(enumerate(READERS[file_format](file), 1), skip, None)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                recipes = [recipe for recipe in map(self.resolve, batch) if recipe]
+                consumed = batch[-1][0]
+                with transaction.atomic():
+                    self.insert_batch(recipes)
+                    if checkpoint:
+                        # Committed with the batch: a crash cannot leave one without the other
+                        self.write_checkpoint(checkpoint, path, consumed, self.imported + len(recipes))
+                self.imported += len(recipes)
+                elapsed = max(time.monotonic() - started, 1e-9)
+                self.stdout.write(
+                    f'Imported {self.imported} recipes '
+                    f'({self.imported / elapsed:.0f} rows/s)'
+                )
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {self.imported} recipes from {consumed - skip} rows '
+                f'in {elapsed:.1f}s ({self.imported / elapsed:.0f} rows/s)'
+            )
+        )
+        if self.errors:
+            self.stdout.write(
+                self.style.WARNING(f'Skipped {self.errors} invalid rows')
+            )
+
+    def load_reference_maps(self):
+        """Load authors, tags and ingredients into memory (3 queries instead of N)."""
+        self.users = dict(User.objects.values_list('email', 'id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+
+    def resolve(self, numbered_row):
+        """Turn a raw row into ids ready for insertion, or None if it is invalid."""
+        row_num, row = numbered_row
+        try:
+            if 'error' in row:
+                raise ValueError(row['error'])
+            author_id = self.users.get(row.get('author'))
+            if author_id is None:
+                raise ValueError(f'Unknown author "{row.get("author")}"')
+            name = (row.get('name') or '').strip()
+            text = (row.get('text') or '').strip()
+            if not name or not text or len(name) > RECIPE_NAME_MAX_LENGTH:
+                raise ValueError('Invalid name or text')
+            cooking_time = int(row.get('cooking_time'))
+            if cooking_time < MIN_COOKING_TIME:
+                raise ValueError('Invalid cooking time')
+
+            tag_ids = set()
+            for slug in row.get('tags') or []:
+                if slug not in self.tags:
+                    raise ValueError(f'Unknown tag "{slug}"')
+                tag_ids.add(self.tags[slug])
+
+            ingredients = {}
+            for item in row.get('ingredients') or []:
+                key = (item['name'].strip(), item['measurement_unit'].strip())
+                if key not in self.ingredients:
+                    raise ValueError(f'Unknown ingredient "{key[0]} ({key[1]})"')
+                amount = int(item['amount'])
+                if amount < MIN_INGREDIENT_AMOUNT or self.ingredients[key] in ingredients:
+                    raise ValueError(f'Invalid amount or duplicate ingredient "{key[0]}"')
+                ingredients[self.ingredients[key]] = amount
+
+            if not tag_ids or not ingredients:
+                raise ValueError('Recipe needs at least one tag and one ingredient')
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            self.errors += 1
+            if self.errors <= MAX_REPORTED_ERRORS:
+                self.stdout.write(self.style.WARNING(f'Skipping row {row_num}: {e}'))
+            return None
+
+        return {
+            'author_id': author_id,
+            'name': name,
+            'text': text,
+            'cooking_time': cooking_time,
+            'image': row.get('image') or '',
+            'tag_ids': tag_ids,
+            'ingredients': ingredients,
+        }
+
+    def insert_batch(self, recipes):
+        if not recipes:
+            return
+        recipe_table = Recipe._meta.db_table
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        with connection.cursor() as cursor:
+            writer = get_writer(cursor)
+            ids = writer.allocate_ids(recipe_table, len(recipes))
+
+            writer.insert(
+                recipe_table,
+                ['id', 'author_id', 'name', 'image', 'text', 'cooking_time', 'created_at', 'updated_at'],
+                [
+                    (pk, r['author_id'], r['name'], r['image'], r['text'], r['cooking_time'], now, now)
+                    for pk, r in zip(ids, recipes)
+                ]
+            )
+            writer.insert(
+                Recipe.tags.through._meta.db_table,
+                ['recipe_id', 'tag_id'],
+                [(pk, tag_id) for pk, r in zip(ids, recipes) for tag_id in r['tag_ids']]
+            )
+            ingredient_rows = [
+                (pk, ingredient_id, amount)
+                for pk, r in zip(ids, recipes)
+                for ingredient_id, amount in r['ingredients'].items()
+            ]
+            ingredient_ids = writer.allocate_ids(RecipeIngredient._meta.db_table, len(ingredient_rows))
+            writer.insert(
+                RecipeIngredient._meta.db_table,
+                ['id', 'recipe_id', 'ingredient_id', 'amount'],
+                [(pk,) + row for pk, row in zip(ingredient_ids, ingredient_rows)]
+            )
+            changes.record_recipes(writer, ids)
+            outbox.write_many(writer, [
+                event
+                for pk, r in zip(ids, recipes)
+                for event in outbox.recipe_events(Recipe(id=pk, author_id=r['author_id']), r['tag_ids'])
+            ] + [
+                outbox.build_event(
+                    RecipeIngredient(id=pk, recipe_id=recipe_id, ingredient_id=ingredient_id), OutboxEvent.CREATED,
+                )
+                for pk, (recipe_id, ingredient_id, _) in zip(ingredient_ids, ingredient_rows)
+            ])
+
+    def read_checkpoint(self, checkpoint, path):
+        state = ImportCheckpoint.objects.filter(name=checkpoint).first()
+        if state is None:
+            return 0
+        if state.source != os.path.abspath(path):
+            raise CommandError(f'Checkpoint {checkpoint} belongs to {state.source}')
+        return state.rows
+
+    def write_checkpoint(self, checkpoint, path, rows, imported):
+        ImportCheckpoint.objects.update_or_create(
+            name=checkpoint,
+            defaults={'source': os.path.abspath(path), 'rows': rows, 'imported': imported},
+        )
@@ -2,7 +2,10 @@ import csv
 import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from recipes.models import Ingredient
+from django.db import transaction
+from django.db.models import Max
+from api import outbox
+from recipes.models import Ingredient, OutboxEvent
 
 
 class Command(BaseCommand):
@@ -94,11 +97,15 @@ class Command(BaseCommand):
         # Bulk create all at once (much faster with remote databases)
         if ingredients_to_create:
             self.stdout.write(f'Creating {len(ingredients_to_create)} ingredients in bulk...')
-            Ingredient.objects.bulk_create(
-                ingredients_to_create,
-                batch_size=500,  # Insert in batches of 500
-                ignore_conflicts=True  # Skip duplicates if any
-            )
+            with transaction.atomic():
+                last_id = Ingredient.objects.aggregate(last=Max('id'))['last'] or 0
+                Ingredient.objects.bulk_create(
+                    ingredients_to_create,
+                    batch_size=500,  # Insert in batches of 500
+                    ignore_conflicts=True  # Skip duplicates if any
+                )
+                # bulk_create() sends no signals, and with ignore_conflicts sets no ids
+                outbox.publish_many(Ingredient.objects.filter(id__gt=last_id), OutboxEvent.CREATED)
             created_count = len(ingredients_to_create)
             self.stdout.write(
                 self.style.SUCCESS(
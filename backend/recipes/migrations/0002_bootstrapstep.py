@@ -0,0 +1,28 @@
+# Generated by Django 4.2.24 on 2026-10-19 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BootstrapStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='Step')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Fingerprint')),
+                ('duration', models.FloatField(default=0, verbose_name='Duration (seconds)')),
+                ('completed_at', models.DateTimeField(auto_now=True, verbose_name='Completed At')),
+            ],
+            options={
+                'verbose_name': 'Bootstrap Step',
+                'verbose_name_plural': 'Bootstrap Steps',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_bootstrapstep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('recipe', 'Recipe'), ('favorite', 'Favorite')], max_length=16, verbose_name='Kind')),
+                ('recipe_id', models.BigIntegerField(verbose_name='Recipe ID')),
+                ('user_id', models.BigIntegerField(blank=True, help_text='Owner of the favorite; empty for recipe changes', null=True, verbose_name='User ID')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Deleted')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Recorded At')),
+            ],
+            options={
+                'verbose_name': 'Recipe Change',
+                'verbose_name_plural': 'Recipe Changes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
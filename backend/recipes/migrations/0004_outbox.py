@@ -0,0 +1,44 @@
+# Generated by Django 4.2.24 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=64, unique=True, verbose_name='Consumer')),
+                ('position', models.BigIntegerField(default=0, help_text='Id of the last event the consumer has processed', verbose_name='Position')),
+                ('failures', models.PositiveIntegerField(default=0, help_text='Failed deliveries since the consumer was registered', verbose_name='Failures')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Outbox Checkpoint',
+                'verbose_name_plural': 'Outbox Checkpoints',
+                'ordering': ['consumer'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(help_text='Kind of object that changed, e.g. recipe or favorite', max_length=32, verbose_name='Topic')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=16, verbose_name='Action')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Payload')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Outbox Event',
+                'verbose_name_plural': 'Outbox Events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Checkpoint')),
+                ('source', models.CharField(max_length=1024, verbose_name='Source File')),
+                ('rows', models.PositiveBigIntegerField(default=0, verbose_name='Rows Consumed')),
+                ('imported', models.PositiveBigIntegerField(default=0, verbose_name='Recipes Imported')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Import Checkpoint',
+                'verbose_name_plural': 'Import Checkpoints',
+                'ordering': ['name'],
+            },
+        ),
+    ]
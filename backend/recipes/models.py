@@ -248,3 +248,207 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.name}'
+
+
+class BootstrapStep(models.Model):
+    """
+    Fingerprint of the last successful run of a ``bootstrap`` step.
+
+    A container start skips a step whose inputs still hash to the stored
+    fingerprint.
+    """
+    name = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Step'
+    )
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name='Fingerprint'
+    )
+    duration = models.FloatField(
+        default=0,
+        verbose_name='Duration (seconds)'
+    )
+    completed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Completed At'
+    )
+
+    class Meta:
+        verbose_name = 'Bootstrap Step'
+        verbose_name_plural = 'Bootstrap Steps'
+        ordering = ['name']
+
+    def __str__(self):
+        return f'{self.name}: {self.fingerprint[:12]}'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an ``import_recipes`` run, saved in the transaction of each batch.
+
+    Rows of the source up to ``rows`` are imported exactly when this says so,
+    so ``--resume`` never repeats or skips a batch.
+    """
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Checkpoint'
+    )
+    source = models.CharField(
+        max_length=1024,
+        verbose_name='Source File'
+    )
+    rows = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Rows Consumed'
+    )
+    imported = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Recipes Imported'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Updated At'
+    )
+
+    class Meta:
+        verbose_name = 'Import Checkpoint'
+        verbose_name_plural = 'Import Checkpoints'
+        ordering = ['name']
+
+    def __str__(self):
+        return f'{self.name}: {self.rows} rows of {self.source}'
+
+
+class RecipeChange(models.Model):
+    """
+    Append-only log of recipe and favorite changes read by delta sync.
+
+    The id is the sync cursor. Recipe and user ids are plain integers, not
+    foreign keys, so a row outlives the recipe it records the deletion of.
+    """
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    KIND_CHOICES = [
+        (RECIPE, 'Recipe'),
+        (FAVORITE, 'Favorite'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(
+        max_length=16,
+        choices=KIND_CHOICES,
+        verbose_name='Kind'
+    )
+    recipe_id = models.BigIntegerField(
+        verbose_name='Recipe ID'
+    )
+    user_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='User ID',
+        help_text='Owner of the favorite; empty for recipe changes'
+    )
+    deleted = models.BooleanField(
+        default=False,
+        verbose_name='Deleted'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Recorded At'
+    )
+
+    class Meta:
+        verbose_name = 'Recipe Change'
+        verbose_name_plural = 'Recipe Changes'
+        ordering = ['id']
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f'#{self.id} {self.kind} {self.recipe_id} {action}'
+
+
+class OutboxEvent(models.Model):
+    """
+    Domain change event, written in the transaction of the change.
+
+    Delivered to in-process consumers by the dispatch_outbox command; the id
+    orders events and is what consumer checkpoints point at.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(
+        max_length=32,
+        verbose_name='Topic',
+        help_text='Kind of object that changed, e.g. recipe or favorite'
+    )
+    action = models.CharField(
+        max_length=16,
+        choices=ACTION_CHOICES,
+        verbose_name='Action'
+    )
+    object_id = models.BigIntegerField(
+        verbose_name='Object ID'
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Payload'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Created At'
+    )
+
+    class Meta:
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'#{self.id} {self.topic} {self.object_id} {self.action}'
+
+
+class OutboxCheckpoint(models.Model):
+    """
+    Last outbox event delivered to a consumer.
+    """
+    consumer = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Consumer'
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Position',
+        help_text='Id of the last event the consumer has processed'
+    )
+    failures = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Failures',
+        help_text='Failed deliveries since the consumer was registered'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Updated At'
+    )
+
+    class Meta:
+        verbose_name = 'Outbox Checkpoint'
+        verbose_name_plural = 'Outbox Checkpoints'
+        ordering = ['consumer']
+
+    def __str__(self):
+        return f'{self.consumer}: {self.position}'
@@ -3,12 +3,41 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
 
 from recipes.models import Tag, Ingredient, Recipe, RecipeIngredient
+from api.authentication import token_cache
+from api.caching import single_flight
+from api.health import monitor as health_monitor
+from api.metrics import registry as metrics_registry
+from api.outbox import delivery_stats
+from api.response_cache import recipe_list_cache
+from api.sql_profiling import store as sql_profile_store
+from bitesnap.db.replicas import monitor as replica_monitor
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def reset_process_state():
+    cache.clear()
+    token_cache.clear()
+    health_monitor.reset()
+    metrics_registry.reset()
+    sql_profile_store.clear()
+    replica_monitor.reset()
+    recipe_list_cache.clear()
+    single_flight.clear()
+    delivery_stats.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Uploads made by tests go to a temporary directory, not the tree."""
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    return settings.MEDIA_ROOT
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
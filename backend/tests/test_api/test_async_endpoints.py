@@ -0,0 +1,89 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Favorite
+
+
+def async_get(path, data=None, headers=None):
+    async def get():
+        return await AsyncClient().get(path, data or {}, headers=headers)
+
+    response = async_to_sync(get)()
+    return response.status_code, response.json()
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestAsyncReadEndpoints:
+
+    def test_recipe_list_matches_sync_endpoint(self, api_client, test_recipes, test_tags):
+        params = {'limit': 2, 'page': 2, 'tags': [test_tags[0].slug, test_tags[1].slug]}
+
+        status, data = async_get(reverse('api:async-recipes-list'), params)
+        expected = api_client.get(reverse('api:recipes-list'), params).json()
+
+        assert status == 200
+        assert data['count'] == expected['count']
+        assert data['results'] == expected['results']
+        assert (data['next'] is None) == (expected['next'] is None)
+        assert (data['previous'] is None) == (expected['previous'] is None)
+
+    def test_recipe_list_is_favorited_for_token_user(self, test_user, test_recipes):
+        Favorite.objects.create(user=test_user, recipe=test_recipes[0])
+        token = Token.objects.create(user=test_user)
+
+        status, data = async_get(
+            reverse('api:async-recipes-list'), {'is_favorited': 'true'},
+            headers={'Authorization': f'Token {token.key}'}
+        )
+
+        assert status == 200
+        assert [r['id'] for r in data['results']] == [test_recipes[0].id]
+        assert data['results'][0]['is_favorited'] is True
+
+    def test_recipe_detail_and_missing(self, test_recipe):
+        status, data = async_get(reverse('api:async-recipes-detail', kwargs={'pk': test_recipe.id}))
+        missing_status, _ = async_get(reverse('api:async-recipes-detail', kwargs={'pk': 999999}))
+
+        assert status == 200
+        assert data['name'] == test_recipe.name
+        assert len(data['ingredients']) == 3
+        assert missing_status == 404
+
+    def test_tags_and_ingredient_search(self, test_tags, test_ingredients):
+        tags_status, tags = async_get(reverse('api:async-tags-list'))
+        _, ingredients = async_get(reverse('api:async-ingredients-list'), {'name': 'su'})
+
+        assert tags_status == 200
+        assert len(tags) == len(test_tags)
+        assert [i['name'] for i in ingredients] == ['Sugar']
+
+
+def async_chain(middleware_paths):
+    """Instantiate middleware around an async view as the ASGI handler does; the classes that needed adapting."""
+    async def view(request):
+        return HttpResponse()
+
+    handler = view
+    adapted = []
+    for path in reversed(middleware_paths):
+        handler = import_string(path)(handler)
+        if not iscoroutinefunction(handler):
+            adapted.append(path)
+            handler = sync_to_async(handler)
+    return adapted
+
+
+@pytest.mark.unit
+class TestAsyncMiddlewareChain:
+    def test_default_chain_stays_async(self, settings):
+        assert async_chain(settings.MIDDLEWARE) == []
+
+    def test_optional_middleware_stays_async(self, settings):
+        optional = ['bitesnap.db.replicas.ReplicaMiddleware', 'bitesnap.tracing.TracingMiddleware']
+        assert async_chain(optional + settings.MIDDLEWARE) == []
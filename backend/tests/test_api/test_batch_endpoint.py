@@ -0,0 +1,62 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+URL = reverse('api:batch-list')
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestBatchEndpoint:
+
+    def test_combines_responses_in_order(self, authenticated_client, test_recipe):
+        urls = ['/api/users/me/', '/api/tags/', '/api/recipes/?page=1&limit=6']
+
+        response = authenticated_client.get(URL, {'url': urls})
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['responses']
+        assert [result['url'] for result in results] == urls
+        assert [result['status'] for result in results] == [200, 200, 200]
+        assert results[0]['body']['email'] == authenticated_client.user.email
+        assert results[1]['body'] == authenticated_client.get('/api/tags/').data
+        assert results[2]['body'] == authenticated_client.get('/api/recipes/?page=1&limit=6').data
+        assert 'private' in response['Cache-Control']
+
+    def test_anonymous_cached_pages_are_decoded(self, api_client, test_recipe):
+        url = '/api/recipes/?page=1&limit=6'
+        page = api_client.get(url).json()
+
+        response = api_client.get(URL, {'url': [url]})
+        browsable = api_client.get(URL, {'url': [url]}, HTTP_ACCEPT='text/html')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['responses'][0]['body'] == page
+        assert browsable.data['responses'][0]['body'] == page
+
+    def test_sub_requests_keep_their_permissions(self, api_client, test_recipe):
+        response = api_client.get(URL, {'url': ['/api/users/me/', f'/api/recipes/{test_recipe.id}/']})
+
+        results = response.data['responses']
+        assert results[0]['status'] == status.HTTP_401_UNAUTHORIZED
+        assert results[1]['status'] == status.HTTP_200_OK
+        assert results[1]['body']['is_favorited'] is False
+
+    @pytest.mark.parametrize('url', [
+        '/api/export/recipes/',
+        '/api/auth/users/',
+        '/api/missing/',
+        'https://example.com/api/tags/',
+        'api/tags/',
+    ])
+    def test_rejects_routes_outside_whitelist(self, authenticated_client, url):
+        response = authenticated_client.get(URL, {'url': ['/api/tags/', url]})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+
+    def test_limits_number_of_urls(self, api_client, settings):
+        settings.BATCH_MAX_REQUESTS = 2
+
+        assert api_client.get(URL, {'url': ['/api/tags/'] * 3}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(URL).status_code == status.HTTP_400_BAD_REQUEST
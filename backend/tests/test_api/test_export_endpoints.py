@@ -0,0 +1,55 @@
+import gzip
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite
+
+
+@pytest.fixture
+def staff_client(user_factory):
+    client = APIClient()
+    client.force_authenticate(user=user_factory(is_staff=True))
+    return client
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestExportEndpoints:
+
+    def test_export_requires_staff(self, authenticated_client):
+        response = authenticated_client.get(reverse('api:export-recipes'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_export_recipes_streams_ndjson(self, staff_client, test_recipes):
+        response = staff_client.get(reverse('api:export-recipes'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = read_ndjson(response)
+        assert [row['id'] for row in rows] == sorted(recipe.id for recipe in test_recipes)
+        assert rows[0]['tags'] and rows[0]['ingredients'][0]['amount'] == 100
+
+    def test_export_recipes_gzip(self, staff_client, test_recipes):
+        response = staff_client.get(reverse('api:export-recipes'), {'gzip': '1'})
+
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        assert len(lines) == len(test_recipes)
+
+    def test_export_user_favorites(self, staff_client, test_user, test_recipes):
+        Favorite.objects.create(user=test_user, recipe=test_recipes[1])
+
+        response = staff_client.get(reverse('api:export-favorites'), {'user': test_user.id})
+
+        rows = read_ndjson(response)
+        assert len(rows) == 1
+        assert rows[0]['id'] == test_recipes[1].id
+        assert 'favorited_at' in rows[0]
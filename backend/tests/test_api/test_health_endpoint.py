@@ -1,6 +1,14 @@
+import os
+import threading
+import time
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
+from api import health
+
 
 @pytest.mark.django_db
 @pytest.mark.integration
@@ -39,3 +47,83 @@ class TestHealthEndpoint:
         data = response.json()
         assert 'storage' in data['checks']
         assert data['checks']['storage'] in ['azure_blob_configured', 'local_storage']
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestHealthProbes:
+
+    def test_liveness_does_no_io(self, api_client):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/health/live')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'status': 'alive'}
+        assert len(queries) == 0
+
+    def test_readiness_result_is_cached(self, api_client):
+        first = api_client.get('/health/ready')
+        with CaptureQueriesContext(connection) as queries:
+            second = api_client.get('/health/ready')
+
+        assert first.status_code == status.HTTP_200_OK
+        assert second.json()['checks']['database'] == 'connected'
+        assert len(queries) == 0
+
+    def test_details_reports_latency_cache_and_uptime(self, api_client):
+        response = api_client.get('/health/details')
+
+        data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert data['database']['samples'] == 1
+        assert data['database']['latency_ms']['p99'] is not None
+        assert data['cache']['status'] == 'ok'
+        assert data['database']['connections']['default']['health_checks'] in (True, False)
+        assert data['worker']['uptime_seconds'] >= 0
+
+
+@pytest.mark.unit
+class TestReadinessMonitor:
+
+    def test_concurrent_inline_checks_run_once(self, monkeypatch):
+        monitor = health.ReadinessMonitor()
+        calls = []
+
+        def run_checks():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'status': 'healthy', 'checks': {}}
+        monkeypatch.setattr(monitor, 'run_checks', run_checks)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(monitor.get())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert [result['status'] for result in results] == ['healthy'] * 5
+
+    def test_reset_clears_pending_refresh(self):
+        monitor = health.ReadinessMonitor()
+        monitor._refreshing = True
+
+        monitor.reset()
+
+        assert monitor._refreshing is False
+
+    @pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='needs fork')
+    def test_uptime_restarts_in_forked_worker(self):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            os.write(write, repr(health.PROCESS_STARTED).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as pipe:
+            started_in_child = float(pipe.read())
+        os.waitpid(pid, 0)
+
+        assert started_in_child > health.PROCESS_STARTED
@@ -0,0 +1,124 @@
+import threading
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+
+from api.images import VariantCache, variant_url
+
+
+def make_image_file(name='photo.png', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 80, 40)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name=name, content=buffer.getvalue(), content_type='image/png')
+
+
+@pytest.fixture
+def variant_cache_dir(tmp_path):
+    with override_settings(IMAGE_VARIANT_CACHE_DIR=tmp_path / 'variants'):
+        yield tmp_path / 'variants'
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestImageVariantEndpoint:
+
+    def test_variant_is_resized_webp(self, api_client, recipe_factory, variant_cache_dir):
+        recipe = recipe_factory(image=make_image_file())
+
+        response = api_client.get(variant_url(recipe.image, 'card'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'image/webp'
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        assert image.format == 'WEBP'
+        assert image.size == (480, 320)
+
+    def test_variant_is_rendered_once(self, api_client, recipe_factory, variant_cache_dir):
+        recipe = recipe_factory(image=make_image_file())
+        url = variant_url(recipe.image, 'card')
+
+        api_client.get(url)
+        api_client.get(url)
+
+        assert len(list(variant_cache_dir.iterdir())) == 1
+
+    def test_unknown_size_not_found(self, api_client, recipe_factory, variant_cache_dir):
+        recipe = recipe_factory(image=make_image_file())
+        url = reverse('image-variant', kwargs={'width': 17, 'height': 9, 'name': recipe.image.name})
+
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_recipe_list_includes_variant_urls(self, api_client, recipe_factory, variant_cache_dir):
+        recipe_factory(image=make_image_file())
+
+        response = api_client.get(reverse('api:recipes-list'))
+
+        card_url = response.json()['results'][0]['image_variants']['card']
+        assert '/media/variants/480x320/' in card_url
+        assert card_url.endswith('.webp')
+
+
+@pytest.mark.unit
+class TestVariantCache:
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = VariantCache(tmp_path, max_bytes=25)
+
+        for key, data in [('a', b'x' * 10), ('b', b'x' * 10), ('a', b'unused'), ('c', b'x' * 10)]:
+            cache.get_or_create(key, lambda: data).close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['a', 'c']
+        assert cache.total_bytes == 20
+
+    def test_open_file_survives_eviction(self, tmp_path):
+        cache = VariantCache(tmp_path, max_bytes=15)
+
+        with cache.get_or_create('a', lambda: b'a' * 10) as file:
+            cache.get_or_create('b', lambda: b'b' * 10).close()
+
+            assert not (tmp_path / 'a').exists()
+            assert file.read() == b'a' * 10
+
+    def test_file_removed_elsewhere_is_a_miss(self, tmp_path):
+        cache = VariantCache(tmp_path, max_bytes=1024)
+        cache.get_or_create('a', lambda: b'old').close()
+        (tmp_path / 'a').unlink()
+
+        with cache.get_or_create('a', lambda: b'new') as file:
+            assert file.read() == b'new'
+        assert cache.misses == 2
+        assert cache.total_bytes == 3
+
+    def test_concurrent_misses_render_once(self, tmp_path):
+        cache = VariantCache(tmp_path, max_bytes=1024)
+        renders = []
+        started = threading.Event()
+
+        def render():
+            renders.append(1)
+            started.wait(0.2)
+            return b'data'
+
+        def read():
+            with cache.get_or_create('key', render) as file:
+                assert file.read() == b'data'
+
+        threads = [
+            threading.Thread(target=read)
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(renders) == 1
+        assert cache.misses == 1
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from recipes.models import Favorite, RecipeChange
+
+URL = reverse('api:recipes-changes')
+
+
+@pytest.fixture
+def settled(settings):
+    settings.RECIPE_CHANGES_SETTLE_SECONDS = 0
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestRecipeChangesEndpoint:
+
+    def test_without_since_returns_head_cursor(self, api_client, recipe_factory, settled):
+        recipe_factory()
+
+        response = api_client.get(URL)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'cursor': RecipeChange.objects.latest('id').id}
+
+    def test_changed_and_deleted_recipes_since_cursor(self, api_client, recipe_factory, settled):
+        kept, changed, removed = recipe_factory.create_batch(3)
+        cursor = api_client.get(URL).data['cursor']
+        changed.name = 'Renamed'
+        changed.save()
+        changed.save()
+        removed_id = removed.id
+        removed.delete()
+
+        response = api_client.get(URL, {'since': cursor})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [recipe['name'] for recipe in response.data['recipes']] == ['Renamed']
+        assert 'updated_at' in response.data['recipes'][0]
+        assert response.data['deleted'] == [removed_id]
+        assert response.data['has_more'] is False
+        assert kept.id not in [recipe['id'] for recipe in response.data['recipes']]
+        follow_up = api_client.get(URL, {'since': response.data['cursor']})
+        assert follow_up.data['recipes'] == [] and follow_up.data['deleted'] == []
+
+    def test_only_callers_favorites_are_returned(self, authenticated_client, recipe_factory, user_factory, settled):
+        liked, unliked = recipe_factory.create_batch(2)
+        Favorite.objects.create(user=authenticated_client.user, recipe=unliked)
+        cursor = authenticated_client.get(URL).data['cursor']
+        Favorite.objects.create(user=user_factory(), recipe=unliked)
+        authenticated_client.post(reverse('api:recipes-favorite', kwargs={'pk': liked.id}))
+        authenticated_client.delete(reverse('api:recipes-favorite', kwargs={'pk': unliked.id}))
+
+        response = authenticated_client.get(URL, {'since': cursor})
+
+        assert response.data['favorites'] == {'added': [liked.id], 'removed': [unliked.id]}
+        assert response.data['recipes'] == []
+
+    def test_batches_are_limited(self, api_client, recipe_factory, settings, settled):
+        settings.RECIPE_CHANGES_PAGE_SIZE = 2
+        recipe_factory.create_batch(3)
+
+        first = api_client.get(URL, {'since': 0})
+        second = api_client.get(URL, {'since': first.data['cursor']})
+
+        assert first.data['has_more'] is True
+        assert len(first.data['recipes']) == 2
+        assert len(second.data['recipes']) == 1
+
+    def test_recent_changes_wait_for_settle_window(self, api_client, recipe_factory, settings):
+        settings.RECIPE_CHANGES_SETTLE_SECONDS = 60
+        recipe_factory()
+
+        response = api_client.get(URL, {'since': 0})
+
+        assert response.data['recipes'] == []
+        assert response.data['cursor'] == 0
+
+    def test_invalid_and_pruned_cursors(self, api_client, recipe_factory, settled):
+        recipe_factory.create_batch(2)
+        cursor = api_client.get(URL).data['cursor']
+        recipe_factory()
+        RecipeChange.objects.update(created_at=timezone.now() - timedelta(days=40))
+
+        call_command('prune_recipe_changes', days=30, stdout=StringIO())
+
+        assert api_client.get(URL, {'since': 'yesterday'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(URL, {'since': cursor}).status_code == status.HTTP_410_GONE
+        assert RecipeChange.objects.count() == 1
@@ -15,7 +15,7 @@ class TestRecipeListEndpoint:
         response = api_client.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == 3
+        assert response.json()['count'] == 3
 
     def test_list_recipes_filter_by_tag(self, api_client, recipe_factory, tag_factory):
         tag1 = tag_factory(slug='breakfast')
@@ -27,8 +27,8 @@ class TestRecipeListEndpoint:
         response = api_client.get(url, {'tags': 'breakfast'})
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == 1
-        recipe_ids = [r['id'] for r in response.data['results']]
+        assert response.json()['count'] == 1
+        recipe_ids = [r['id'] for r in response.json()['results']]
         assert recipe1.id in recipe_ids
         assert recipe2.id not in recipe_ids
 
@@ -151,3 +151,50 @@ class TestRecipeFavoriteEndpoint:
             user=authenticated_client.user,
             recipe=recipe
         ).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestRecipeListCache:
+
+    def test_anonymous_pages_are_served_from_cache(self, api_client, recipe_factory, django_assert_num_queries):
+        recipe_factory.create_batch(3)
+        url = reverse('api:recipes-list')
+
+        first = api_client.get(url, {'tags': ['b', 'a'], 'limit': 2})
+        with django_assert_num_queries(0):
+            second = api_client.get(url, {'limit': 2, 'tags': ['a', 'b'], 'is_favorited': 1})
+
+        assert second.content == first.content
+        assert second['Cache-Control'] == 'public, max-age=30'
+        assert 'Accept, Authorization' in second['Vary']
+        assert second.json()['count'] == first.json()['count']
+
+    def test_changes_invalidate_cached_pages(self, api_client, recipe_factory, tag_factory):
+        recipe = recipe_factory()
+        url = reverse('api:recipes-list')
+        api_client.get(url)
+
+        recipe.name = 'Renamed'
+        recipe.save()
+        renamed = api_client.get(url)
+        recipe.tags.add(tag_factory(slug='new'))
+        tagged = api_client.get(url)
+        recipe_factory()
+        added = api_client.get(url)
+
+        assert renamed.json()['results'][0]['name'] == 'Renamed'
+        assert [tag['slug'] for tag in tagged.json()['results'][0]['tags']] == ['new']
+        assert added.json()['count'] == 2
+
+    def test_authenticated_responses_are_private(self, authenticated_client, recipe_factory, api_client):
+        recipe = recipe_factory()
+        url = reverse('api:recipes-list')
+        api_client.get(url)
+        Favorite.objects.create(user=authenticated_client.user, recipe=recipe)
+
+        response = authenticated_client.get(url)
+
+        assert response.data['results'][0]['is_favorited'] is True
+        assert 'private' in response['Cache-Control']
+        assert 'Authorization' in response['Vary']
@@ -0,0 +1,78 @@
+import pickle
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication, cache_key, cached_fields, token_cache
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    def test_second_lookup_served_from_cache(self, test_user):
+        token = Token.objects.create(user=test_user)
+        auth = CachedTokenAuthentication()
+
+        auth.authenticate_credentials(token.key)
+        with CaptureQueriesContext(connection) as queries:
+            user, cached_token = auth.authenticate_credentials(token.key)
+
+        assert len(queries) == 0
+        assert user == test_user
+        assert cached_token.key == token.key
+        assert token_cache.stats()['hit_ratio'] == 0.5
+
+    def test_password_hash_is_not_cached(self, test_user):
+        token = Token.objects.create(user=test_user)
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+
+        assert test_user.password.encode() not in pickle.dumps(cache.get(cache_key(token.key)))
+        user, _ = auth.authenticate_credentials(token.key)
+        with CaptureQueriesContext(connection) as queries:
+            assert user.check_password('testpass123')
+        assert len(queries) == 1
+
+    def test_lookup_racing_an_invalidation_is_not_served(self, test_user):
+        token = Token.objects.create(user=test_user)
+        generation = token_cache.generation(token.key)
+        stale = cached_fields(test_user, token)
+
+        token_cache.invalidate(token.key)
+        token_cache.set(token.key, generation, stale)
+
+        assert token_cache.get(token.key) is None
+
+    def test_token_delete_invalidates_cache(self, test_user):
+        token = Token.objects.create(user=test_user)
+        auth = CachedTokenAuthentication()
+        key = token.key
+        auth.authenticate_credentials(key)
+
+        token.delete()
+
+        with pytest.raises(AuthenticationFailed):
+            auth.authenticate_credentials(key)
+
+    def test_deactivation_invalidates_cache(self, test_user):
+        token = Token.objects.create(user=test_user)
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+
+        test_user.is_active = False
+        test_user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            auth.authenticate_credentials(token.key)
+
+    def test_logout_revokes_cached_token(self, authenticated_client):
+        assert authenticated_client.get(reverse('api:users-me')).status_code == 200
+
+        authenticated_client.post('/api/auth/token/logout/')
+
+        assert authenticated_client.get(reverse('api:users-me')).status_code == 401
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from api.caching import SingleFlightCache, lock_key
+
+
+class SlowComputation:
+    def __init__(self, duration=0.05, value='value'):
+        self.duration = duration
+        self.value = value
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.duration)
+        return self.value
+
+
+def run_concurrently(callers, count):
+    """Call each of callers `count` times from its own thread, all released at once."""
+    barrier = threading.Barrier(len(callers) * count)
+    results = []
+
+    def call(caller):
+        barrier.wait()
+        results.append(caller())
+
+    threads = [threading.Thread(target=call, args=(caller,)) for caller in callers for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+@pytest.mark.unit
+class TestSingleFlightCache:
+    def test_concurrent_misses_compute_once(self):
+        single_flight = SingleFlightCache()
+        compute = SlowComputation()
+
+        results = run_concurrently([lambda: single_flight.get_or_set('popular', compute, 60)], 200)
+
+        assert compute.calls == 1
+        assert results == ['value'] * 200
+        assert single_flight.stats()['computed'] == 1
+
+    def test_workers_wait_for_each_other(self):
+        # Separate instances share only the cache, like gunicorn workers
+        workers = [SingleFlightCache() for _ in range(4)]
+        compute = SlowComputation()
+
+        results = run_concurrently(
+            [lambda worker=worker: worker.get_or_set('popular', compute, 60) for worker in workers], 50,
+        )
+
+        assert compute.calls == 1
+        assert results == ['value'] * 200
+
+    def test_stale_value_is_served_while_one_caller_refreshes(self, settings):
+        settings.CACHE_EARLY_REFRESH_BETA = 0
+        single_flight = SingleFlightCache()
+        single_flight.get_or_set('popular', lambda: 'old', ttl=0.01, stale_ttl=60)
+        time.sleep(0.02)
+        compute = SlowComputation(value='new')
+
+        results = run_concurrently([lambda: single_flight.get_or_set('popular', compute, 60, 60)], 100)
+
+        assert compute.calls == 1
+        assert results.count('new') == 1
+        assert results.count('old') == 99
+        assert single_flight.get_or_set('popular', compute, 60) == 'new'
+
+    def test_failed_refresh_serves_stale_value(self, settings):
+        settings.CACHE_EARLY_REFRESH_BETA = 0
+        single_flight = SingleFlightCache()
+        single_flight.get_or_set('popular', lambda: 'old', ttl=0.01, stale_ttl=60)
+        time.sleep(0.02)
+
+        def fail():
+            raise RuntimeError('database unavailable')
+
+        assert single_flight.get_or_set('popular', fail, 60, 60) == 'old'
+        assert single_flight.stats()['failed'] == 1
+        assert cache.get(lock_key('popular')) is None
+
+    def test_lock_taken_over_after_expiry_is_not_released(self):
+        single_flight = SingleFlightCache()
+
+        def outlast_lock():
+            # Our lock expired and another worker took it while this ran
+            cache.set(lock_key('popular'), 'other-worker', 60)
+            return 'value'
+
+        assert single_flight.get_or_set('popular', outlast_lock, 60) == 'value'
+        assert cache.get(lock_key('popular')) == 'other-worker'
+
+    def test_values_are_refreshed_before_they_expire(self, settings):
+        settings.CACHE_EARLY_REFRESH_BETA = 1e9
+        single_flight = SingleFlightCache()
+        single_flight.get_or_set('popular', SlowComputation(0.01, 'old'), 60)
+
+        assert single_flight.get_or_set('popular', lambda: 'new', 60) == 'new'
+        assert single_flight.stats()['early_refresh'] == 1
+
+    def test_none_is_not_cached(self):
+        single_flight = SingleFlightCache()
+        compute = SlowComputation(0, value=None)
+
+        single_flight.get_or_set('empty', compute, 60)
+        single_flight.get_or_set('empty', compute, 60)
+
+        assert compute.calls == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestCachedTagList:
+    def test_tag_list_is_cached_until_tags_change(self, api_client, tag_factory, django_assert_num_queries):
+        tag_factory(name='Breakfast', slug='breakfast')
+        url = reverse('api:tags-list')
+        api_client.get(url)
+
+        with django_assert_num_queries(0):
+            cached = api_client.get(url)
+        tag_factory(name='Dinner', slug='dinner')
+        changed = api_client.get(url)
+
+        assert [tag['slug'] for tag in cached.data] == ['breakfast']
+        assert [tag['slug'] for tag in changed.data] == ['breakfast', 'dinner']
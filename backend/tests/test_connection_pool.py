@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from bitesnap.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def always(result):
+    return lambda conn: result
+
+
+@pytest.mark.unit
+class TestConnectionPool:
+    def test_released_connection_is_reused(self):
+        pool = ConnectionPool(max_size=2)
+
+        first = pool.acquire(FakeConnection, always(True))
+        pool.release(first, always(True))
+        second = pool.acquire(FakeConnection, always(True))
+
+        assert second is first
+        assert pool.stats()['created'] == 1
+        assert pool.stats()['reused'] == 1
+
+    def test_exhausted_pool_times_out(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        pool.acquire(FakeConnection, always(True))
+
+        with pytest.raises(PoolTimeout):
+            pool.acquire(FakeConnection, always(True))
+        assert pool.stats()['timeouts'] == 1
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(max_size=1, timeout=2)
+        held = pool.acquire(FakeConnection, always(True))
+        acquired = []
+
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(FakeConnection, always(True))))
+        waiter.start()
+        pool.release(held, always(True))
+        waiter.join()
+
+        assert acquired == [held]
+
+    def test_unusable_connections_are_discarded(self):
+        pool = ConnectionPool(max_size=2, check_after=0)
+
+        broken = pool.acquire(FakeConnection, always(True))
+        pool.release(broken, always(False))
+        stale = pool.acquire(FakeConnection, always(True))
+        pool.release(stale, always(True))
+        fresh = pool.acquire(FakeConnection, always(False))
+
+        assert broken.closed and stale.closed
+        assert fresh is not stale
+        assert pool.stats()['discarded'] == 2
+        assert pool.stats()['size'] == 1
+
+    def test_connections_past_max_lifetime_are_closed(self):
+        pool = ConnectionPool(max_size=1, max_lifetime=0)
+
+        conn = pool.acquire(FakeConnection, always(True))
+        pool.release(conn, always(True))
+
+        assert conn.closed
+        assert pool.stats()['size'] == 0
@@ -0,0 +1,66 @@
+import runpy
+import socket
+from pathlib import Path
+
+import pytest
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / 'gunicorn.conf.py'
+
+GUNICORN_VARIABLES = (
+    'GUNICORN_WORKERS', 'GUNICORN_MAX_WORKERS', 'GUNICORN_THREADS', 'GUNICORN_WORKER_CLASS',
+    'GUNICORN_MAX_REQUESTS', 'GUNICORN_PRELOAD',
+)
+
+
+@pytest.fixture
+def load_config(monkeypatch, tmp_path):
+    monkeypatch.setenv('METRICS_DIR', str(tmp_path))
+    for name in GUNICORN_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+
+    def load(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return runpy.run_path(str(CONFIG_PATH))
+    return load
+
+
+@pytest.mark.unit
+class TestGunicornConfig:
+    def test_defaults_size_workers_from_cpus(self, load_config):
+        config = load_config()
+
+        assert config['workers'] == min(config['available_cpus']() * 2 + 1, 8)
+        assert config['worker_class'] == 'gthread'
+        assert config['preload_app'] is True
+        assert config['max_requests_jitter'] == config['max_requests'] // 10
+
+    def test_environment_overrides(self, load_config):
+        config = load_config(GUNICORN_WORKERS='3', GUNICORN_THREADS='1', GUNICORN_PRELOAD='False')
+
+        assert config['workers'] == 3
+        assert config['worker_class'] == 'sync'
+        assert config['preload_app'] is False
+
+    def test_uvicorn_workers_serve_asgi_application(self, load_config):
+        config = load_config(GUNICORN_WORKER_CLASS='uvicorn.workers.UvicornWorker')
+
+        assert config['wsgi_app'] == 'bitesnap.asgi:application'
+
+    def test_on_starting_removes_stale_metrics_snapshots(self, load_config, tmp_path):
+        (tmp_path / '1234.json').write_text('{}')
+        config = load_config()
+
+        config['on_starting'](None)
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_child_exit_removes_worker_snapshot(self, load_config, tmp_path):
+        (tmp_path / f'{socket.gethostname()}-1234.json').write_text('{}')
+        (tmp_path / f'{socket.gethostname()}-5678.json').write_text('{}')
+        config = load_config()
+
+        config['child_exit'](None, type('Worker', (), {'pid': 1234}))
+        config['child_exit'](None, type('Worker', (), {'pid': 1234}))
+
+        assert [path.name for path in tmp_path.iterdir()] == [f'{socket.gethostname()}-5678.json']
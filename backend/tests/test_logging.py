@@ -0,0 +1,157 @@
+import io
+import json
+import logging
+import sys
+import threading
+import time
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory
+
+from bitesnap.log import BackgroundHandler, JSONFormatter, RateLimitFilter, RequestIdMiddleware, request_id
+
+
+def make_record(message='Health check passed', level=logging.INFO, **extra):
+    record = logging.LogRecord('api.health', level, __file__, 1, message, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class BlockingStream(io.StringIO):
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    def write(self, text):
+        self.release.wait(5)
+        return super().write(text)
+
+
+@pytest.fixture
+def json_handler():
+    def build(stream, **options):
+        handler = BackgroundHandler(stream=stream, **options)
+        handler.setFormatter(JSONFormatter())
+        return handler
+    return build
+
+
+@pytest.mark.unit
+class TestJSONFormatter:
+    def test_record_is_one_json_object_with_extras(self):
+        record = make_record('Exported %s rows', route='recipes-list')
+        record.args = (3,)
+        record.request_id = 'req-1'
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        assert entry['message'] == 'Exported 3 rows'
+        assert entry['level'] == 'INFO'
+        assert entry['logger'] == 'api.health'
+        assert entry['request_id'] == 'req-1'
+        assert entry['route'] == 'recipes-list'
+
+
+@pytest.mark.unit
+class TestBackgroundHandler:
+    def test_records_are_written_by_writer_thread_with_request_id(self, json_handler):
+        stream = io.StringIO()
+        handler = json_handler(stream)
+        token = request_id.set('req-42')
+        try:
+            handler.handle(make_record('first'))
+        finally:
+            request_id.reset(token)
+        handler.handle(make_record('second'))
+        handler.flush()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [line['message'] for line in lines] == ['first', 'second']
+        assert lines[0]['request_id'] == 'req-42'
+        assert 'request_id' not in lines[1]
+        assert handler.written == 2
+
+    def test_exception_is_captured_on_calling_thread(self, json_handler):
+        stream = io.StringIO()
+        handler = json_handler(stream)
+        try:
+            raise ValueError('bad input')
+        except ValueError:
+            record = logging.LogRecord('api', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+
+        handler.handle(record)
+        handler.flush()
+
+        assert 'ValueError: bad input' in json.loads(stream.getvalue())['exception']
+
+    def test_full_queue_drops_records_without_blocking(self, json_handler):
+        release = threading.Event()
+        handler = json_handler(BlockingStream(release), queue_size=2, batch_size=1)
+
+        started = time.monotonic()
+        for i in range(10):
+            handler.handle(make_record(f'message {i}'))
+        elapsed = time.monotonic() - started
+        release.set()
+        handler.flush()
+
+        assert elapsed < 1
+        assert handler.dropped >= 7
+        assert handler.written + handler.dropped == 10
+
+
+@pytest.mark.unit
+class TestRateLimitFilter:
+    def test_repeated_messages_are_suppressed_and_counted(self):
+        log_filter = RateLimitFilter(limit=2, interval=0.05)
+
+        allowed = [log_filter.filter(make_record()) for _ in range(5)]
+        time.sleep(0.06)
+        record = make_record()
+
+        assert allowed == [True, True, False, False, False]
+        assert log_filter.filter(record)
+        assert record.suppressed == 3
+
+    def test_distinct_messages_and_errors_pass(self):
+        log_filter = RateLimitFilter(limit=1, interval=60)
+
+        assert log_filter.filter(make_record('a'))
+        assert log_filter.filter(make_record('b'))
+        assert all(log_filter.filter(make_record('a', level=logging.ERROR)) for _ in range(3))
+
+
+@pytest.mark.unit
+class TestRequestIdMiddleware:
+    def test_request_id_is_generated_and_echoed(self):
+        seen = []
+        middleware = RequestIdMiddleware(lambda request: seen.append(request_id.get()) or HttpResponse())
+
+        response = middleware(RequestFactory().get('/'))
+
+        assert response['X-Request-ID'] == seen[0]
+        assert len(seen[0]) == 32
+        assert request_id.get() is None
+
+    def test_valid_incoming_request_id_is_kept(self):
+        middleware = RequestIdMiddleware(lambda request: HttpResponse())
+
+        kept = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='edge-1234'))
+        replaced = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='bad id\n'))
+
+        assert kept['X-Request-ID'] == 'edge-1234'
+        assert replaced['X-Request-ID'] != 'bad id\n'
+
+    def test_async_views_are_not_adapted(self):
+        async def view(request):
+            return HttpResponse(request_id.get())
+        middleware = RequestIdMiddleware(view)
+
+        response = async_to_sync(middleware)(AsyncRequestFactory().get('/', headers={'X-Request-ID': 'edge-1234'}))
+
+        # A coroutine middleware keeps the ASGI handler from moving the chain onto a thread
+        assert iscoroutinefunction(middleware)
+        assert response.content == b'edge-1234'
+        assert response['X-Request-ID'] == 'edge-1234'
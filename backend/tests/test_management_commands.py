@@ -1,8 +1,20 @@
+import json
+import os
+import time
 import pytest
 from io import StringIO
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.contrib.auth import get_user_model
-from recipes.models import Tag
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from recipes.bulk import CopyWriter
+from recipes.management.commands.import_recipes import Command
+from recipes.management.commands.cleanup_media import iter_storage_files
+from recipes.models import (
+    BootstrapStep, Favorite, ImportCheckpoint, Ingredient, OutboxEvent, RecipeChange, RecipeIngredient, Tag, Recipe,
+)
 
 User = get_user_model()
 
@@ -44,3 +56,290 @@ class TestCreateTestDataCommand:
         second_tag_count = Tag.objects.count()
         assert first_user_count == second_user_count
         assert first_tag_count == second_tag_count
+
+
+def age_file(path, hours):
+    old = time.time() - hours * 3600
+    os.utime(path, (old, old))
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestCleanupMediaCommand:
+    def test_deletes_only_old_unreferenced_files(self, media_root, recipe_factory):
+        recipe = recipe_factory()
+        orphan = default_storage.save('recipes/images/orphan.jpg', ContentFile(b'old'))
+        fresh = default_storage.save('recipes/images/fresh.jpg', ContentFile(b'new'))
+        age_file(media_root / recipe.image.name, 48)
+        age_file(media_root / orphan, 48)
+
+        out = StringIO()
+        call_command('cleanup_media', grace_hours=24, stdout=out)
+
+        assert default_storage.exists(recipe.image.name)
+        assert not default_storage.exists(orphan)
+        assert default_storage.exists(fresh)
+        assert 'Deleted 1 orphaned files' in out.getvalue()
+
+    def test_dry_run_keeps_files(self, media_root, recipe_factory):
+        recipe_factory()
+        orphan = default_storage.save('recipes/images/orphan.jpg', ContentFile(b'old'))
+        age_file(media_root / orphan, 48)
+
+        out = StringIO()
+        call_command('cleanup_media', dry_run=True, batch_size=1, stdout=out)
+
+        assert default_storage.exists(orphan)
+        assert 'Would delete 1 orphaned files' in out.getvalue()
+
+
+class ListedBlob:
+    def __init__(self, name):
+        self.name = name
+
+
+class BlobClient:
+    def __init__(self, names):
+        self.names = names
+        self.prefixes = []
+
+    def list_blobs(self, name_starts_with, timeout):
+        self.prefixes.append(name_starts_with)
+        return (ListedBlob(name) for name in self.names if name.startswith(name_starts_with))
+
+
+@pytest.mark.unit
+class TestIterStorageFiles:
+    def test_local_directories_are_walked(self, media_root):
+        default_storage.save('recipes/images/top.jpg', ContentFile(b'1'))
+        default_storage.save('recipes/images/2024/nested.jpg', ContentFile(b'2'))
+
+        files = iter_storage_files(default_storage, 'recipes/images')
+
+        assert sorted(files) == ['recipes/images/2024/nested.jpg', 'recipes/images/top.jpg']
+
+    def test_blobs_are_listed_by_prefix_under_location(self):
+        storage = type('Storage', (), {
+            'location': 'media',
+            'timeout': 20,
+            'client': BlobClient(['media/recipes/images/a.jpg', 'media/recipes/images/2024/b.jpg', 'media/other.jpg']),
+            '_get_valid_path': lambda self, name: f'media/{name}',
+        })()
+
+        assert list(iter_storage_files(storage, 'recipes/images')) == [
+            'recipes/images/a.jpg', 'recipes/images/2024/b.jpg',
+        ]
+        assert storage.client.prefixes == ['media/recipes/images/']
+
+
+def write_lines(path, lines):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestImportRecipesCommand:
+    def test_imports_ndjson_with_relations(self, tmp_path, test_user, test_tags, test_ingredients):
+        path = write_lines(tmp_path / 'recipes.ndjson', [
+            json.dumps({
+                'author': test_user.email, 'name': f'Imported {i}', 'text': 'Text',
+                'cooking_time': 10, 'image': 'recipes/images/imported.jpg',
+                'tags': ['breakfast', 'lunch'],
+                'ingredients': [{'name': 'Flour', 'measurement_unit': 'cup', 'amount': 2}],
+            })
+            for i in range(5)
+        ] + ['{"author": "nobody@example.com"}'])
+
+        out = StringIO()
+        call_command('import_recipes', path, batch_size=2, stdout=out)
+
+        recipes = Recipe.objects.filter(name__startswith='Imported')
+        assert recipes.count() == 5
+        recipe = recipes.first()
+        assert set(recipe.tags.values_list('slug', flat=True)) == {'breakfast', 'lunch'}
+        assert recipe.recipe_ingredients.get().amount == 2
+        assert 'Skipped 1 invalid rows' in out.getvalue()
+        # Delta sync clients see the imported recipes
+        assert set(RecipeChange.objects.filter(kind=RecipeChange.RECIPE).values_list('recipe_id', flat=True)) == set(
+            recipes.values_list('id', flat=True)
+        )
+        created = OutboxEvent.objects.filter(topic='recipe', action=OutboxEvent.CREATED, object_id=recipe.id).get()
+        assert created.payload == {'author_id': test_user.id}
+        retagged = OutboxEvent.objects.filter(topic='recipe', action=OutboxEvent.UPDATED, object_id=recipe.id).get()
+        assert retagged.payload['tag_ids'] == sorted(recipe.tags.values_list('id', flat=True))
+        assert OutboxEvent.objects.filter(topic='recipe_ingredient').count() == 5
+
+    def test_imports_csv_and_resumes_from_checkpoint(self, tmp_path, test_user, test_tags, test_ingredients):
+        header = 'author,name,text,cooking_time,image,tags,ingredients'
+        rows = [
+            f'{test_user.email},CSV {i},Text,5,,dinner,Sugar:cup:1|Eggs:piece:3'
+            for i in range(4)
+        ]
+        path = write_lines(tmp_path / 'recipes.csv', [header] + rows)
+
+        call_command('import_recipes', path, batch_size=3, checkpoint='csv', stdout=StringIO())
+        call_command('import_recipes', path, checkpoint='csv', resume=True, stdout=StringIO())
+
+        assert Recipe.objects.filter(name__startswith='CSV').count() == 4
+        assert Recipe.objects.get(name='CSV 0').recipe_ingredients.count() == 2
+        assert ImportCheckpoint.objects.values_list('rows', 'imported').get(name='csv') == (4, 4)
+
+    def test_failed_batch_does_not_advance_checkpoint(
+        self, monkeypatch, tmp_path, test_user, test_tags, test_ingredients
+    ):
+        header = 'author,name,text,cooking_time,image,tags,ingredients'
+        rows = [f'{test_user.email},Batch {i},Text,5,,dinner,Sugar:cup:1' for i in range(4)]
+        path = write_lines(tmp_path / 'recipes.csv', [header] + rows)
+        insert_batch = Command.insert_batch
+
+        def fail_second_batch(command, recipes):
+            insert_batch(command, recipes)
+            if command.imported:
+                raise RuntimeError('crash before commit')
+        monkeypatch.setattr(Command, 'insert_batch', fail_second_batch)
+
+        with pytest.raises(RuntimeError):
+            call_command('import_recipes', path, batch_size=2, checkpoint='csv', stdout=StringIO())
+
+        assert Recipe.objects.filter(name__startswith='Batch').count() == 2
+        assert ImportCheckpoint.objects.get(name='csv').rows == 2
+
+
+class RecordingCursor:
+    def copy_expert(self, statement, buffer):
+        self.statement = statement
+        self.data = buffer.read()
+
+
+@pytest.mark.unit
+class TestCopyWriter:
+    def test_empty_strings_are_not_null(self):
+        cursor = RecordingCursor()
+
+        CopyWriter(cursor).insert(
+            'recipes_recipe', ['id', 'image', 'text', 'author_id'],
+            [(1, '', 'Say "hi", then\nserve', None)],
+        )
+
+        assert cursor.statement == 'COPY recipes_recipe (id, image, text, author_id) FROM STDIN WITH (FORMAT csv)'
+        # Quoted "" is an empty string; only the unquoted empty field is NULL
+        assert cursor.data == '"1","","Say ""hi"", then\nserve",\n'
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestExportRecipesCommand:
+    def test_exports_all_recipes_to_file(self, tmp_path, test_recipes):
+        output = tmp_path / 'recipes.ndjson'
+
+        call_command('export_recipes', output=str(output), chunk_size=2, stdout=StringIO())
+
+        rows = [json.loads(line) for line in output.read_text().splitlines()]
+        assert len(rows) == len(test_recipes)
+
+
+@pytest.fixture
+def bootstrap_dirs(tmp_path):
+    """A BASE_DIR whose parent holds data/ingredients.csv, and an empty STATIC_ROOT."""
+    (tmp_path / 'backend').mkdir()
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'ingredients.csv').write_text('salt,g\nflour,g\n')
+    with override_settings(BASE_DIR=tmp_path / 'backend', STATIC_ROOT=tmp_path / 'static'):
+        yield tmp_path
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestBootstrapCommand:
+    def test_first_run_performs_steps_and_records_fingerprints(self, bootstrap_dirs):
+        out = StringIO()
+        call_command('bootstrap', stdout=out)
+
+        output = out.getvalue()
+        assert 'migrate: skipped (no unapplied migrations)' in output
+        assert 'collectstatic: done' in output
+        assert Ingredient.objects.filter(name='flour').exists()
+        assert User.objects.filter(username='chef').exists()
+        assert set(BootstrapStep.objects.values_list('name', flat=True)) == {'load_ingredients', 'create_test_data'}
+        assert (bootstrap_dirs / 'static' / '.bootstrap-fingerprint').exists()
+
+    def test_second_run_skips_unchanged_steps(self, bootstrap_dirs):
+        call_command('bootstrap', stdout=StringIO())
+        out = StringIO()
+        call_command('bootstrap', stdout=out)
+
+        output = out.getvalue()
+        assert 'done in' not in output
+        assert 'collectstatic: skipped (static sources unchanged)' in output
+        assert 'load_ingredients: skipped (ingredient CSV unchanged)' in output
+        assert 'create_test_data: skipped' in output
+
+    def test_changed_csv_reloads_ingredients(self, bootstrap_dirs):
+        call_command('bootstrap', stdout=StringIO())
+        (bootstrap_dirs / 'data' / 'ingredients.csv').write_text('salt,g\nflour,g\nsugar,g\n')
+        out = StringIO()
+        call_command('bootstrap', skip=['collectstatic'], stdout=out)
+
+        assert 'load_ingredients: done' in out.getvalue()
+        assert 'create_test_data: skipped' in out.getvalue()
+        assert Ingredient.objects.filter(name='sugar').exists()
+        created = OutboxEvent.objects.filter(topic='ingredient', action=OutboxEvent.CREATED)
+        assert sorted(created.values_list('object_id', flat=True)) == sorted(Ingredient.objects.values_list('id', flat=True))
+
+    def test_optional_step_failure_does_not_abort(self, bootstrap_dirs):
+        (bootstrap_dirs / 'data' / 'ingredients.csv').write_bytes(b'\xff\xfe invalid')
+        out = StringIO()
+        call_command('bootstrap', skip=['collectstatic'], stdout=out)
+
+        assert 'load_ingredients: failed' in out.getvalue()
+        assert 'create_test_data: done' in out.getvalue()
+        assert not BootstrapStep.objects.filter(name='load_ingredients').exists()
+
+
+def generated_snapshot():
+    recipes = Recipe.objects.filter(author__username__startswith='load_user_').order_by('created_at')
+    return [
+        (recipe.author.username, recipe.name, recipe.cooking_time, sorted(recipe.tags.values_list('slug', flat=True)))
+        for recipe in recipes
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestGenerateDatasetCommand:
+    def test_generates_requested_scale(self, test_ingredients):
+        call_command('generate_dataset', users=20, recipes=50, favorites=100, batch_size=16, stdout=StringIO())
+
+        assert User.objects.filter(username__startswith='load_user_').count() == 20
+        recipes = Recipe.objects.filter(author__username__startswith='load_user_')
+        assert recipes.count() == 50
+        assert all(recipe.tags.exists() and recipe.recipe_ingredients.count() >= 1 for recipe in recipes)
+        favorites = Favorite.objects.filter(user__username__startswith='load_user_')
+        assert favorites.count() > 0
+        assert RecipeChange.objects.filter(kind=RecipeChange.RECIPE).count() == 50
+        assert set(
+            RecipeChange.objects.filter(kind=RecipeChange.FAVORITE).values_list('user_id', 'recipe_id')
+        ) == set(favorites.values_list('user_id', 'recipe_id'))
+        assert OutboxEvent.objects.filter(topic='recipe', action=OutboxEvent.CREATED).count() == 50
+        assert set(OutboxEvent.objects.filter(topic='recipe_ingredient').values_list('object_id', flat=True)) == set(
+            RecipeIngredient.objects.filter(recipe__in=recipes).values_list('id', flat=True)
+        )
+        assert OutboxEvent.objects.filter(topic='favorite').count() == favorites.count()
+        user = User.objects.get(username='load_user_0')
+        assert user.check_password('loadtest-password')
+
+    def test_same_seed_gives_same_data(self, test_ingredients):
+        call_command('generate_dataset', users=10, recipes=30, favorites=20, stdout=StringIO())
+        first = generated_snapshot()
+        User.objects.filter(username__startswith='load_user_').delete()
+
+        call_command('generate_dataset', users=10, recipes=30, favorites=20, stdout=StringIO())
+
+        assert generated_snapshot() == first
+
+    def test_refuses_to_run_twice(self, test_ingredients):
+        call_command('generate_dataset', users=2, recipes=2, favorites=0, stdout=StringIO())
+
+        with pytest.raises(CommandError):
+            call_command('generate_dataset', users=2, recipes=2, favorites=0, stdout=StringIO())
@@ -0,0 +1,84 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+from django.test import override_settings
+from django.urls import reverse
+
+from api.metrics import registry, render
+
+
+def metric_lines(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain')
+    return response.content.decode().splitlines()
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestMetricsEndpoint:
+
+    def test_requests_labelled_by_route(self, api_client, recipe_factory):
+        recipe = recipe_factory()
+        api_client.get(reverse('api:recipes-list'))
+        api_client.get(reverse('api:recipes-detail', kwargs={'pk': recipe.id}))
+
+        lines = metric_lines(api_client)
+
+        assert 'bitesnap_http_requests_total{method="GET",route="recipes-list",status="200"} 1' in lines
+        assert 'bitesnap_http_requests_total{method="GET",route="recipes-detail",status="200"} 1' in lines
+        assert any(
+            line.startswith('bitesnap_http_request_duration_seconds_bucket{method="GET",route="recipes-list",le="+Inf"}')
+            for line in lines
+        )
+        assert any(line.startswith('bitesnap_db_queries_total{route="recipes-list"}') for line in lines)
+
+    def test_snapshots_merged_across_workers(self, api_client, tmp_path):
+        other_worker = {
+            'counters': [['bitesnap_http_requests_total',
+                          [['method', 'GET'], ['route', 'tags-list'], ['status', '200']], 4]],
+            'histograms': [],
+        }
+        (tmp_path / '999999.json').write_text(json.dumps(other_worker))
+
+        with override_settings(METRICS_DIR=str(tmp_path)):
+            api_client.get(reverse('api:tags-list'))
+            registry.flush(str(tmp_path))
+            lines = metric_lines(api_client)
+
+        assert 'bitesnap_http_requests_total{method="GET",route="tags-list",status="200"} 5' in lines
+
+    def test_gauges_of_exited_processes_are_left_out(self, api_client, tmp_path):
+        def worker_snapshot(pid, connections):
+            labels = [['alias', 'default'], ['state', 'idle']]
+            snapshot = {
+                'counters': [['bitesnap_db_pool_events_total', [['alias', 'default'], ['event', 'created']], 2]],
+                'gauges': [['bitesnap_db_pool_connections', labels, connections]],
+                'histograms': [],
+            }
+            (tmp_path / f'{socket.gethostname()}-{pid}.json').write_text(json.dumps(snapshot))
+
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        worker_snapshot(exited.pid, 5)
+        worker_snapshot(os.getppid(), 3)
+
+        with override_settings(METRICS_DIR=str(tmp_path)):
+            lines = metric_lines(api_client)
+
+        assert 'bitesnap_db_pool_events_total{alias="default",event="created"} 4' in lines
+        assert 'bitesnap_db_pool_connections{alias="default",state="idle"} 3' in lines
+        assert '# TYPE bitesnap_db_pool_connections gauge' in lines
+
+
+@pytest.mark.unit
+class TestRender:
+    def test_max_gauges_are_not_summed(self):
+        lag = ['bitesnap_outbox_lag_events', [['consumer', 'search-index']]]
+        snapshots = [{'counters': [], 'gauges': [lag + [value]], 'histograms': []} for value in (7, 9)]
+
+        assert 'bitesnap_outbox_lag_events{consumer="search-index"} 9' in render(snapshots).splitlines()
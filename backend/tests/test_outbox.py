@@ -0,0 +1,138 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from api.outbox import Dispatcher, consumers, delivery_stats, prune
+from recipes.models import Favorite, OutboxCheckpoint, OutboxEvent
+
+
+class RecordingConsumer:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, events):
+        if self.fail:
+            raise RuntimeError('index unavailable')
+        self.batches.append([(event.topic, event.action, event.object_id) for event in events])
+
+
+@pytest.fixture
+def recording(settings):
+    settings.OUTBOX_SETTLE_SECONDS = 0
+    handler = RecordingConsumer()
+    consumers.register('test-recorder', topics=['recipe', 'favorite'])(handler)
+    yield handler
+    consumers.unregister('test-recorder')
+
+
+def dispatch(batch_size=100):
+    return Dispatcher([consumers.get('test-recorder')], batch_size).run_once()
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestOutbox:
+
+    def test_api_writes_publish_events(self, authenticated_client, recipe_factory, test_tags, test_ingredients):
+        response = authenticated_client.post(reverse('api:recipes-list'), {
+            'name': 'Soup',
+            'text': 'Boil it.',
+            'cooking_time': 20,
+            'image': 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7',
+            'tags': [test_tags[0].id],
+            'ingredients': [{'id': test_ingredients[0].id, 'amount': 2}],
+        }, format='json')
+        recipe_id = response.data['id']
+        authenticated_client.post(reverse('api:recipes-favorite', kwargs={'pk': recipe_id}))
+
+        events = list(OutboxEvent.objects.values_list('topic', 'action', 'object_id', 'payload'))
+
+        assert ('recipe', 'created', recipe_id, {'author_id': authenticated_client.user.id}) in events
+        assert any(topic == 'recipe_ingredient' and payload['recipe_id'] == recipe_id
+                   for topic, _, _, payload in events)
+        assert ('recipe', 'updated', recipe_id,
+                {'author_id': authenticated_client.user.id, 'fields': ['tags'], 'tag_ids': [test_tags[0].id]}) in events
+        favorite = Favorite.objects.get(recipe_id=recipe_id)
+        assert ('favorite', 'created', favorite.id,
+                {'user_id': authenticated_client.user.id, 'recipe_id': recipe_id}) in events
+
+    def test_events_roll_back_with_the_change(self, tag_factory):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            tag_factory(name='Brunch', slug='brunch')
+            raise RuntimeError('request failed')
+
+        assert not OutboxEvent.objects.exists()
+
+    def test_events_are_delivered_in_batches_with_checkpoints(self, recording, recipe_factory, tag_factory):
+        first, second = recipe_factory.create_batch(2)
+        tag_factory()
+        first_id = first.id
+        first.delete()
+
+        assert dispatch(batch_size=2) == 2
+        dispatch()
+
+        assert recording.batches == [
+            [('recipe', 'created', first_id), ('recipe', 'created', second.id)],
+            [('recipe', 'deleted', first_id)],
+        ]
+        assert OutboxCheckpoint.objects.get(consumer='test-recorder').position == OutboxEvent.objects.latest('id').id
+        assert delivery_stats.stats()['test-recorder'] == {
+            'delivered': 3, 'failures': 0, 'lag_events': 0, 'lag_seconds': 0.0,
+        }
+
+    def test_backlog_is_judged_per_consumer(self, recording, tag_factory):
+        consumers.register('test-idle', topics=['tag'])(RecordingConsumer())
+        tag_factory()
+        assert OutboxEvent.objects.count() == 1
+        try:
+            both = Dispatcher([consumers.get('test-recorder'), consumers.get('test-idle')], batch_size=2)
+            read = both.run_once()
+        finally:
+            consumers.unregister('test-idle')
+        tag_factory()
+        one = Dispatcher([consumers.get('test-recorder')], batch_size=1)
+        one.run_once()
+
+        assert read == 2 and not both.backlogged
+        assert one.backlogged
+
+    def test_failed_batch_is_delivered_again(self, recording, recipe_factory):
+        recipe = recipe_factory()
+        recording.fail = True
+
+        dispatch()
+        checkpoint = OutboxCheckpoint.objects.get(consumer='test-recorder')
+        recording.fail = False
+        dispatch()
+
+        assert checkpoint.position == 0 and checkpoint.failures == 1
+        assert recording.batches == [[('recipe', 'created', recipe.id)]]
+        assert delivery_stats.stats()['test-recorder']['failures'] == 1
+
+    def test_recent_events_wait_for_settle_window(self, recording, recipe_factory, settings):
+        settings.OUTBOX_SETTLE_SECONDS = 60
+        recipe_factory()
+
+        assert dispatch() == 0
+        assert delivery_stats.stats()['test-recorder']['lag_events'] == OutboxEvent.objects.count()
+
+    def test_only_events_every_consumer_processed_are_pruned(self, recording, recipe_factory):
+        recipe_factory()
+        call_command('dispatch_outbox', once=True, consumer=['test-recorder'], stdout=StringIO())
+        recipe_factory()
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(days=2))
+        # Every registered consumer counts, including ones not selected above
+        assert prune(timezone.now() - timedelta(days=1)) == 0
+
+        call_command('dispatch_outbox', once=True, stdout=StringIO())
+        recipe_factory()
+
+        assert prune(timezone.now() - timedelta(days=1)) == 2
+        assert OutboxEvent.objects.count() == 1
@@ -0,0 +1,178 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bitesnap.db import replicas
+from bitesnap.db.replicas import PIN_COOKIE, PRIMARY, ReplicaMiddleware, ReplicaRouter, monitor, replica_reads
+
+
+@pytest.fixture
+def replica_settings(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    settings.DATABASE_REPLICA_MAX_LAG = 3
+    return settings
+
+
+@pytest.fixture
+def replica_lag(monkeypatch):
+    """Set the lag reported for the replica, or an exception to raise."""
+    state = {'lag': 0.0}
+
+    def fake_lag(alias):
+        if isinstance(state['lag'], Exception):
+            raise state['lag']
+        return state['lag']
+
+    monkeypatch.setattr(replicas, 'replica_lag', fake_lag)
+    return state
+
+
+@pytest.fixture
+def replica_database(tmp_path, settings):
+    """
+    A second SQLite database standing in for a replica: it has the schema but
+    none of the primary's rows, so responses show which database served them.
+    """
+    alias = 'replica'
+    connections.settings[alias] = connections.configure_settings({
+        PRIMARY: connections.settings[PRIMARY],
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(tmp_path / 'replica.sqlite3')},
+    })[alias]
+    call_command('migrate', database=alias, verbosity=0)
+
+    settings.DATABASE_REPLICAS = [alias]
+    settings.DATABASE_ROUTERS = ['bitesnap.db.replicas.ReplicaRouter']
+    settings.MIDDLEWARE = ['bitesnap.db.replicas.ReplicaMiddleware'] + settings.MIDDLEWARE
+    settings.TAG_LIST_CACHE_TTL = 0
+    yield alias
+
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+@pytest.mark.unit
+class TestReplicaRouter:
+    router = ReplicaRouter()
+
+    def test_reads_use_primary_outside_replica_context(self, replica_settings, replica_lag):
+        assert self.router.db_for_read(None) == PRIMARY
+
+    def test_reads_use_replica_inside_replica_context(self, replica_settings, replica_lag):
+        with replica_reads():
+            assert self.router.db_for_read(None) == 'replica'
+
+    def test_writes_always_use_primary(self, replica_settings, replica_lag):
+        with replica_reads():
+            assert self.router.db_for_write(None) == PRIMARY
+
+    def test_lagging_replica_is_skipped_until_it_catches_up(self, replica_settings, replica_lag):
+        replica_lag['lag'] = 10.0
+        with replica_reads():
+            assert self.router.db_for_read(None) == PRIMARY
+
+            replica_lag['lag'] = 0.5
+            monitor.check()
+            assert self.router.db_for_read(None) == 'replica'
+
+    def test_unreachable_replica_fails_over_to_primary(self, replica_settings, replica_lag):
+        replica_lag['lag'] = OperationalError('could not connect to server')
+
+        with replica_reads():
+            assert self.router.db_for_read(None) == PRIMARY
+        assert monitor.status()['replica']['error'] == 'could not connect to server'
+
+    def test_replicas_are_not_migrated(self, replica_settings):
+        assert self.router.allow_migrate('replica', 'recipes') is False
+        assert self.router.allow_migrate(PRIMARY, 'recipes') is None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.integration
+class TestReplicaRouting:
+    url = reverse('api:tags-list')
+
+    def test_anonymous_reads_are_served_by_replica(self, replica_database, tag_factory):
+        tag_factory()
+
+        response = APIClient().get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == []
+
+    def test_writer_reads_own_writes_from_primary(
+        self, replica_database, authenticated_client, recipe_factory, tag_factory
+    ):
+        recipe = recipe_factory(tags=[tag_factory()])
+
+        response = authenticated_client.post(reverse('api:recipes-favorite', kwargs={'pk': recipe.id}))
+        assert response.status_code == status.HTTP_201_CREATED
+
+        # Pinned by token alone, as for clients that ignore cookies
+        authenticated_client.cookies.clear()
+        response = authenticated_client.get(self.url)
+        assert len(response.data) == 1
+        assert APIClient().get(self.url).data == []
+
+    def test_cookie_pins_client_after_login(self, replica_database, test_user, tag_factory):
+        tag_factory()
+        client = APIClient()
+
+        response = client.post('/api/auth/token/login/', {'email': test_user.email, 'password': 'testpass123'})
+        assert response.status_code == status.HTTP_200_OK
+        assert PIN_COOKIE in response.cookies
+
+        assert len(client.get(self.url).data) == 1
+
+    def test_cached_lists_are_filled_from_primary(self, replica_database, settings, recipe_factory, tag_factory):
+        settings.TAG_LIST_CACHE_TTL = 60
+        settings.RECIPE_LIST_CACHE_TTL = 60
+        recipe_factory(tags=[tag_factory()])
+
+        # As with a replica lagging behind the write that bumped the catalog version
+        assert len(APIClient().get(self.url).data) == 1
+        assert APIClient().get(reverse('api:recipes-list')).json()['count'] == 1
+
+    def test_reads_fall_back_to_primary_without_usable_replica(self, replica_database, replica_lag, tag_factory):
+        tag_factory()
+        replica_lag['lag'] = OperationalError('could not connect to server')
+
+        response = APIClient().get(self.url)
+
+        assert len(response.data) == 1
+
+
+@pytest.mark.unit
+class TestAsyncReplicaMiddleware:
+    router = ReplicaRouter()
+
+    def run(self, request):
+        databases = []
+
+        async def view(request):
+            databases.append(self.router.db_for_read(None))
+            return HttpResponse()
+        middleware = ReplicaMiddleware(view)
+        assert iscoroutinefunction(middleware)
+        return async_to_sync(middleware)(request), databases
+
+    def test_safe_requests_read_from_replica(self, replica_settings, replica_lag):
+        response, databases = self.run(AsyncRequestFactory().get('/'))
+
+        assert databases == ['replica']
+        assert PIN_COOKIE not in response.cookies
+
+    def test_writes_pin_client_to_primary(self, replica_settings, replica_lag):
+        factory = AsyncRequestFactory()
+        response, databases = self.run(factory.post('/', headers={'Authorization': 'Token abc'}))
+        assert databases == [PRIMARY]
+        assert PIN_COOKIE in response.cookies
+
+        _, databases = self.run(factory.get('/', headers={'Authorization': 'Token abc'}))
+        assert databases == [PRIMARY]
@@ -0,0 +1,120 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.metrics import MetricsMiddleware, registry
+from api.sql_profiling import SQLProfilingMiddleware, normalize, store
+from recipes.models import Recipe
+
+PROFILING_MIDDLEWARE = 'api.sql_profiling.SQLProfilingMiddleware'
+
+
+@pytest.fixture
+def profiling():
+    middleware = [name for name in settings.MIDDLEWARE if name != PROFILING_MIDDLEWARE] + [PROFILING_MIDDLEWARE]
+    with override_settings(MIDDLEWARE=middleware, DEBUG=False, SQL_PROFILING_SAMPLE_RATE=0.0):
+        yield
+
+
+@pytest.fixture
+def staff_token(user_factory):
+    return Token.objects.create(user=user_factory(is_staff=True))
+
+
+def n_plus_one_view(request):
+    names = [recipe.author.username for recipe in Recipe.objects.all()]
+    return HttpResponse(','.join(names))
+
+
+@pytest.mark.unit
+class TestNormalize:
+    def test_literals_and_in_lists_collapse(self):
+        first = normalize('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'a\' LIMIT 21')
+        second = normalize('SELECT *  FROM "t" WHERE "id" IN (%s) AND "name" = \'b\' LIMIT 5')
+
+        assert first == second
+        assert 'IN (...)' in first
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestSQLProfilingMiddleware:
+    def test_repeated_query_shape_is_flagged_with_stack(self, test_recipes):
+        request = RequestFactory().get('/', HTTP_X_PROFILE_SQL='1')
+        with override_settings(DEBUG=True):
+            response = SQLProfilingMiddleware(n_plus_one_view)(request)
+
+        profile = store.get(response['X-SQL-Profile'])
+        flagged = [shape for shape in profile['shapes'] if shape['n_plus_one']]
+        assert response['X-SQL-N-Plus-One'] == '1'
+        assert flagged[0]['count'] == len(test_recipes)
+        assert any('n_plus_one_view' in frame for frame in flagged[0]['stack'])
+
+    def test_stack_skips_instrumentation_frames(self, test_recipes):
+        request = RequestFactory().get('/', HTTP_X_PROFILE_SQL='1')
+        with override_settings(DEBUG=True):
+            response = SQLProfilingMiddleware(MetricsMiddleware(n_plus_one_view))(request)
+
+        profile = store.get(response['X-SQL-Profile'])
+        stack = [shape for shape in profile['shapes'] if shape['n_plus_one']][0]['stack']
+        assert stack
+        assert not any(frame.startswith(('api/metrics.py', 'api/sql_profiling.py')) for frame in stack)
+
+    def test_unsampled_request_is_not_profiled(self, test_recipes):
+        request = RequestFactory().get('/')
+        with override_settings(SQL_PROFILING_SAMPLE_RATE=0.0):
+            response = SQLProfilingMiddleware(n_plus_one_view)(request)
+
+        assert 'X-SQL-Queries' not in response
+        assert store.recent() == []
+
+    def test_sampled_request_is_recorded_without_headers(self, test_recipes):
+        request = RequestFactory().get('/')
+        with override_settings(DEBUG=False, SQL_PROFILING_SAMPLE_RATE=1.0):
+            response = SQLProfilingMiddleware(n_plus_one_view)(request)
+
+        assert 'X-SQL-Queries' not in response
+        assert len(store.recent()) == 1
+        assert 'bitesnap_sql_n_plus_one_total' in {name for name, _, _ in registry.snapshot()['counters']}
+
+    def test_async_requests_pass_through(self):
+        async def view(request):
+            return HttpResponse('async')
+        middleware = SQLProfilingMiddleware(view)
+
+        with override_settings(SQL_PROFILING_SAMPLE_RATE=1.0):
+            response = async_to_sync(middleware)(AsyncRequestFactory().get('/'))
+
+        assert iscoroutinefunction(middleware)
+        assert response.content == b'async'
+        assert store.recent() == []
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestSQLProfilingEndpoints:
+    def test_staff_gets_summary_headers(self, profiling, staff_token, test_recipes):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {staff_token.key}')
+
+        response = client.get(reverse('api:recipes-list'), HTTP_X_PROFILE_SQL='1')
+
+        assert int(response['X-SQL-Queries']) > 0
+        # The list queryset prefetches everything the serializer reads.
+        assert response['X-SQL-N-Plus-One'] == '0'
+
+        detail = client.get(reverse('api:sql-profiles-detail', args=[response['X-SQL-Profile']]))
+        assert detail.status_code == 200
+        assert detail.data['route'] == 'recipes-list'
+        assert client.get(reverse('api:sql-profiles-list')).data[0]['id'] == response['X-SQL-Profile']
+
+    def test_header_ignored_for_non_staff(self, profiling, authenticated_client, test_recipes):
+        response = authenticated_client.get(reverse('api:recipes-list'), HTTP_X_PROFILE_SQL='1')
+
+        assert 'X-SQL-Queries' not in response
+        assert authenticated_client.get(reverse('api:sql-profiles-list')).status_code == 403
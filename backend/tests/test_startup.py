@@ -0,0 +1,29 @@
+import json
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+
+@pytest.fixture(scope='module')
+def cold_start():
+    out = StringIO()
+    call_command('profile_startup', json=True, stdout=out)
+    return json.loads(out.getvalue())
+
+
+@pytest.mark.integration
+class TestColdStart:
+    def test_optional_subsystems_are_not_loaded(self, cold_start):
+        assert cold_start['lazy_modules_loaded'] == []
+
+    def test_cold_start_within_budget(self, cold_start):
+        assert cold_start['wall_ms'] <= settings.STARTUP_BUDGET_MS
+
+    def test_profile_reports_modules_and_packages(self, cold_start):
+        modules = {row['module'] for row in cold_start['modules']}
+        packages = {row['package'] for row in cold_start['packages']}
+
+        assert 'api.views' in modules
+        assert {'django', 'rest_framework', 'api'} <= packages
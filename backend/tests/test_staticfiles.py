@@ -0,0 +1,140 @@
+import gzip
+import json
+
+import brotli
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.templatetags.static import static
+
+CSS = 'body { color: #333; }\n' * 200
+
+
+@pytest.fixture
+def collected(settings, tmp_path):
+    source = tmp_path / 'source'
+    (source / 'css').mkdir(parents=True)
+    (source / 'css' / 'site.css').write_text(CSS)
+    (source / 'logo.png').write_bytes(b'\x89PNG' + bytes(range(256)) * 4)
+    settings.STATICFILES_DIRS = [str(source)]
+    settings.STATICFILES_FINDERS = ['django.contrib.staticfiles.finders.FileSystemFinder']
+    settings.STATIC_ROOT = str(tmp_path / 'static')
+    call_command('collectstatic', interactive=False, verbosity=0)
+    manifest = json.loads((tmp_path / 'static' / 'staticfiles.json').read_text())
+    return tmp_path / 'static', manifest['paths']
+
+
+@pytest.mark.unit
+class TestCompressedManifestStorage:
+    def test_collectstatic_writes_hashed_and_compressed_files(self, collected):
+        root, paths = collected
+        hashed = paths['css/site.css']
+
+        assert hashed != 'css/site.css' and hashed.startswith('css/site.')
+        assert gzip.decompress((root / f'{hashed}.gz').read_bytes()).decode() == CSS
+        assert brotli.decompress((root / f'{hashed}.br').read_bytes()).decode() == CSS
+        assert not (root / f'{paths["logo.png"]}.gz').exists()
+        assert static('css/site.css') == f'/static/{hashed}'
+
+    def test_uncollected_names_resolve_unhashed(self, settings, tmp_path):
+        settings.STATIC_ROOT = str(tmp_path)
+
+        assert static('admin/css/base.css') == '/static/admin/css/base.css'
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestStaticFilesMiddleware:
+    def test_hashed_file_is_immutable_and_precompressed(self, client, collected):
+        _, paths = collected
+
+        response = client.get(f'/static/{paths["css/site.css"]}', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert response['Content-Encoding'] == 'br'
+        assert response['Vary'] == 'Accept-Encoding'
+        assert response['Content-Type'] == 'text/css'
+        assert brotli.decompress(b''.join(response.streaming_content)).decode() == CSS
+
+    def test_encoding_falls_back_to_gzip_and_identity(self, client, collected):
+        _, paths = collected
+        url = f'/static/{paths["css/site.css"]}'
+
+        gzipped = client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        identity = client.get(url)
+
+        assert gzipped['Content-Encoding'] == 'gzip'
+        assert 'Content-Encoding' not in identity
+        assert b''.join(identity.streaming_content).decode() == CSS
+        assert int(identity['Content-Length']) == len(CSS)
+
+    def test_unhashed_name_gets_short_max_age(self, settings, client, collected):
+        settings.STATIC_MAX_AGE = 60
+
+        response = client.get('/static/css/site.css')
+
+        assert response['Cache-Control'] == 'public, max-age=60'
+
+    def test_matching_etag_is_not_modified(self, client, collected):
+        _, paths = collected
+        url = f'/static/{paths["logo.png"]}'
+        etag = client.get(url)['ETag']
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+
+    def test_each_encoding_has_its_own_etag(self, client, collected):
+        _, paths = collected
+        url = f'/static/{paths["css/site.css"]}'
+        etags = {
+            encoding: client.get(url, HTTP_ACCEPT_ENCODING=encoding)['ETag'] for encoding in ('br', 'gzip', 'identity')
+        }
+
+        assert len(set(etags.values())) == 3
+        assert client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etags['gzip']).status_code == 304
+        # A client that now accepts br must not keep its gzip copy
+        assert client.get(url, HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=etags['gzip']).status_code == 200
+
+    def test_range_is_served_from_identity_file(self, client, collected):
+        _, paths = collected
+
+        response = client.get(
+            f'/static/{paths["css/site.css"]}', HTTP_RANGE='bytes=5-9', HTTP_ACCEPT_ENCODING='gzip',
+        )
+
+        assert response.status_code == 206
+        assert response['Content-Range'] == f'bytes 5-9/{len(CSS)}'
+        assert response['Content-Length'] == '5'
+        assert 'Content-Encoding' not in response
+        assert b''.join(response.streaming_content).decode() == CSS[5:10]
+
+    def test_suffix_and_unsatisfiable_ranges(self, client, collected):
+        _, paths = collected
+        url = f'/static/{paths["css/site.css"]}'
+
+        suffix = client.get(url, HTTP_RANGE='bytes=-4')
+        beyond = client.get(url, HTTP_RANGE=f'bytes={len(CSS)}-')
+
+        assert b''.join(suffix.streaming_content).decode() == CSS[-4:]
+        assert beyond.status_code == 416
+        assert beyond['Content-Range'] == f'bytes */{len(CSS)}'
+
+    def test_unknown_and_hidden_files_fall_through(self, client, collected):
+        root, _ = collected
+        (root / '.bootstrap-fingerprint').write_text('abc')
+
+        assert client.get('/static/missing.css').status_code == 404
+        assert client.get('/static/.bootstrap-fingerprint').status_code == 404
+
+    def test_served_by_async_chain(self, async_client, collected):
+        _, paths = collected
+        url = f'/static/{paths["css/site.css"]}'
+
+        response = async_to_sync(async_client.get)(url, headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(b''.join(response.streaming_content)).decode() == CSS
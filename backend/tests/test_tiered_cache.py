@@ -0,0 +1,116 @@
+import time
+
+import pytest
+from django.core.cache import caches
+
+from bitesnap.cache import LocalTier, TieredCache
+
+from tests.test_metrics import metric_lines
+
+
+def process_cache(sync_interval=0, max_value_size=1024):
+    """A TieredCache with an L1 of its own, as another worker process would have."""
+    backend = TieredCache(None, {'OPTIONS': {'SHARED': 'shared', 'L1_GROUPS': ['hot']}})
+    backend.local = LocalTier(
+        groups=['hot'], max_entries=100, max_value_size=max_value_size, ttl=60, sync_interval=sync_interval,
+    )
+    return backend
+
+
+@pytest.mark.unit
+class TestTieredCache:
+    def test_repeated_reads_are_served_by_l1(self):
+        backend = process_cache(sync_interval=60)
+        backend.set('hot:tags', ['breakfast'])
+
+        assert backend.get('hot:tags') == ['breakfast']
+        # Changed behind the backend's back: only the L1 copy is read
+        caches['shared'].set('hot:tags', ['dinner'])
+        assert backend.get('hot:tags') == ['breakfast']
+
+        stats = backend.local.stats()
+        assert (stats['l1_hits'], stats['l2_hits']) == (1, 1)
+
+    def test_l1_values_are_copies(self):
+        backend = process_cache()
+        backend.set('hot:tags', ['breakfast'])
+        backend.get('hot:tags').append('mutated')
+
+        assert backend.get('hot:tags') == ['breakfast']
+
+    def test_writes_in_another_process_invalidate_after_sync(self):
+        writer, reader = process_cache(), process_cache()
+        writer.set('hot:tags', ['breakfast'])
+        assert reader.get('hot:tags') == ['breakfast']
+
+        writer.set('hot:tags', ['dinner'])
+
+        assert reader.get('hot:tags') == ['dinner']
+        assert reader.local.stats()['invalidations'] == 1
+
+    def test_fills_of_new_keys_invalidate_nothing(self):
+        writer, reader = process_cache(), process_cache()
+        writer.set('hot:tags', ['breakfast'])
+        reader.get('hot:tags')
+
+        writer.set('hot:recipes', [1, 2])
+        writer.set_many({'hot:page:1': 'one', 'hot:page:2': 'two'})
+        writer.delete('hot:missing')
+
+        assert reader.get('hot:tags') == ['breakfast']
+        stats = reader.local.stats()
+        assert (stats['invalidations'], stats['l1_hits']) == (0, 1)
+
+    def test_own_writes_are_visible_before_sync(self):
+        backend = process_cache(sync_interval=60)
+        backend.set('hot:version', 1)
+        backend.get('hot:version')
+
+        backend.incr('hot:version')
+
+        assert backend.get('hot:version') == 2
+
+    def test_other_groups_and_large_values_stay_in_l2(self):
+        backend = process_cache(max_value_size=64)
+        backend.set('cold:key', 'value')
+        backend.set('hot:large', 'x' * 1000)
+
+        assert backend.get('cold:key') == 'value'
+        assert backend.get('hot:large') == 'x' * 1000
+        assert backend.get('hot:missing', 'default') == 'default'
+        assert backend.local.stats()['l1_entries'] == 0
+
+    def test_get_many_combines_tiers(self):
+        backend = process_cache(sync_interval=60)
+        backend.set_many({'hot:a': 1, 'hot:b': 2, 'cold:c': 3})
+        backend.get('hot:a')
+
+        assert backend.get_many(['hot:a', 'hot:b', 'cold:c', 'hot:missing']) == {'hot:a': 1, 'hot:b': 2, 'cold:c': 3}
+        assert backend.local.stats()['l1_entries'] == 2
+
+
+@pytest.mark.unit
+class TestFileBasedCache:
+    def test_add_only_replaces_expired_entries(self):
+        shared = caches['shared']
+        shared.set('lock:popular', 'expired', 0.01)
+        time.sleep(0.02)
+
+        assert shared.add('lock:popular', 'first')
+        assert not shared.add('lock:popular', 'second')
+        assert shared.get('lock:popular') == 'first'
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestTieredCacheMetrics:
+    def test_tier_counts_are_exported(self, api_client, tag_factory):
+        tag_factory()
+        api_client.get('/api/tags/')
+        api_client.get('/api/tags/')
+
+        lines = metric_lines(api_client)
+
+        assert any(line.startswith('bitesnap_cache_requests_total{alias="shared",result="hit",tier="l1"}')
+                   for line in lines)
+        assert any(line.startswith('bitesnap_cache_l1_entries{alias="shared"}') for line in lines)
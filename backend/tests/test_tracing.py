@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from opencensus.trace import execution_context, samplers
+from opencensus.trace.base_exporter import Exporter
+from opencensus.trace.span import SpanKind
+from opencensus.trace.tracer import Tracer
+
+from bitesnap import tracing
+from bitesnap.tracing import TracedStorage, TraceExporter, TracingMiddleware
+
+
+@pytest.fixture(autouse=True)
+def clear_trace_context():
+    yield
+    execution_context.clear()
+
+
+class CollectingExporter(Exporter):
+    def __init__(self, block=None):
+        self.batches = []
+        self.block = block
+        self.received = threading.Event()
+
+    def emit(self, span_datas):
+        if self.block is not None:
+            self.block.wait(5)
+        self.batches.append(span_datas)
+        self.received.set()
+
+    def export(self, span_datas):
+        self.emit(span_datas)
+
+    @property
+    def spans(self):
+        return [span_data for batch in self.batches for span_data in batch]
+
+
+def record_trace(status_code=200):
+    collected = CollectingExporter()
+    tracer = Tracer(sampler=samplers.AlwaysOnSampler(), exporter=collected)
+    with tracer.span('request') as span:
+        span.span_kind = SpanKind.SERVER
+        with tracer.span('postgresql.query'):
+            pass
+        span.add_attribute('http.status_code', status_code)
+    return collected.spans
+
+
+def make_exporter(target=None, **options):
+    options = {'rate_limit': 0, 'slow_ms': 10000, 'queue_size': 10, 'batch_size': 10, 'interval': 0, **options}
+    return TraceExporter(lambda: target or CollectingExporter(), **options)
+
+
+@pytest.mark.unit
+class TestTraceExporter:
+    def test_fast_successful_traces_are_rate_limited(self):
+        exporter = make_exporter(rate_limit=1)
+
+        exporter.export(record_trace())
+        exporter.export(record_trace())
+
+        assert exporter.stats()['kept'] == 1
+        assert exporter.stats()['sampled_out'] == 1
+
+    def test_failed_requests_are_always_kept(self):
+        exporter = make_exporter()
+
+        exporter.export(record_trace(status_code=503))
+
+        assert exporter.stats()['kept'] == 1
+
+    def test_slow_requests_are_always_kept(self):
+        exporter = make_exporter(slow_ms=0)
+
+        exporter.export(record_trace())
+
+        assert exporter.stats()['kept'] == 1
+
+    def test_child_spans_are_held_until_root_ends(self):
+        target = CollectingExporter()
+        exporter = make_exporter(target, slow_ms=0)
+        child, root = record_trace()
+
+        exporter.export([child])
+        held = exporter.stats()
+        exporter.export([root])
+        exporter.flush()
+
+        assert held['kept'] == held['sampled_out'] == 0
+        assert exporter.stats()['kept'] == 1
+        assert [span.name for span in target.spans] == ['postgresql.query', 'request']
+
+    def test_kept_traces_are_exported_in_batches(self):
+        target = CollectingExporter()
+        exporter = make_exporter(target, slow_ms=0, batch_size=2)
+
+        for _ in range(3):
+            exporter.export(record_trace())
+        exporter.flush()
+
+        assert len(target.spans) == 6
+        assert all(len(batch) <= 4 for batch in target.batches)
+        assert exporter.stats()['exported'] == 3
+
+    def test_full_queue_drops_traces_without_blocking(self):
+        release = threading.Event()
+        exporter = make_exporter(CollectingExporter(block=release), slow_ms=0, queue_size=1)
+
+        started = time.monotonic()
+        for _ in range(5):
+            exporter.export(record_trace())
+        elapsed = time.monotonic() - started
+        release.set()
+        exporter.flush()
+
+        assert elapsed < 1
+        assert exporter.stats()['dropped'] >= 3
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestTracingMiddleware:
+    def test_request_is_exported_with_query_spans(self, settings, monkeypatch, api_client, tag_factory):
+        target = CollectingExporter()
+        monkeypatch.setattr(tracing, 'build_exporter', lambda: target)
+        settings.MIDDLEWARE = settings.MIDDLEWARE + ['bitesnap.tracing.TracingMiddleware']
+        settings.TRACING_SLOW_MS = 0
+        settings.TRACING_EXPORT_INTERVAL = 0
+        tag_factory()
+
+        response = api_client.get(reverse('api:tags-list'))
+
+        assert response.status_code == 200
+        assert target.received.wait(5)
+        server = [span for span in target.spans if span.span_kind == SpanKind.SERVER]
+        queries = [span for span in target.spans if span.name.endswith('.query')]
+        assert server[0].attributes['http.status_code'] == 200
+        assert queries and all(span.parent_span_id == server[0].span_id for span in queries)
+
+    def test_async_request_is_exported(self, settings, monkeypatch):
+        target = CollectingExporter()
+        monkeypatch.setattr(tracing, 'build_exporter', lambda: target)
+        settings.TRACING_SLOW_MS = 0
+        settings.TRACING_EXPORT_INTERVAL = 0
+
+        async def view(request):
+            return HttpResponse(status=201)
+        middleware = TracingMiddleware(view)
+        response = async_to_sync(middleware)(AsyncRequestFactory().get('/async/'))
+
+        assert iscoroutinefunction(middleware)
+        assert response.status_code == 201
+        assert target.received.wait(5)
+        server = [span for span in target.spans if span.span_kind == SpanKind.SERVER]
+        assert server[0].attributes['http.status_code'] == 201
+
+
+@pytest.mark.unit
+class TestTracedStorage:
+    def test_storage_calls_are_child_spans(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.TRACED_STORAGE_BACKEND = 'django.core.files.storage.FileSystemStorage'
+        storage = TracedStorage()
+        collected = CollectingExporter()
+        tracer = Tracer(sampler=samplers.AlwaysOnSampler(), exporter=collected)
+
+        with tracer.span('request'):
+            name = storage.save('notes.txt', ContentFile(b'hello'))
+            assert storage.exists(name)
+            assert storage.url(name).endswith('notes.txt')
+
+        names = [span.name for span in collected.spans]
+        assert names.count('storage.save') == 1
+        assert 'storage.exists' in names
+        assert (tmp_path / name).read_bytes() == b'hello'